@@ -5,13 +5,26 @@ import re
 import random
 import time
 import uuid
-import requests
-from flask import Flask, request, jsonify
+import hashlib
+import hmac
+from flask import Flask, Response, request, jsonify
 from datetime import datetime, timezone
 import pytz
-from queue import PriorityQueue
-from threading import Thread
-from knowledge import load_knowledge, get_knowledge_context, add_update  # Import modul knowledge
+from queue import Queue, Full
+from threading import Thread, Lock
+from knowledge import load_knowledge, refresh_knowledge, get_knowledge_context, get_retriever, add_update  # Import modul knowledge
+from outbound_queue import OutboundQueue, DurableOutboundQueue
+import http_client
+from cache import make_cache, make_dedup, normalize_text, SingleFlight
+from intent import IntentRouter
+from coalescer import BurstCoalescer
+from conversation import make_conversation_memory, trim_to_budget
+from streaming import ReplyChunker, parse_stream_line, STREAM_DONE
+from metrics import registry
+from log_pipeline import setup_logging
+import circuit_breaker
+import web_index
+from circuit_breaker import CircuitOpenError
 
 app = Flask(__name__)
 
@@ -20,18 +33,90 @@ WATI_API_ENDPOINT = os.getenv("WATI_API_ENDPOINT", "https://api.wati.io/v1")
 WATI_API_TOKEN = os.getenv("WATI_API_TOKEN")
 WATI_NUMBER = os.getenv("WATI_NUMBER")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+SERPAPI_URL = os.getenv("SERPAPI_URL", "https://serpapi.com/search")
 ADMIN_PHONES = json.loads(os.getenv("ADMIN_PHONES", "[]"))
+# /metrics dan /stats/* hanya melayani header "Authorization: Bearer <MONITORING_TOKEN>";
+# tanpa token endpoint monitoring ditutup
+MONITORING_TOKEN = os.getenv("MONITORING_TOKEN", "")
 MAPS_LOCATION = os.getenv("MAPS_LOCATION", "https://maps.app.goo.gl/XXXXX")
-OFFICIAL_DOMAINS = json.loads(os.getenv("OFFICIAL_DOMAINS", "[\"kemnaker.go.id\", \"transmigrasi.go.id\", \"kemenperin.go.id\", \"disnakertransperin.bartimkab.go.id\"]"))
+OFFICIAL_DOMAINS = web_index.OFFICIAL_DOMAINS
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s: %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# Mode ingest: webhook hanya memvalidasi dan mengantrikan pesan, balasan dibuat oleh worker
+ASYNC_WEBHOOK = os.getenv("ASYNC_WEBHOOK", "true").lower() in ("1", "true", "yes")
+RESPONSE_WORKERS = int(os.getenv("RESPONSE_WORKERS", "4"))
+RESPONSE_QUEUE_SIZE = int(os.getenv("RESPONSE_QUEUE_SIZE", "200"))
+RESPONSE_QUEUE_TIMEOUT = float(os.getenv("RESPONSE_QUEUE_TIMEOUT", "0.5"))  # detik menunggu saat antrian penuh
+
+# Gabungkan pesan beruntun dari nomor yang sama (mode ingest saja). Setiap balasan menunggu
+# minimal BURST_WINDOW_MS, termasuk percakapan satu pesan, jadi bawaannya 0 (nonaktif). Nilai
+# 300-800 mengurangi panggilan Groq untuk pengguna yang mengetik per baris dengan tambahan
+# latensi sebesar itu; nilai di atas 1000 hanya bila hemat kuota lebih penting dari kecepatan
+BURST_WINDOW_MS = int(os.getenv("BURST_WINDOW_MS", "0"))
+BURST_MAX_WAIT_MS = int(os.getenv("BURST_MAX_WAIT_MS", "5000"))
+BURST_MAX_FRAGMENTS = int(os.getenv("BURST_MAX_FRAGMENTS", "8"))
+BURST_MAX_ACTIVE = int(os.getenv("BURST_MAX_ACTIVE", "1000"))
+
+# Jendela deduplikasi event webhook yang dikirim ulang WATI. Tanpa CACHE_DB jendelanya per
+# worker: kiriman ulang yang jatuh ke worker gunicorn lain tidak dikenali sebagai duplikat
+WEBHOOK_DEDUP_WINDOW = int(os.getenv("WEBHOOK_DEDUP_WINDOW", "600"))  # detik
+WEBHOOK_DEDUP_MAX = int(os.getenv("WEBHOOK_DEDUP_MAX", "100000"))
+
+# Cache hasil pencarian web (kosongkan CACHE_DB untuk cache memori saja)
+CACHE_DB = os.getenv("CACHE_DB", "")
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "500"))
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "21600"))  # 6 jam
+GROQ_CACHE_SIZE = int(os.getenv("GROQ_CACHE_SIZE", "1000"))
+GROQ_CACHE_TTL = int(os.getenv("GROQ_CACHE_TTL", "43200"))  # 12 jam
+# Batas waktu menunggu panggilan identik yang sedang berjalan sebelum memanggil sendiri
+SEARCH_FLIGHT_TIMEOUT = float(os.getenv("SEARCH_FLIGHT_TIMEOUT", "20"))
+GROQ_FLIGHT_TIMEOUT = float(os.getenv("GROQ_FLIGHT_TIMEOUT", "20"))
+# Riwayat percakapan per nomor sebagai konteks Groq (kosongkan CONVERSATION_DB untuk memori saja)
+CONVERSATION_DB = os.getenv("CONVERSATION_DB", "")
+CONVERSATION_MAX_TURNS = int(os.getenv("CONVERSATION_MAX_TURNS", "6"))
+CONVERSATION_MAX_USERS = int(os.getenv("CONVERSATION_MAX_USERS", "10000"))
+CONVERSATION_TTL = int(os.getenv("CONVERSATION_TTL", "1800"))  # 30 menit
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "600"))
+# Streaming jawaban Groq: potongan jawaban dikirim ke WATI begitu lengkap
+GROQ_STREAMING = os.getenv("GROQ_STREAMING", "false").lower() in ("1", "true", "yes")
+STREAM_MIN_CHUNK_CHARS = int(os.getenv("STREAM_MIN_CHUNK_CHARS", "280"))
+WHATSAPP_MAX_CHARS = int(os.getenv("WHATSAPP_MAX_CHARS", "4096"))
+# Jalankan crawler indeks situs resmi di thread worker; hanya satu worker yang crawl per
+# CRAWL_INTERVAL. Crawler harus menulis ke disk yang sama dengan yang dibaca worker, jadi
+# proses `python web_index.py crawl` terpisah hanya dipakai jika WEB_INDEX_DB ada di penyimpanan bersama
+WEB_CRAWLER = os.getenv("WEB_CRAWLER", "false").lower() in ("1", "true", "yes")
+# Ambang keyakinan BM25 yang lebih longgar saat Groq tidak tersedia (breaker terbuka)
+FALLBACK_MIN_CONFIDENCE = float(os.getenv("FALLBACK_MIN_CONFIDENCE", "0.15"))
+
+# Setup logging (JSON, asinkron, data pribadi disamarkan; lihat log_pipeline.py)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# ===================== METRIK =====================
+branch_total = registry.counter(
+    "chatbot_messages_total", "Jumlah pesan per cabang penanganan", ("branch",)
+)
+branch_latency = registry.histogram(
+    "chatbot_response_seconds", "Waktu generate_ai_response per cabang penanganan", ("branch",)
+)
+stage_latency = registry.histogram(
+    "chatbot_stage_seconds", "Waktu tahap pencarian pengetahuan, web search, dan Groq (termasuk cache)", ("stage",)
+)
+webhook_total = registry.counter(
+    "chatbot_webhook_events_total", "Jumlah event webhook per status", ("status",)
+)
+send_latency = registry.histogram(
+    "chatbot_wati_send_seconds", "Latensi send_wati_message per hasil", ("outcome",)
+)
+coalesced_dropped = registry.counter(
+    "chatbot_coalesced_dropped_total", "Pesan gabungan burst yang dibuang karena antrian respons penuh"
+)
+groq_stream_latency = registry.histogram(
+    "chatbot_groq_stream_seconds",
+    "Streaming Groq: waktu sampai potongan pertama masuk antrian (first_message) dan sampai stream selesai (complete)",
+    ("phase",)
+)
+
 # Muat basis data pengetahuan
 knowledge_db = load_knowledge()
 
@@ -53,15 +138,69 @@ DOMAIN_KEYWORDS = [
     'siapkerja'
 ]
 
+GREETING_KEYWORDS = [
+    'halo', 'hai', 'hi', 'pagi', 'siang', 'sore', 'malam',
+    'selamat pagi', 'selamat siang', 'selamat sore', 'selamat malam',
+    'assalamualaikum', 'salam', 'hey', 'helo'
+]
+
+GRATITUDE_KEYWORDS = [
+    'terima kasih', 'thanks', 'makasih', 'tengkyu', 'thx',
+    'sangat membantu', 'membantu sekali', 'terimakasih'
+]
+
+CONVERSATIONAL_KEYWORDS = [
+    'baik', 'kabar', 'apa kabar', 'bagaimana', 'siapa', 'kenapa',
+    'bisa bantu', 'tolong', 'permisi', 'mohon bantuan'
+]
+
+# Kata tanya; kata domain baru dianggap pertanyaan layanan jika disertai salah satunya (atau '?')
+QUESTION_KEYWORDS = [
+    'apa', 'apakah', 'berapa', 'bagaimana', 'gimana', 'kapan', 'dimana', 'di mana',
+    'mana', 'bisakah', 'bolehkah', 'cara'
+]
+
+LOCATION_KEYWORDS = ['lokasi', 'alamat', 'maps']
+SHARELOCK_KEYWORDS = ['sharelock', 'bagikan lokasi']
+INDUSTRIAL_KEYWORDS = ['phk', 'pemecatan', 'pesangon', 'hubungan industrial', 'sengketa kerja']
+
+WEB_SEARCH_TRIGGERS = [
+    'lokasi', 'alamat', 'tempat', 'peta', 'maps',
+    'sharelock', 'bagikan lokasi', 'bagikan alamat',
+    'hubungan industrial', 'pemecatan', 'phk', 'pesangon',
+    'prosedur', 'tatacara', 'syarat', 'proses', 'ketentuan',
+    'aturan', 'pasal', 'uu', 'undang-undang', 'peraturan'
+]
+
+# Semua daftar pemicu dicocokkan sekaligus dengan batas kata;
+# urutan penanganannya ditentukan di generate_ai_response
+intent_router = IntentRouter([
+    ('greeting', GREETING_KEYWORDS),
+    ('gratitude', GRATITUDE_KEYWORDS),
+    ('siapkerja', ['siapkerja']),
+    ('location', LOCATION_KEYWORDS),
+    ('sharelock', SHARELOCK_KEYWORDS),
+    ('industrial', INDUSTRIAL_KEYWORDS),
+    ('web_search', WEB_SEARCH_TRIGGERS),
+    ('conversational', CONVERSATIONAL_KEYWORDS),
+    ('domain', DOMAIN_KEYWORDS),
+    ('question', QUESTION_KEYWORDS),
+])
+
+# Intent yang menandakan pesan berisi pertanyaan layanan, bukan sekadar basa-basi. 'domain'
+# tidak termasuk: kata umumnya ('kerja', 'kantor') juga muncul di ucapan terima kasih
+SUBSTANTIVE_INTENTS = frozenset({'siapkerja', 'location', 'sharelock', 'industrial', 'web_search'})
+
+def has_service_question(intents, message):
+    """Pesan berisi pertanyaan layanan (dipakai agar sapaan/terima kasih tidak menelannya)"""
+    if not intents.isdisjoint(SUBSTANTIVE_INTENTS):
+        return True
+    return 'domain' in intents and ('question' in intents or '?' in message)
+
 # ===================== FUNGSI UTILITAS PERCAKAPAN =====================
 def is_greeting(message):
     """Deteksi pesan sapaan atau pembuka percakapan"""
-    greetings = [
-        'halo', 'hai', 'hi', 'pagi', 'siang', 'sore', 'malam',
-        'selamat pagi', 'selamat siang', 'selamat sore', 'selamat malam',
-        'assalamualaikum', 'salam', 'hey', 'helo'
-    ]
-    return any(greeting in message.lower() for greeting in greetings)
+    return 'greeting' in intent_router.match(message)
 
 def generate_greeting_response():
     """Buat respons sapaan yang ramah dan natural"""
@@ -87,11 +226,7 @@ def generate_greeting_response():
 
 def is_gratitude(message):
     """Deteksi ucapan terima kasih"""
-    gratitudes = [
-        'terima kasih', 'thanks', 'makasih', 'tengkyu', 'thx',
-        'sangat membantu', 'membantu sekali', 'terimakasih'
-    ]
-    return any(gratitude in message.lower() for gratitude in gratitudes)
+    return 'gratitude' in intent_router.match(message)
 
 def generate_gratitude_response():
     """Buat respons untuk ucapan terima kasih"""
@@ -104,62 +239,91 @@ def generate_gratitude_response():
 
 def is_conversational(message):
     """Deteksi pesan percakapan umum yang wajar"""
-    conversational = [
-        'baik', 'kabar', 'apa kabar', 'bagaimana', 'siapa', 'kenapa',
-        'bisa bantu', 'tolong', 'permisi', 'mohon bantuan'
-    ]
-    return any(term in message.lower() for term in conversational)
+    return 'conversational' in intent_router.match(message)
 
 # ===================== FUNGSI PENCARIAN INFORMASI RESMI =====================
 def is_question_requires_web_search(question):
     """Deteksi apakah pertanyaan memerlukan pencarian web"""
-    web_triggers = [
-        'lokasi', 'alamat', 'tempat', 'peta', 'maps',
-        'sharelock', 'bagikan lokasi', 'bagikan alamat',
-        'hubungan industrial', 'pemecatan', 'phk', 'pesangon',
-        'prosedur', 'tatacara', 'syarat', 'proses', 'ketentuan',
-        'aturan', 'pasal', 'uu', 'undang-undang', 'peraturan'
-    ]
-    return any(trigger in question.lower() for trigger in web_triggers)
+    return 'web_search' in intent_router.match(question)
+
+search_cache = make_cache('search_cache', SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, CACHE_DB)
+official_index = web_index.open_index()
+search_flight = SingleFlight(timeout=SEARCH_FLIGHT_TIMEOUT)
+
+def search_cache_key(query):
+    """Kunci cache pencarian: pertanyaan ternormalisasi plus daftar domain resmi"""
+    return f"{normalize_text(query)}|{','.join(sorted(OFFICIAL_DOMAINS))}"
+
+def search_official_index(query):
+    """Cari di indeks lokal halaman situs resmi hasil crawler"""
+    if official_index is None:
+        return None
+    return official_index.lookup(query)
 
 def perform_official_web_search(query):
-    """Lakukan pencarian web dengan prioritas situs resmi"""
+    """Cari di indeks lokal situs resmi; SerpAPI (hasil di-cache) hanya sebagai cadangan"""
+    result = search_official_index(query)
+    if result:
+        return result
+    cache_key = search_cache_key(query)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    def search_and_cache():
+        result = search_official_web(query)
+        # Hanya hasil yang valid yang di-cache, error dan hasil kosong dicoba lagi
+        if result:
+            search_cache.set(cache_key, result)
+        return result
+    
+    # Pertanyaan identik yang datang bersamaan cukup memicu satu panggilan SerpAPI
+    return search_flight.do(cache_key, search_and_cache)
+
+def build_search_params(query):
+    """Parameter SerpAPI dengan filter domain resmi"""
+    params = {
+        'q': f"{query}",
+        'api_key': os.getenv("WEB_SEARCH_API_KEY"),
+        'engine': 'google',
+        'num': 5,  # Ambil lebih banyak hasil untuk seleksi
+        'hl': 'id',
+        'gl': 'id'  # Hasil dari Indonesia
+    }
+    
+    # Filter domain resmi
+    official_sites = " OR ".join([f"site:{domain}" for domain in OFFICIAL_DOMAINS])
+    params['q'] += f" ({official_sites})"
+    return params
+
+def select_search_result(results):
+    """Pilih hasil teratas dari respons SerpAPI, utamakan domain resmi"""
+    if 'organic_results' in results and results['organic_results']:
+        # Prioritaskan hasil dari domain resmi
+        official_results = [
+            r for r in results['organic_results'] 
+            if any(domain in r.get('link', '') for domain in OFFICIAL_DOMAINS)
+        ]
+        
+        # Jika ada hasil resmi, kembalikan yang teratas
+        if official_results:
+            return official_results[0]
+        
+        # Jika tidak ada, kembalikan hasil organik teratas
+        return results['organic_results'][0]
+    return None
+
+def search_official_web(query):
+    """Panggil SerpAPI dengan filter domain resmi"""
     if not os.getenv("WEB_SEARCH_API_KEY"):
         logger.error("API key pencarian web tidak tersedia")
         return None
         
     try:
-        # Konfigurasi pencarian dengan fokus pada domain resmi
-        params = {
-            'q': f"{query}",
-            'api_key': os.getenv("WEB_SEARCH_API_KEY"),
-            'engine': 'google',
-            'num': 5,  # Ambil lebih banyak hasil untuk seleksi
-            'hl': 'id',
-            'gl': 'id'  # Hasil dari Indonesia
-        }
-        
-        # Filter domain resmi
-        official_sites = " OR ".join([f"site:{domain}" for domain in OFFICIAL_DOMAINS])
-        params['q'] += f" ({official_sites})"
-        
-        response = requests.get('https://serpapi.com/search', params=params, timeout=15)
-        results = response.json()
-        
-        if 'organic_results' in results and results['organic_results']:
-            # Prioritaskan hasil dari domain resmi
-            official_results = [
-                r for r in results['organic_results'] 
-                if any(domain in r.get('link', '') for domain in OFFICIAL_DOMAINS)
-            ]
-            
-            # Jika ada hasil resmi, kembalikan yang teratas
-            if official_results:
-                return official_results[0]
-            
-            # Jika tidak ada, kembalikan hasil organik teratas
-            return results['organic_results'][0]
-            
+        response = http_client.request('serpapi', 'GET', SERPAPI_URL, params=build_search_params(query))
+        return select_search_result(response.json())
+    except CircuitOpenError as e:
+        logger.warning(f"Web search dilewati: {str(e)}")
     except Exception as e:
         logger.error(f"Web search error: {str(e)}")
         
@@ -176,9 +340,9 @@ def extract_location_info():
     )
 
 def handle_industrial_relations(question):
-    """Penanganan khusus masalah hubungan industrial"""
+    """Penanganan khusus masalah hubungan industrial (langkah route_steps)"""
     # Cari informasi prosedur mediasi
-    web_result = perform_official_web_search("prosedur mediasi hubungan industrial")
+    web_result = yield ('web_search', "prosedur mediasi hubungan industrial")
     
     response = (
         "Untuk masalah hubungan industrial seperti pemutusan hubungan kerja (PHK), "
@@ -202,14 +366,14 @@ def handle_industrial_relations(question):
     return response
 
 def handle_siapkerja_inquiry():
-    """Penanganan khusus untuk pertanyaan tentang SIAPkerja"""
+    """Penanganan khusus untuk pertanyaan tentang SIAPkerja (langkah route_steps)"""
     # Pertama cek di basis data pengetahuan
     siapkerja_knowledge = get_knowledge_context("SIAPkerja", knowledge_db)
     if siapkerja_knowledge:
         return siapkerja_knowledge
     
     # Jika tidak ada di basis data, lakukan pencarian
-    web_result = perform_official_web_search("aplikasi SIAPkerja")
+    web_result = yield ('web_search', "aplikasi SIAPkerja")
     
     response = (
         "SIAPkerja adalah platform digital layanan publik di bidang ketenagakerjaan yang dikembangkan Kemnaker RI. Berikut info dasar:\n\n"
@@ -236,49 +400,96 @@ def handle_siapkerja_inquiry():
 # ===================== FUNGSI UTAMA GENERASI RESPONS =====================
 def generate_ai_response(user_message, from_number):
     """Generasi respons AI dengan integrasi pengetahuan dan web search"""
-    user_message_lower = user_message.lower()
+    start = time.perf_counter()
+    branch, response = route_message(user_message, from_number)
+    branch_latency.observe(time.perf_counter() - start, branch)
+    branch_total.inc(branch)
+    remember_exchange(from_number, branch, user_message, response)
+    return response
+
+def route_message(user_message, from_number):
+    """Pilih cabang penanganan pesan; mengembalikan (nama_cabang, respons)"""
+    steps = route_steps(user_message, from_number)
+    result, error = None, None
+    try:
+        while True:
+            stage, *arguments = steps.throw(error) if error else steps.send(result)
+            result, error = None, None
+            try:
+                with stage_latency.time(stage):
+                    result = UPSTREAM_STEPS[stage](*arguments)
+            except CircuitOpenError as e:
+                # Diteruskan ke route_steps agar cabang fallback yang dipilih
+                error = e
+    except StopIteration as done:
+        return done.value
+
+def route_steps(user_message, from_number):
+    """Urutan cabang penanganan pesan tanpa I/O upstream.
+
+    Generator ini meminta panggilan upstream dengan `yield (tahap, *argumen)`,
+    yaitu ('web_search', kueri) atau ('groq', pesan, nomor), lalu menerima hasilnya
+    lewat send(), atau CircuitOpenError lewat throw() jika circuit breaker
+    upstream sedang terbuka. Hasil akhirnya (nama_cabang, respons) menjadi
+    nilai StopIteration. Jalur Flask (route_message) dan jalur ASGI (asgi.py)
+    menjalankan generator yang sama, hanya klien HTTP-nya yang berbeda.
+    """
+    # Tokenisasi sekali, semua daftar pemicu dicocokkan dalam satu lintasan
+    intents = intent_router.match(user_message)
+    
+    # Sapaan/terima kasih yang disertai pertanyaan (misalnya hasil gabungan burst) tetap dijawab isinya
+    has_question = has_service_question(intents, user_message)
     
     # 1. Tangani sapaan
-    if is_greeting(user_message_lower):
-        return generate_greeting_response()
+    if 'greeting' in intents and not has_question:
+        return 'greeting', generate_greeting_response()
     
     # 2. Tangani ucapan terima kasih
-    if is_gratitude(user_message_lower):
-        return generate_gratitude_response()
+    if 'gratitude' in intents and not has_question:
+        return 'gratitude', generate_gratitude_response()
     
     # 3. Periksa perintah admin khusus
     if from_number in ADMIN_PHONES and user_message.startswith("/update "):
         new_info = user_message.replace("/update ", "")
-        return add_update(new_info, knowledge_db)
+        result = add_update(new_info, knowledge_db)
+        # Jawaban AI lama bisa bertentangan dengan pengetahuan baru
+        groq_cache.clear()
+        return 'admin', result
     
-    # 4. Cek dalam basis data pengetahuan
-    knowledge_response = get_knowledge_context(user_message, knowledge_db)
+    if from_number in ADMIN_PHONES and user_message.strip() == "/flushcache":
+        groq_cache.clear()
+        search_cache.clear()
+        return 'admin', "Cache jawaban AI dan pencarian web berhasil dikosongkan"
+    
+    # 4. Cek dalam basis data pengetahuan (ambil perubahan dari worker lain bila ada)
+    with stage_latency.time('knowledge'):
+        refresh_knowledge_and_cache()
+        knowledge_response = get_knowledge_context(user_message, knowledge_db)
     if knowledge_response:
-        return knowledge_response
+        return 'knowledge', knowledge_response
     
     # 5. Tangani permintaan tentang SIAPkerja
-    if "siapkerja" in user_message_lower:
-        return handle_siapkerja_inquiry()
+    if 'siapkerja' in intents:
+        return 'siapkerja', (yield from handle_siapkerja_inquiry())
     
     # 6. Tangani permintaan lokasi khusus
-    if "lokasi" in user_message_lower or "alamat" in user_message_lower or "maps" in user_message_lower:
-        return extract_location_info()
+    if 'location' in intents:
+        return 'location', extract_location_info()
     
     # 7. Tangani permintaan share location
-    if "sharelock" in user_message_lower or "bagikan lokasi" in user_message_lower:
-        return (
+    if 'sharelock' in intents:
+        return 'sharelock', (
             f"{extract_location_info()}\n\n"
             "Silakan klik link peta di atas untuk petunjuk arah."
         )
     
     # 8. Tangani masalah hubungan industrial
-    industrial_keywords = ['phk', 'pemecatan', 'pesangon', 'hubungan industrial', 'sengketa kerja']
-    if any(kw in user_message_lower for kw in industrial_keywords):
-        return handle_industrial_relations(user_message)
+    if 'industrial' in intents:
+        return 'industrial', (yield from handle_industrial_relations(user_message))
     
     # 9. Cek apakah perlu pencarian web untuk info terkini
-    if is_question_requires_web_search(user_message):
-        web_result = perform_official_web_search(user_message)
+    if 'web_search' in intents:
+        web_result = yield ('web_search', user_message)
         if web_result:
             response = (
                 f"🔍 Berdasarkan informasi resmi:\n"
@@ -287,16 +498,110 @@ def generate_ai_response(user_message, from_number):
                 f"📚 Sumber: {web_result.get('link', '')}\n\n"
                 "Info dapat berubah, silakan konfirmasi ke 0538-1234567 untuk verifikasi."
             )
-            return response
+            return 'web_search', response
     
     # 10. Gunakan Groq AI sebagai fallback
-    return generate_groq_response(user_message)
+    try:
+        return 'groq', (yield ('groq', user_message, from_number))
+    except CircuitOpenError:
+        # Groq sedang terganggu: jangan menunggu, jawab dari pengetahuan lokal
+        return 'fallback', upstream_fallback_response(user_message)
 
-def generate_groq_response(user_message):
-    """Menggunakan Groq API untuk merespons dengan konteks dinas ketenagakerjaan"""
+def upstream_fallback_response(user_message):
+    """Jawaban saat Groq tidak bisa dihubungi: entri pengetahuan terdekat atau info kantor"""
+    answer = get_knowledge_context(user_message, knowledge_db, min_confidence=FALLBACK_MIN_CONFIDENCE)
+    if answer:
+        return answer
+    return (
+        "Maaf, layanan AI sedang tidak tersedia. Untuk pertanyaan Anda, "
+        "silakan hubungi atau kunjungi kantor kami:\n\n"
+        f"{extract_location_info()}"
+    )
+
+GROQ_MAINTENANCE_MESSAGE = "Maaf, layanan AI sedang dalam pemeliharaan"
+GROQ_ERROR_MESSAGE = "Maaf, terjadi kesalahan saat memproses permintaan Anda."
+GROQ_BUSY_MESSAGE = "Maaf, layanan AI sedang sibuk. Silakan coba lagi nanti."
+GROQ_FAILURE_MESSAGES = {GROQ_MAINTENANCE_MESSAGE, GROQ_ERROR_MESSAGE, GROQ_BUSY_MESSAGE}
+
+groq_cache = make_cache('groq_cache', GROQ_CACHE_SIZE, GROQ_CACHE_TTL, CACHE_DB)
+groq_flight = SingleFlight(timeout=GROQ_FLIGHT_TIMEOUT)
+
+# Versi basis data pengetahuan yang terakhir dilihat cache Groq proses ini
+_groq_cache_knowledge_version = getattr(knowledge_db, 'version', None)
+
+def refresh_knowledge_and_cache():
+    """Ambil perubahan basis data pengetahuan; kosongkan cache Groq jika versinya berubah.
+
+    Cache memori dimiliki tiap worker, jadi /update di satu worker tidak bisa
+    mengosongkan cache worker lain. Setiap worker mengosongkan cache-nya sendiri
+    begitu melihat versi KnowledgeStore yang baru.
+    """
+    global _groq_cache_knowledge_version
+    refresh_knowledge(knowledge_db)
+    version = getattr(knowledge_db, 'version', None)
+    if version != _groq_cache_knowledge_version:
+        _groq_cache_knowledge_version = version
+        groq_cache.clear()
+
+conversation_memory = make_conversation_memory(
+    CONVERSATION_DB,
+    max_turns=CONVERSATION_MAX_TURNS,
+    max_users=CONVERSATION_MAX_USERS,
+    ttl=CONVERSATION_TTL
+)
+
+# Basa-basi dan perintah admin tidak menambah konteks untuk pertanyaan lanjutan
+UNREMEMBERED_BRANCHES = frozenset({'greeting', 'gratitude', 'admin'})
+
+def remember_exchange(from_number, branch, user_message, response):
+    """Catat pertanyaan dan jawaban ke riwayat percakapan nomor ini"""
+    if not from_number or branch in UNREMEMBERED_BRANCHES:
+        return
+    # Pesan gagal tidak disimpan sebagai jawaban agar tidak ditiru model
+    bot_text = None if response in GROQ_FAILURE_MESSAGES else str(response)
+    conversation_memory.add_exchange(from_number, user_message, bot_text)
+
+def conversation_history(from_number):
+    """Giliran terbaru nomor ini yang muat dalam CONVERSATION_TOKEN_BUDGET"""
+    if not from_number:
+        return []
+    return trim_to_budget(conversation_memory.history(from_number), CONVERSATION_TOKEN_BUDGET)
+
+def generate_groq_response(user_message, from_number=None):
+    """Menggunakan Groq API untuk merespons dengan konteks dinas ketenagakerjaan (jawaban di-cache)"""
     if not GROQ_API_KEY:
-        return "Maaf, layanan AI sedang dalam pemeliharaan"
+        return GROQ_MAINTENANCE_MESSAGE
+    
+    history = conversation_history(from_number)
+    if history:
+        # Jawaban bergantung pada percakapan sebelumnya, jadi tidak di-cache
+        return request_groq_reply(user_message, history, from_number)
     
+    cache_key = normalize_text(user_message)
+    if cache_key:
+        cached = groq_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    def complete_and_cache():
+        reply = request_groq_reply(user_message, (), from_number)
+        # Pesan error dan stream yang terputus tidak di-cache agar dicoba ulang
+        if cache_key and reply not in GROQ_FAILURE_MESSAGES and getattr(reply, 'complete', True):
+            groq_cache.set(cache_key, str(reply))
+        return reply
+    
+    if not cache_key:
+        return complete_and_cache()
+    return groq_flight.do(cache_key, complete_and_cache)
+
+def request_groq_reply(user_message, history=(), from_number=None):
+    """Minta jawaban Groq; dalam mode streaming potongannya langsung dikirim ke from_number"""
+    if GROQ_STREAMING and from_number:
+        return stream_groq_completion(user_message, history, from_number)
+    return request_groq_completion(user_message, history)
+
+def build_groq_request(user_message, history=(), stream=False):
+    """Header dan payload chat completion Groq untuk satu pertanyaan beserta riwayatnya"""
     headers = {
         "Authorization": f"Bearer {GROQ_API_KEY}",
         "Content-Type": "application/json"
@@ -321,36 +626,142 @@ def generate_groq_response(user_message):
     payload = {
         "messages": [
             {"role": "system", "content": system_prompt},
+            *({"role": turn.role, "content": turn.content} for turn in history),
             {"role": "user", "content": user_message}
         ],
         "model": "llama3-70b-8192",
         "temperature": 0.3,
         "max_tokens": 500,
-        "stream": False
+        "stream": stream
     }
+    return headers, payload
+
+def read_groq_reply(response):
+    """Ambil teks jawaban dari respons Groq (requests maupun httpx)"""
+    if response.status_code == 200:
+        data = response.json()
+        return data['choices'][0]['message']['content']
+    logger.error(f"Groq API error: {response.status_code}", extra={'body': response.text})
+    return GROQ_ERROR_MESSAGE
+
+def request_groq_completion(user_message, history=()):
+    """Kirim satu permintaan chat completion ke Groq"""
+    headers, payload = build_groq_request(user_message, history)
+    try:
+        response = http_client.request(
+            'groq', 'POST',
+            GROQ_API_URL,
+            json=payload,
+            headers=headers
+        )
+        return read_groq_reply(response)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        logger.error(f"Groq API exception: {str(e)}")
+        return GROQ_BUSY_MESSAGE
+
+class DeliveredReply(str):
+    """Jawaban streaming yang potongan-potongannya sudah masuk antrian untuk `to`"""
+
+    def __new__(cls, text, to, complete=True):
+        reply = super().__new__(cls, text)
+        reply.to = to
+        reply.complete = complete
+        return reply
+
+class StreamDelivery:
+    """Pemotongan dan pencatatan waktu satu jawaban Groq yang di-stream ke `to`"""
+
+    def __init__(self, to):
+        self.to = to
+        self.parts = []
+        self.sent = 0
+        self.start = time.perf_counter()
+        self.chunker = ReplyChunker(STREAM_MIN_CHUNK_CHARS, WHATSAPP_MAX_CHARS)
+
+    def feed(self, delta):
+        """Tambahkan potongan teks dari stream; kembalikan pesan yang siap dikirim"""
+        self.parts.append(delta)
+        return self.chunker.feed(delta)
+
+    def flush(self):
+        return self.chunker.flush()
+
+    def mark_sent(self):
+        if not self.sent:
+            groq_stream_latency.observe(time.perf_counter() - self.start, 'first_message')
+        self.sent += 1
+
+    def finish(self, complete=True):
+        """Hasil akhir: DeliveredReply, atau pesan gagal biasa jika belum ada yang terkirim"""
+        if not self.sent:
+            return GROQ_ERROR_MESSAGE if complete else GROQ_BUSY_MESSAGE
+        if complete:
+            groq_stream_latency.observe(time.perf_counter() - self.start, 'complete')
+        return DeliveredReply("".join(self.parts).strip(), self.to, complete)
+
+def stream_groq_completion(user_message, history, to):
+    """Stream jawaban Groq dan masukkan setiap potongan utuh ke antrian pengiriman `to`"""
+    headers, payload = build_groq_request(user_message, history, stream=True)
+    delivery = StreamDelivery(to)
+    
+    def emit(chunks):
+        for chunk in chunks:
+            enqueue_reply(to, chunk)
+            delivery.mark_sent()
     
     try:
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
+        response = http_client.request(
+            'groq', 'POST',
+            GROQ_API_URL,
             json=payload,
             headers=headers,
-            timeout=15
+            stream=True,
+            defer_breaker=True
         )
-        
-        if response.status_code == 200:
-            data = response.json()
-            return data['choices'][0]['message']['content']
-        else:
-            logger.error(f"Groq API error: {response.status_code} - {response.text}")
-            return "Maaf, terjadi kesalahan saat memproses permintaan Anda."
-            
+        # Stream yang putus atau berakhir tanpa [DONE] dihitung gagal oleh breaker
+        done = local_error = False
+        with response:
+            try:
+                if response.status_code != 200:
+                    done = True
+                    return read_groq_reply(response)
+                for line in response.iter_lines():
+                    delta = parse_stream_line(line.decode('utf-8'))
+                    if delta is STREAM_DONE:
+                        done = True
+                        break
+                    if delta:
+                        try:
+                            emit(delivery.feed(delta))
+                        except Exception:
+                            local_error = True  # antrian kirim lokal gagal, bukan Groq
+                            raise
+            finally:
+                http_client.finish_stream(response, failed=not (done or local_error))
+        if not done:
+            raise IOError("stream Groq berakhir tanpa [DONE]")
+        emit(delivery.flush())
+        return delivery.finish()
+    except CircuitOpenError:
+        raise
     except Exception as e:
-        logger.error(f"Groq API exception: {str(e)}")
-        return "Maaf, layanan AI sedang sibuk. Silakan coba lagi nanti."
+        logger.error(f"Groq stream exception: {str(e)}")
+        # Potongan yang sudah terkirim tetap dilengkapi sisa teksnya
+        if delivery.sent:
+            emit(delivery.flush())
+        return delivery.finish(complete=False)
+
+# Panggilan upstream yang diminta route_steps, per nama tahap
+UPSTREAM_STEPS = {
+    'web_search': perform_official_web_search,
+    'groq': generate_groq_response,
+}
 
 # ===================== INTEGRASI WATI API =====================
-def send_wati_message(to, message_body):
-    """Kirim pesan melalui API WATI"""
+def build_wati_request(to, message_body):
+    """URL, header, dan payload pengiriman pesan WATI"""
     headers = {
         "Authorization": f"Bearer {WATI_API_TOKEN}",
         "Content-Type": "application/json"
@@ -360,65 +771,245 @@ def send_wati_message(to, message_body):
         "recipientPhoneNumber": to,
         "messageText": message_body
     }
-    
+    return f"{WATI_API_ENDPOINT}/sendTemplateMessage", headers, payload
+
+def wati_send_succeeded(to, response):
+    """Periksa respons WATI (requests maupun httpx) dan catat hasilnya"""
+    if response.status_code == 200:
+        logger.info("Pesan terkirim via WATI", extra={'phone': to})
+        return True
+    logger.error(f"WATI API error: {response.status_code}", extra={'phone': to, 'body': response.text})
+    return False
+
+def send_wati_message(to, message_body):
+    """Kirim pesan melalui API WATI"""
+    url, headers, payload = build_wati_request(to, message_body)
     try:
-        response = requests.post(
-            f"{WATI_API_ENDPOINT}/sendTemplateMessage",
-            json=payload,
-            headers=headers,
-            timeout=5
-        )
-        
-        if response.status_code == 200:
-            logger.info(f"Pesan terkirim ke {to} via WATI")
-            return True
-        else:
-            logger.error(f"WATI API error: {response.status_code} - {response.text}")
-            return False
-            
+        response = http_client.request('wati', 'POST', url, json=payload, headers=headers)
+        return wati_send_succeeded(to, response)
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(f"WATI API exception: {str(e)}")
         return False
 
 # ===================== SISTEM ANTRIAN PESAN =====================
-message_queue = PriorityQueue()
-SEND_RETRY_DELAY = 10  # Lebih pendek dari Twilio
+# Isi OUTBOUND_QUEUE_DB agar antrian bertahan saat restart dan dipakai bersama antar worker
+OUTBOUND_QUEUE_DB = os.getenv("OUTBOUND_QUEUE_DB", "")
+OUTBOUND_VISIBILITY_TIMEOUT = float(os.getenv("OUTBOUND_VISIBILITY_TIMEOUT", "60"))
+if OUTBOUND_QUEUE_DB:
+    message_queue = DurableOutboundQueue(OUTBOUND_QUEUE_DB, visibility_timeout=OUTBOUND_VISIBILITY_TIMEOUT)
+else:
+    message_queue = OutboundQueue()
+SEND_RETRY_DELAY = float(os.getenv("SEND_RETRY_DELAY", "2"))  # Jeda dasar retry, naik eksponensial
+SEND_RETRY_MAX_DELAY = float(os.getenv("SEND_RETRY_MAX_DELAY", "60"))
+SEND_MAX_ATTEMPTS = int(os.getenv("SEND_MAX_ATTEMPTS", "4"))
+SENDER_WORKERS = int(os.getenv("SENDER_WORKERS", "2"))
+
+def retry_delay(attempt):
+    """Backoff eksponensial dengan jitter untuk percobaan ke-`attempt`"""
+    delay = min(SEND_RETRY_MAX_DELAY, SEND_RETRY_DELAY * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.0)
 
 def message_sender_worker():
     """Worker untuk mengirim pesan dengan WATI"""
     while True:
         try:
             priority, message_data = message_queue.get()
-            to = message_data['to']
-            message_body = message_data['body']
-            attempt = message_data.get('attempt', 0)
-            message_id = message_data.get('id', str(uuid.uuid4()))
-            
-            if attempt > 3:
-                logger.error(f"Gagal mengirim pesan {message_id} setelah 3 percobaan")
-                message_queue.task_done()
-                continue
-                
-            success = send_wati_message(to, message_body)
-            
-            if not success:
-                logger.warning(f"Percobaan ke-{attempt+1} gagal, mencoba lagi dalam {SEND_RETRY_DELAY} detik")
-                message_data['attempt'] = attempt + 1
-                message_queue.put((priority + 1, message_data))  # Tingkatkan prioritas
-                time.sleep(SEND_RETRY_DELAY)
-            else:
-                logger.info(f"Pesan {message_id} terkirim ke {to}")
-                
-            message_queue.task_done()
         except Exception as e:
             logger.error(f"Worker error: {str(e)}")
             time.sleep(5)
+            continue
+
+        success = False
+        defer = None
+        try:
+            start = time.perf_counter()
+            success = send_wati_message(message_data['to'], message_data['body'])
+            record_send(time.perf_counter() - start, success)
+        except CircuitOpenError as e:
+            defer = e.retry_after
+        except Exception as e:
+            logger.error(f"Worker error: {str(e)}")
+        finally:
+            settle_send(message_data, success, defer)
+
+def record_send(elapsed, success):
+    """Catat latensi satu pengiriman WATI ke statistik antrian dan metrik"""
+    message_queue.record_send(elapsed, success)
+    send_latency.observe(elapsed, 'ok' if success else 'error')
 
-# Mulai worker thread
-sender_thread = Thread(target=message_sender_worker, daemon=True)
-sender_thread.start()
+def settle_send(message_data, success, defer=None):
+    """Ack pesan yang terkirim, buang setelah batas percobaan, atau jadwalkan ulang.
+
+    `defer` (detik) dipakai saat breaker WATI terbuka: pesan ditunda sampai
+    breaker boleh dicoba lagi tanpa menghabiskan jatah percobaan.
+    """
+    to = message_data['to']
+    attempt = message_data.get('attempt', 0)
+    message_id = message_data.get('id', str(uuid.uuid4()))
+    if defer is not None:
+        delay = max(defer, SEND_RETRY_DELAY) * random.uniform(1.0, 1.5)
+        logger.warning(f"WATI sedang ditolak circuit breaker, pesan {message_id} ditunda {delay:.1f} detik")
+        message_queue.retry(message_data, delay)
+    elif success:
+        logger.info(f"Pesan {message_id} terkirim", extra={'phone': to})
+        message_queue.ack(message_data)
+    elif attempt + 1 >= SEND_MAX_ATTEMPTS:
+        logger.error(f"Gagal mengirim pesan {message_id} setelah {SEND_MAX_ATTEMPTS} percobaan")
+        message_queue.ack(message_data, dropped=True)
+    else:
+        delay = retry_delay(attempt)
+        logger.warning(f"Percobaan ke-{attempt+1} gagal, mencoba lagi dalam {delay:.1f} detik")
+        message_data['attempt'] = attempt + 1
+        message_queue.retry(message_data, delay)
+
+def deliver_reply(to, response):
+    """Masukkan balasan ke antrian, kecuali sudah dikirim per potongan saat streaming"""
+    if isinstance(response, DeliveredReply) and response.to == to:
+        return None
+    return enqueue_reply(to, str(response))
+
+def enqueue_reply(to, message_body):
+    """Masukkan balasan ke antrian pengiriman (prioritas tinggi)"""
+    message_data = {
+        'id': str(uuid.uuid4()),
+        'to': to,
+        'body': message_body,
+        'attempt': 0
+    }
+    message_queue.put((1, message_data))  # Prioritas tinggi
+    logger.info(f"Pesan dimasukkan ke antrian: {message_data['id']}")
+    return message_data['id']
+
+# ===================== POOL WORKER RESPONS =====================
+# Antrian berbatas: jika penuh, webhook menolak dengan 503 agar WATI mengirim ulang nanti
+response_queue = Queue(maxsize=RESPONSE_QUEUE_SIZE)
+
+def response_worker():
+    """Worker untuk membuat balasan dari pesan masuk di luar thread request"""
+    while True:
+        incoming_msg, from_number = response_queue.get()
+        try:
+            bot_response = generate_ai_response(incoming_msg, from_number)
+            deliver_reply(from_number, bot_response)
+        except Exception as e:
+            logger.error(f"Response worker error: {str(e)}", exc_info=True)
+        finally:
+            response_queue.task_done()
+
+def submit_coalesced(from_number, merged_msg):
+    """Teruskan pertanyaan hasil gabungan burst ke pool worker"""
+    # Dipanggil dari thread timer coalescer (atau thread webhook saat max_active penuh):
+    # jangan menunggu lama agar burst lain dan request itu sendiri tidak ikut tertahan
+    try:
+        response_queue.put((merged_msg, from_number), timeout=RESPONSE_QUEUE_TIMEOUT)
+    except Full:
+        coalesced_dropped.inc()
+        logger.warning(f"Antrian respons penuh ({RESPONSE_QUEUE_SIZE}), pesan gabungan dibuang", extra={'phone': from_number})
+
+burst_coalescer = None
+if ASYNC_WEBHOOK and BURST_WINDOW_MS > 0:
+    burst_coalescer = BurstCoalescer(
+        submit_coalesced,
+        window=BURST_WINDOW_MS / 1000,
+        max_wait=BURST_MAX_WAIT_MS / 1000,
+        max_fragments=BURST_MAX_FRAGMENTS,
+        max_active=BURST_MAX_ACTIVE
+    )
+
+# Thread pengirim dan worker respons dimulai saat request pertama diterima proses ini,
+# sehingga mengimpor modul ini (misalnya dari asgi.py) tidak ikut menjalankannya
+sender_threads = []
+response_threads = []
+_workers_pid = None
+_workers_lock = Lock()
+
+def ensure_workers():
+    """Jalankan thread pengirim dan worker respons sekali per proses"""
+    global _workers_pid
+    if _workers_pid == os.getpid():
+        return
+    with _workers_lock:
+        if _workers_pid == os.getpid():
+            return
+        # Thread milik proses induk tidak ikut ter-fork
+        sender_threads.clear()
+        response_threads.clear()
+        for i in range(SENDER_WORKERS):
+            sender_thread = Thread(target=message_sender_worker, name=f"sender-worker-{i}", daemon=True)
+            sender_thread.start()
+            sender_threads.append(sender_thread)
+        if ASYNC_WEBHOOK:
+            for i in range(RESPONSE_WORKERS):
+                worker = Thread(target=response_worker, name=f"response-worker-{i}", daemon=True)
+                worker.start()
+                response_threads.append(worker)
+        _workers_pid = os.getpid()
+    ensure_crawler()
+    registry.ensure_flusher()
+
+_crawler_pid = None
+
+def ensure_crawler():
+    """Jalankan thread crawler indeks situs resmi sekali per proses jika WEB_CRAWLER aktif"""
+    global _crawler_pid
+    if not WEB_CRAWLER or official_index is None or _crawler_pid == os.getpid():
+        return
+    with _workers_lock:
+        if _crawler_pid == os.getpid():
+            return
+        crawler = web_index.Crawler(official_index, OFFICIAL_DOMAINS)
+        Thread(target=web_index.crawl_forever, args=(official_index, crawler), name="web-crawler", daemon=True).start()
+        _crawler_pid = os.getpid()
+
+@app.before_request
+def start_workers():
+    ensure_workers()
+
+# ===================== SIKLUS HIDUP PROSES =====================
+# Mengimpor modul ini hanya memuat data; bagian runtime (thread, session HTTP)
+# dimulai per worker. Dengan gunicorn --preload (lihat gunicorn.conf.py) master
+# memanggil warm_up() dan release_connections() sebelum fork, lalu setiap
+# worker memanggil start_runtime().
+def warm_up():
+    """Bangun indeks pengetahuan dan BM25 sekarang agar dibagi copy-on-write ke worker"""
+    refresh_knowledge(knowledge_db)
+    get_retriever(knowledge_db)
+
+def release_connections():
+    """Tutup koneksi SQLite proses ini; worker hasil fork membuka koneksinya sendiri"""
+    for resource in (knowledge_db, search_cache, groq_cache, conversation_memory, message_queue, official_index,
+                     webhook_dedup):
+        close = getattr(resource, 'close', None)
+        if close is not None:
+            close()
+
+def start_runtime():
+    """Mulai thread pengirim, worker respons, dan session HTTP di proses worker"""
+    ensure_workers()
+    for name in ('wati', 'groq', 'serpapi'):
+        http_client.get_session(name)
 
 # ===================== ENDPOINT UTAMA =====================
+# Dengan CACHE_DB tabel dedup dipakai bersama semua worker
+webhook_dedup = make_dedup(WEBHOOK_DEDUP_WINDOW, WEBHOOK_DEDUP_MAX, CACHE_DB)
+
+def webhook_reply(status, code, error=None):
+    """Balasan webhook sekaligus mencatat statusnya ke metrik"""
+    webhook_total.inc(status)
+    return jsonify({"error": error} if error else {"status": status}), code
+
+def webhook_event_key(data, payload):
+    """Kunci idempotensi: id pesan WATI, atau hash isi payload jika tidak ada"""
+    for source in (payload, data):
+        for field in ('whatsappMessageId', 'messageId', 'id'):
+            value = source.get(field)
+            if value:
+                return f"id:{value}"
+    canonical = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return "hash:" + hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
 @app.route('/webhook', methods=['POST'])
 def webhook():
     """Endpoint utama untuk webhook WATI"""
@@ -428,37 +1019,120 @@ def webhook():
         
         # Hanya tangani event message
         if event_type != 'message':
-            return jsonify({"status": "ignored"}), 200
+            return webhook_reply("ignored", 200)
         
         payload = data.get('payload', {})
         incoming_msg = payload.get('text', '').strip()
         from_number = payload.get('from', '').strip()
         
         if not incoming_msg or not from_number:
-            return jsonify({"error": "Invalid payload"}), 400
+            return webhook_reply("invalid", 400, error="Invalid payload")
         
-        logger.info(f"Pesan masuk dari {from_number}: {incoming_msg}")
+        # Event yang dikirim ulang WATI tidak diproses dua kali
+        event_key = webhook_event_key(data, payload)
+        if not webhook_dedup.check_and_add(event_key):
+            logger.info(f"Event duplikat diabaikan ({event_key})", extra={'phone': from_number})
+            return webhook_reply("duplicate", 200)
         
-        # Process message
-        bot_response = generate_ai_response(incoming_msg, from_number)
+        logger.info("Pesan masuk", extra={'phone': from_number, 'text': incoming_msg})
         
-        # Masukkan ke antrian pengiriman (prioritas tinggi)
-        message_data = {
-            'id': str(uuid.uuid4()),
-            'to': from_number,
-            'body': bot_response,
-            'attempt': 0
-        }
-        message_queue.put((1, message_data))  # Prioritas tinggi
-        logger.info(f"Pesan dimasukkan ke antrian: {message_data['id']}")
+        if ASYNC_WEBHOOK:
+            if response_queue.full():
+                webhook_dedup.discard(event_key)
+                logger.warning(f"Antrian respons penuh ({RESPONSE_QUEUE_SIZE}), pesan ditolak sementara", extra={'phone': from_number})
+                return webhook_reply("busy", 503)
+            
+            if burst_coalescer is not None:
+                if incoming_msg.startswith("/"):
+                    # Perintah admin tidak digabung; kirim dulu fragmen yang tertunda
+                    burst_coalescer.flush(from_number)
+                else:
+                    burst_coalescer.add(from_number, incoming_msg)
+                    return webhook_reply("queued", 200)
+            
+            # Serahkan ke pool worker dan segera balas WATI
+            try:
+                response_queue.put((incoming_msg, from_number), timeout=RESPONSE_QUEUE_TIMEOUT)
+            except Full:
+                # Kiriman ulang nanti harus tetap diterima
+                webhook_dedup.discard(event_key)
+                logger.warning(f"Antrian respons penuh ({RESPONSE_QUEUE_SIZE}), pesan ditolak sementara", extra={'phone': from_number})
+                return webhook_reply("busy", 503)
+            return webhook_reply("queued", 200)
+        
+        # Mode sinkron: proses langsung di thread request
+        # Balasan yang gagal masuk antrian juga harus boleh dikirim ulang WATI
+        try:
+            bot_response = generate_ai_response(incoming_msg, from_number)
+            deliver_reply(from_number, bot_response)
+        except Exception:
+            webhook_dedup.discard(event_key)
+            raise
         
-        return jsonify({"status": "processed"}), 200
+        return webhook_reply("processed", 200)
     
     except Exception as e:
         logger.error(f"Webhook error: {str(e)}", exc_info=True)
-        return jsonify({"error": "Internal server error"}), 500
+        return webhook_reply("error", 500, error="Internal server error")
+
+# ===================== ENDPOINT MONITORING =====================
+def is_monitoring_path(path):
+    return path == '/metrics' or path.startswith('/stats/')
+
+def monitoring_authorized(authorization):
+    """True jika header Authorization membawa MONITORING_TOKEN"""
+    if not MONITORING_TOKEN:
+        return False
+    return hmac.compare_digest((authorization or '').encode('utf-8'), f"Bearer {MONITORING_TOKEN}".encode('utf-8'))
+
+@app.before_request
+def require_monitoring_token():
+    if is_monitoring_path(request.path) and not monitoring_authorized(request.headers.get('Authorization')):
+        return jsonify({"error": "Unauthorized"}), 401
+
+# Gauge dibaca saat /metrics diminta, tanpa biaya di jalur pesan
+registry.gauge("chatbot_message_queue_depth", "Jumlah pesan di antrian pengiriman", lambda: message_queue.qsize())
+registry.gauge("chatbot_response_queue_depth", "Jumlah pesan menunggu worker respons", lambda: response_queue.qsize())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Metrik dalam format teks Prometheus"""
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/stats/queue', methods=['GET'])
+def queue_stats():
+    """Statistik antrian pengiriman untuk monitoring"""
+    stats = message_queue.stats()
+    stats['response_queue_depth'] = response_queue.qsize()
+    stats['webhook_dedup'] = webhook_dedup.stats()
+    if burst_coalescer is not None:
+        stats['burst_coalescer'] = burst_coalescer.stats()
+    return jsonify(stats), 200
+
+@app.route('/stats/http', methods=['GET'])
+def http_stats():
+    """Statistik koneksi dan latensi per host upstream"""
+    return jsonify(http_client.get_stats()), 200
+
+@app.route('/stats/breakers', methods=['GET'])
+def breaker_stats():
+    """Status circuit breaker dan timeout adaptif per upstream"""
+    return jsonify(circuit_breaker.get_stats()), 200
+
+@app.route('/stats/cache', methods=['GET'])
+def cache_stats():
+    """Statistik hit/miss cache"""
+    return jsonify({
+        'search': search_cache.stats(),
+        'groq': groq_cache.stats(),
+        'search_singleflight': search_flight.stats(),
+        'groq_singleflight': groq_flight.stats(),
+        'conversations': conversation_memory.stats(),
+        'official_index': official_index.stats() if official_index is not None else None,
+    }), 200
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
     logger.info(f"Starting DISNAKER Chatbot on port {port}")
+    start_runtime()
     app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,484 @@
+"""Mode penyajian ASGI (asyncio) untuk /webhook.
+
+Urutan cabang sama persis dengan app.generate_ai_response karena keduanya
+menjalankan generator app.route_steps; bedanya, panggilan Groq, SerpAPI, dan
+WATI di sini memakai klien HTTP async sehingga ratusan panggilan upstream bisa
+berjalan bersamaan dalam satu proses tanpa menahan thread worker.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8080 --workers 4
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker -w 4
+
+Entry point Flask (gunicorn app:app) tetap tersedia seperti sebelumnya.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+
+import app as chatbot
+import async_http_client
+import http_client
+import circuit_breaker
+from circuit_breaker import CircuitOpenError
+from cache import AsyncSingleFlight
+from coalescer import BurstCoalescer
+from metrics import registry
+from streaming import parse_stream_line, STREAM_DONE
+
+logger = logging.getLogger(__name__)
+
+# Batas pesan yang sedang dibuatkan balasan; jika penuh webhook membalas 503
+ASGI_MAX_INFLIGHT = int(os.getenv("ASGI_MAX_INFLIGHT", "1000"))
+# Jumlah pengiriman WATI yang boleh berjalan bersamaan
+ASGI_SEND_CONCURRENCY = int(os.getenv("ASGI_SEND_CONCURRENCY", "32"))
+
+search_flight = AsyncSingleFlight(timeout=chatbot.SEARCH_FLIGHT_TIMEOUT)
+groq_flight = AsyncSingleFlight(timeout=chatbot.GROQ_FLIGHT_TIMEOUT)
+
+async def offload(blocking, func, *args):
+    """Jalankan func di thread jika memakai SQLite (`blocking`), langsung jika hanya memori.
+
+    Satu penulis SQLite yang lambat (busy timeout hingga 10 detik) tidak boleh
+    menahan seluruh koneksi di event loop.
+    """
+    if blocking:
+        return await asyncio.to_thread(func, *args)
+    return func(*args)
+
+# ===================== PANGGILAN UPSTREAM ASYNC =====================
+async def perform_official_web_search(query):
+    """Padanan async app.perform_official_web_search (indeks lokal dan cache yang sama)"""
+    result = await offload(chatbot.official_index is not None, chatbot.search_official_index, query)
+    if result:
+        return result
+    cache_key = chatbot.search_cache_key(query)
+    cached = await offload(chatbot.CACHE_DB, chatbot.search_cache.get, cache_key)
+    if cached is not None:
+        return cached
+
+    async def search_and_cache():
+        result = await search_official_web(query)
+        if result:
+            await offload(chatbot.CACHE_DB, chatbot.search_cache.set, cache_key, result)
+        return result
+
+    return await search_flight.do(cache_key, search_and_cache)
+
+async def search_official_web(query):
+    """Panggil SerpAPI dengan filter domain resmi"""
+    if not os.getenv("WEB_SEARCH_API_KEY"):
+        logger.error("API key pencarian web tidak tersedia")
+        return None
+
+    try:
+        response = await async_http_client.request(
+            'serpapi', 'GET', chatbot.SERPAPI_URL, params=chatbot.build_search_params(query)
+        )
+        return chatbot.select_search_result(response.json())
+    except CircuitOpenError as e:
+        logger.warning(f"Web search dilewati: {str(e)}")
+    except Exception as e:
+        logger.error(f"Web search error: {str(e)}")
+
+    return None
+
+async def generate_groq_response(user_message, from_number=None):
+    """Padanan async app.generate_groq_response (cache dan riwayat percakapan yang sama)"""
+    if not chatbot.GROQ_API_KEY:
+        return chatbot.GROQ_MAINTENANCE_MESSAGE
+
+    history = await offload(chatbot.CONVERSATION_DB, chatbot.conversation_history, from_number)
+    if history:
+        return await request_groq_reply(user_message, history, from_number)
+
+    cache_key = chatbot.normalize_text(user_message)
+    if cache_key:
+        cached = await offload(chatbot.CACHE_DB, chatbot.groq_cache.get, cache_key)
+        if cached is not None:
+            return cached
+
+    async def complete_and_cache():
+        reply = await request_groq_reply(user_message, (), from_number)
+        if cache_key and reply not in chatbot.GROQ_FAILURE_MESSAGES and getattr(reply, 'complete', True):
+            await offload(chatbot.CACHE_DB, chatbot.groq_cache.set, cache_key, str(reply))
+        return reply
+
+    if not cache_key:
+        return await complete_and_cache()
+    return await groq_flight.do(cache_key, complete_and_cache)
+
+async def request_groq_reply(user_message, history=(), from_number=None):
+    if chatbot.GROQ_STREAMING and from_number:
+        return await stream_groq_completion(user_message, history, from_number)
+    return await request_groq_completion(user_message, history)
+
+async def stream_groq_completion(user_message, history, to):
+    """Padanan async app.stream_groq_completion"""
+    headers, payload = chatbot.build_groq_request(user_message, history, stream=True)
+    delivery = chatbot.StreamDelivery(to)
+
+    async def emit(chunks):
+        for chunk in chunks:
+            await enqueue_reply(to, chunk)
+            delivery.mark_sent()
+
+    try:
+        response = await async_http_client.request(
+            'groq', 'POST', chatbot.GROQ_API_URL, json=payload, headers=headers,
+            stream=True, defer_breaker=True
+        )
+        # Stream yang putus atau berakhir tanpa [DONE] dihitung gagal oleh breaker
+        done = local_error = False
+        try:
+            if response.status_code != 200:
+                done = True
+                await response.aread()
+                return chatbot.read_groq_reply(response)
+            async for line in response.aiter_lines():
+                delta = parse_stream_line(line)
+                if delta is STREAM_DONE:
+                    done = True
+                    break
+                if delta:
+                    try:
+                        await emit(delivery.feed(delta))
+                    except Exception:
+                        local_error = True  # antrian kirim lokal gagal, bukan Groq
+                        raise
+        finally:
+            http_client.finish_stream(response, failed=not (done or local_error))
+            await response.aclose()
+        if not done:
+            raise IOError("stream Groq berakhir tanpa [DONE]")
+        await emit(delivery.flush())
+        return delivery.finish()
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        logger.error(f"Groq stream exception: {str(e)}")
+        if delivery.sent:
+            await emit(delivery.flush())
+        return delivery.finish(complete=False)
+
+async def request_groq_completion(user_message, history=()):
+    """Kirim satu permintaan chat completion ke Groq"""
+    headers, payload = chatbot.build_groq_request(user_message, history)
+    try:
+        response = await async_http_client.request(
+            'groq', 'POST', chatbot.GROQ_API_URL, json=payload, headers=headers
+        )
+        return chatbot.read_groq_reply(response)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        logger.error(f"Groq API exception: {str(e)}")
+        return chatbot.GROQ_BUSY_MESSAGE
+
+async def send_wati_message(to, message_body):
+    """Kirim pesan melalui API WATI"""
+    url, headers, payload = chatbot.build_wati_request(to, message_body)
+    try:
+        response = await async_http_client.request('wati', 'POST', url, json=payload, headers=headers)
+        return chatbot.wati_send_succeeded(to, response)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        logger.error(f"WATI API exception: {str(e)}")
+        return False
+
+UPSTREAM_STEPS = {
+    'web_search': perform_official_web_search,
+    'groq': generate_groq_response,
+}
+
+# ===================== GENERASI RESPONS =====================
+def _advance(steps, result, error):
+    """Jalankan route_steps sampai permintaan upstream berikutnya: (langkah, None) atau (None, hasil akhir)"""
+    try:
+        return (steps.throw(error) if error else steps.send(result)), None
+    except StopIteration as done:
+        # StopIteration tidak boleh keluar dari thread ke Future asyncio
+        return None, done.value
+
+async def route_message(user_message, from_number):
+    """Jalankan app.route_steps dengan panggilan upstream async.
+
+    Langkah lokal di antara panggilan upstream (refresh dan pencarian basis data
+    pengetahuan, pembangunan ulang indeks BM25, perintah admin /update yang
+    menulis ke SQLite) berjalan di thread agar tidak memblokir event loop.
+    """
+    steps = chatbot.route_steps(user_message, from_number)
+    result, error = None, None
+    while True:
+        step, outcome = await asyncio.to_thread(_advance, steps, result, error)
+        if step is None:
+            return outcome
+        stage, *arguments = step
+        result, error = None, None
+        try:
+            with chatbot.stage_latency.time(stage):
+                result = await UPSTREAM_STEPS[stage](*arguments)
+        except CircuitOpenError as e:
+            error = e
+
+async def generate_ai_response(user_message, from_number):
+    """Padanan async app.generate_ai_response"""
+    start = time.perf_counter()
+    branch, response = await route_message(user_message, from_number)
+    chatbot.branch_latency.observe(time.perf_counter() - start, branch)
+    chatbot.branch_total.inc(branch)
+    # Riwayat SQLite menulis dalam transaksi, jadi jangan blokir event loop
+    await offload(chatbot.CONVERSATION_DB, chatbot.remember_exchange, from_number, branch, user_message, response)
+    return response
+
+async def deliver_reply(to, response):
+    if isinstance(response, chatbot.DeliveredReply) and response.to == to:
+        return None
+    return await enqueue_reply(to, str(response))
+
+async def enqueue_reply(to, message_body):
+    # Antrian SQLite menunggu commit ke disk, jadi jangan blokir event loop
+    return await offload(chatbot.OUTBOUND_QUEUE_DB, chatbot.enqueue_reply, to, message_body)
+
+async def respond(incoming_msg, from_number):
+    """Buat balasan satu pesan lalu masukkan ke antrian pengiriman"""
+    try:
+        bot_response = await generate_ai_response(incoming_msg, from_number)
+        await deliver_reply(from_number, bot_response)
+    except Exception as e:
+        logger.error(f"Response task error: {str(e)}", exc_info=True)
+
+_loop = None
+_inflight = set()   # task pembuatan balasan yang sedang berjalan
+_sending = set()    # task pengiriman WATI yang sedang berjalan
+_sender_task = None
+
+def spawn_response(incoming_msg, from_number):
+    task = _loop.create_task(respond(incoming_msg, from_number))
+    _inflight.add(task)
+    task.add_done_callback(_inflight.discard)
+
+def submit_coalesced(from_number, merged_msg):
+    """Dipanggil dari thread timer coalescer; jadwalkan balasan di event loop"""
+    _loop.call_soon_threadsafe(spawn_response, merged_msg, from_number)
+
+burst_coalescer = None
+if chatbot.ASYNC_WEBHOOK and chatbot.BURST_WINDOW_MS > 0:
+    burst_coalescer = BurstCoalescer(
+        submit_coalesced,
+        window=chatbot.BURST_WINDOW_MS / 1000,
+        max_wait=chatbot.BURST_MAX_WAIT_MS / 1000,
+        max_fragments=chatbot.BURST_MAX_FRAGMENTS,
+        max_active=chatbot.BURST_MAX_ACTIVE
+    )
+
+# ===================== PENGIRIMAN WATI ASYNC =====================
+async def message_sender():
+    """Ambil pesan dari antrian dan kirim, paling banyak ASGI_SEND_CONCURRENCY bersamaan"""
+    slots = asyncio.Semaphore(ASGI_SEND_CONCURRENCY)
+    while True:
+        await slots.acquire()
+        try:
+            # Antrian memakai kunci thread; tunggu di thread terpisah agar loop tetap bebas
+            item = await asyncio.to_thread(chatbot.message_queue.get, 1.0)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            slots.release()
+            logger.error(f"Sender error: {str(e)}")
+            await asyncio.sleep(5)
+            continue
+        if item is None:
+            slots.release()
+            continue
+        task = asyncio.create_task(send_one(item[1], slots))
+        _sending.add(task)
+        task.add_done_callback(_sending.discard)
+
+async def send_one(message_data, slots):
+    success = False
+    defer = None
+    try:
+        start = time.perf_counter()
+        success = await send_wati_message(message_data['to'], message_data['body'])
+        chatbot.record_send(time.perf_counter() - start, success)
+    except CircuitOpenError as e:
+        defer = e.retry_after
+    except Exception as e:
+        logger.error(f"Sender error: {str(e)}")
+    finally:
+        chatbot.settle_send(message_data, success, defer)
+        slots.release()
+
+def ensure_runtime():
+    """Mulai task pengirim di event loop yang sedang berjalan (sekali per loop)"""
+    global _loop, _sender_task
+    loop = asyncio.get_running_loop()
+    if _loop is loop:
+        return
+    _loop = loop
+    _sender_task = loop.create_task(message_sender())
+    chatbot.ensure_crawler()
+    registry.ensure_flusher()
+
+async def shutdown_runtime():
+    if _sender_task is not None:
+        _sender_task.cancel()
+    await async_http_client.aclose()
+
+# ===================== ENDPOINT =====================
+def json_response(payload, code=200):
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+    return code, 'application/json', body
+
+def webhook_reply(status, code, error=None):
+    """Balasan webhook sekaligus mencatat statusnya ke metrik"""
+    chatbot.webhook_total.inc(status)
+    return json_response({"error": error} if error else {"status": status}, code)
+
+async def webhook(body):
+    """Endpoint utama untuk webhook WATI (validasi dan dedup sama dengan versi Flask)"""
+    try:
+        data = json.loads(body)
+        event_type = data.get('eventType', '')
+
+        if event_type != 'message':
+            return webhook_reply("ignored", 200)
+
+        payload = data.get('payload', {})
+        incoming_msg = payload.get('text', '').strip()
+        from_number = payload.get('from', '').strip()
+
+        if not incoming_msg or not from_number:
+            return webhook_reply("invalid", 400, error="Invalid payload")
+
+        event_key = chatbot.webhook_event_key(data, payload)
+        # Dengan CACHE_DB tabel dedup ada di SQLite bersama
+        if not await offload(chatbot.CACHE_DB, chatbot.webhook_dedup.check_and_add, event_key):
+            logger.info(f"Event duplikat diabaikan ({event_key})", extra={'phone': from_number})
+            return webhook_reply("duplicate", 200)
+
+        logger.info("Pesan masuk", extra={'phone': from_number, 'text': incoming_msg})
+
+        if chatbot.ASYNC_WEBHOOK:
+            if len(_inflight) >= ASGI_MAX_INFLIGHT:
+                await offload(chatbot.CACHE_DB, chatbot.webhook_dedup.discard, event_key)
+                logger.warning(f"Balasan yang diproses penuh ({ASGI_MAX_INFLIGHT}), pesan ditolak sementara", extra={'phone': from_number})
+                return webhook_reply("busy", 503)
+
+            if burst_coalescer is not None:
+                if incoming_msg.startswith("/"):
+                    burst_coalescer.flush(from_number)
+                else:
+                    burst_coalescer.add(from_number, incoming_msg)
+                    return webhook_reply("queued", 200)
+
+            spawn_response(incoming_msg, from_number)
+            return webhook_reply("queued", 200)
+
+        # Mode sinkron: balasan dibuat sebelum webhook dijawab
+        try:
+            bot_response = await generate_ai_response(incoming_msg, from_number)
+            await deliver_reply(from_number, bot_response)
+        except Exception:
+            await offload(chatbot.CACHE_DB, chatbot.webhook_dedup.discard, event_key)
+            raise
+        return webhook_reply("processed", 200)
+
+    except Exception as e:
+        logger.error(f"Webhook error: {str(e)}", exc_info=True)
+        return webhook_reply("error", 500, error="Internal server error")
+
+registry.gauge("chatbot_asgi_inflight_responses", "Jumlah balasan yang sedang dibuat (mode ASGI)", lambda: len(_inflight))
+
+async def metrics(body):
+    return 200, 'text/plain; version=0.0.4; charset=utf-8', registry.render().encode('utf-8')
+
+async def queue_stats(body):
+    stats = chatbot.message_queue.stats()
+    stats['inflight_responses'] = len(_inflight)
+    stats['inflight_sends'] = len(_sending)
+    stats['webhook_dedup'] = chatbot.webhook_dedup.stats()
+    if burst_coalescer is not None:
+        stats['burst_coalescer'] = burst_coalescer.stats()
+    return json_response(stats)
+
+async def http_stats(body):
+    return json_response(http_client.get_stats())
+
+async def breaker_stats(body):
+    return json_response(circuit_breaker.get_stats())
+
+async def cache_stats(body):
+    return json_response({
+        'search': chatbot.search_cache.stats(),
+        'groq': chatbot.groq_cache.stats(),
+        'search_singleflight': search_flight.stats(),
+        'groq_singleflight': groq_flight.stats(),
+        'conversations': chatbot.conversation_memory.stats(),
+        'official_index': chatbot.official_index.stats() if chatbot.official_index is not None else None,
+    })
+
+async def unauthorized(body):
+    return json_response({"error": "Unauthorized"}, 401)
+
+ROUTES = {
+    ('POST', '/webhook'): webhook,
+    ('GET', '/metrics'): metrics,
+    ('GET', '/stats/queue'): queue_stats,
+    ('GET', '/stats/http'): http_stats,
+    ('GET', '/stats/breakers'): breaker_stats,
+    ('GET', '/stats/cache'): cache_stats,
+}
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            ensure_runtime()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await shutdown_runtime()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    """Aplikasi ASGI"""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    ensure_runtime()
+    handler = ROUTES.get((scope['method'], scope['path']))
+    if handler is not None and chatbot.is_monitoring_path(scope['path']):
+        authorization = dict(scope['headers']).get(b'authorization', b'').decode('latin-1')
+        if not chatbot.monitoring_authorized(authorization):
+            handler = unauthorized
+    if handler is None:
+        allowed = any(path == scope['path'] for _, path in ROUTES)
+        code, content_type, body = json_response({"error": "Method not allowed" if allowed else "Not found"}, 405 if allowed else 404)
+    else:
+        code, content_type, body = await handler(await _read_body(receive))
+    await send({
+        'type': 'http.response.start',
+        'status': code,
+        'headers': [(b'content-type', content_type.encode('latin-1')), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+if __name__ == '__main__':
+    import uvicorn
+    port = int(os.environ.get('PORT', 8080))
+    logger.info(f"Starting DISNAKER Chatbot (ASGI) on port {port}")
+    uvicorn.run("asgi:app", host='0.0.0.0', port=port)
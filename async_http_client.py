@@ -0,0 +1,94 @@
+import os
+import time
+import asyncio
+import logging
+from urllib.parse import urlparse
+
+import httpx
+
+import http_client
+from metrics import upstream_latency
+from circuit_breaker import get_breaker
+
+logger = logging.getLogger(__name__)
+# httpx mencatat setiap request di level INFO; latensi sudah tercatat di metrik
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# ===================== KONFIGURASI KONEKSI =====================
+# Timeout sama dengan klien sinkron (HTTP_TIMEOUT_<NAMA>, HTTP_CONNECT_TIMEOUT).
+# Satu proses async bisa menahan ratusan panggilan sekaligus, jadi pool-nya lebih
+# besar; atur lewat ASYNC_HTTP_POOL_SIZE atau ASYNC_HTTP_POOL_SIZE_<NAMA>
+ASYNC_HTTP_POOL_SIZE = int(os.getenv("ASYNC_HTTP_POOL_SIZE", "200"))
+
+def _pool_size_for(name):
+    return int(os.getenv(f"ASYNC_HTTP_POOL_SIZE_{name.upper()}", ASYNC_HTTP_POOL_SIZE))
+
+# ===================== KLIEN PER EVENT LOOP =====================
+# httpx.AsyncClient terikat pada event loop tempat koneksinya dibuat
+_clients = {}  # nama upstream -> (loop, AsyncClient)
+
+def get_client(name):
+    """Ambil AsyncClient keep-alive untuk upstream `name` di event loop yang sedang berjalan"""
+    loop = asyncio.get_running_loop()
+    entry = _clients.get(name)
+    if entry is not None and entry[0] is loop:
+        return entry[1]
+    pool_size = _pool_size_for(name)
+    client = httpx.AsyncClient(
+        timeout=httpx.Timeout(http_client.timeout_for(name), connect=http_client.HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    )
+    _clients[name] = (loop, client)
+    logger.info(f"Klien HTTP async '{name}' dibuat (pool {pool_size})")
+    return client
+
+async def request(name, method, url, stream=False, defer_breaker=False, **kwargs):
+    """Padanan async dari http_client.request: breaker, timeout, dan pencatatan latensi yang sama.
+
+    Dengan stream=True body belum dibaca; pemanggil wajib menutupnya dengan aclose().
+    defer_breaker=True menunda hasil breaker sampai http_client.finish_stream dipanggil.
+    """
+    breaker = get_breaker(name)
+    breaker.allow()
+    kwargs.setdefault('timeout', httpx.Timeout(
+        breaker.timeout(http_client.timeout_for(name)), connect=http_client.HTTP_CONNECT_TIMEOUT
+    ))
+    client = get_client(name)
+    host = urlparse(url).hostname or url
+    connection = _ConnectionTrace()
+    start = time.perf_counter()
+    status_code = None
+    try:
+        request = client.build_request(method, url, extensions={'trace': connection.trace}, **kwargs)
+        response = await client.send(request, stream=stream)
+        status_code = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        if defer_breaker and not http_client.is_failure(status_code):
+            response.breaker_outcome = http_client.StreamOutcome(breaker, elapsed)
+        else:
+            breaker.record(http_client.is_failure(status_code), elapsed)
+        http_client.record_latency(host, elapsed, status_code is None)
+        http_client.record_connection(host, connection.new)
+        upstream_latency.observe(elapsed, name, f"{status_code // 100}xx" if status_code else 'error')
+
+class _ConnectionTrace:
+    """Deteksi lewat trace httpcore apakah request membuka koneksi TCP baru"""
+
+    __slots__ = ('new',)
+
+    def __init__(self):
+        self.new = False
+
+    async def trace(self, event_name, info):
+        if event_name == 'connection.connect_tcp.complete':
+            self.new = True
+
+async def aclose():
+    """Tutup semua klien milik event loop yang sedang berjalan"""
+    loop = asyncio.get_running_loop()
+    for name, (client_loop, client) in list(_clients.items()):
+        if client_loop is loop:
+            await client.aclose()
+            _clients.pop(name, None)
@@ -0,0 +1,95 @@
+"""Benchmark crawler dan indeks lokal situs resmi terhadap situs tiruan.
+
+Langkah yang diukur:
+1. crawl pertama (semua halaman diambil dan diindeks),
+2. crawl ulang tanpa perubahan (GET bersyarat, harus dijawab 304),
+3. crawl ulang setelah satu halaman diubah dan satu dihapus,
+4. latensi pencarian indeks lokal dibanding panggilan SerpAPI (stub dengan
+   latensi --latency-serpapi).
+
+Jalankan: python benchmarks/bench_crawler.py [--pages 60] [--latency-serpapi 0.8]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import requests  # noqa: E402
+
+from fixture_site import FixtureSite  # noqa: E402
+from stub_servers import StubCluster, StubConfig  # noqa: E402
+from web_index import Crawler, WebIndex  # noqa: E402
+
+QUESTIONS = [
+    ("syarat membuat kartu kuning ak1", "Kartu Kuning"),
+    ("bagaimana prosedur mediasi perselisihan hubungan industrial", "Mediasi"),
+    ("pelatihan kerja gratis di balai latihan kerja", "Pelatihan"),
+    ("cara daftar program transmigrasi", "Transmigrasi"),
+    ("berapa upah minimum kabupaten", "Upah"),
+    ("uang pesangon setelah pemutusan hubungan kerja", "Pesangon"),
+    ("jadwal konser musik akhir pekan", None),
+]
+
+def crawl_round(label, crawler, site):
+    before = site.counts()
+    start = time.perf_counter()
+    counts = crawler.crawl_once()
+    elapsed = time.perf_counter() - start
+    after = site.counts()
+    served = {status: after[status] - before[status] for status in after}
+    print(f"{label:<28}{elapsed:>7.2f}s  crawler {counts}  situs {served}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=60)
+    parser.add_argument('--latency-serpapi', type=float, default=0.8)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    site = FixtureSite(args.pages).start()
+    cluster = StubCluster(serpapi=StubConfig(args.latency_serpapi)).start()
+    index = WebIndex(os.path.join(tempfile.mkdtemp(prefix='bench-crawler-'), 'web_index.sqlite3'))
+    # refresh besar: crawl awal hanya mengambil halaman yang belum pernah diambil
+    crawler = Crawler(index, [site.server_address[0]], seeds=[site.url()], max_pages=10 * args.pages,
+                      max_depth=args.pages, delay=0, refresh=3600)
+    try:
+        crawl_round('crawl awal', crawler, site)
+        print(f"indeks: {index.stats()}")
+        # Setelah ini semua halaman dianggap kedaluwarsa dan diperiksa ulang dengan GET bersyarat
+        crawler.refresh = 0
+        crawl_round('crawl ulang tanpa perubahan', crawler, site)
+        site.update(3, "Syarat Pembuatan Kartu Kuning (AK1) terbaru", "Kini cukup membawa KTP elektronik.")
+        site.remove(5)
+        crawl_round('1 diubah, 1 dihapus', crawler, site)
+        print(f"indeks akhir: {index.stats()}")
+        print()
+
+        for question, expected in QUESTIONS:
+            result = index.lookup(question)
+            title = result['title'] if result else None
+            ok = (title is None) if expected is None else (title is not None and expected in title)
+            print(f"{'OK ' if ok else 'X  '}{question:<58} -> {title}")
+        print()
+
+        start = time.perf_counter()
+        for i in range(args.queries):
+            index.lookup(QUESTIONS[i % len(QUESTIONS)][0])
+        local = (time.perf_counter() - start) / args.queries
+        session = requests.Session()
+        start = time.perf_counter()
+        serp_calls = max(1, min(args.queries, 10))
+        for i in range(serp_calls):
+            session.get(cluster.url('serpapi') + '/search', params={'q': QUESTIONS[i % len(QUESTIONS)][0]})
+        serpapi = (time.perf_counter() - start) / serp_calls
+        print(f"pencarian indeks lokal: {local * 1000:.2f} ms/kueri; SerpAPI (stub): {serpapi * 1000:.1f} ms/kueri")
+    finally:
+        site.stop()
+        cluster.stop()
+
+if __name__ == '__main__':
+    main()
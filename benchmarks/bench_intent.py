@@ -0,0 +1,96 @@
+"""Microbenchmark router intent vs kaskade pencocokan substring lama.
+
+Jalankan: python benchmarks/bench_intent.py [jumlah_iterasi]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app membuka basis data bawaan saat diimpor; arahkan ke direktori sementara agar tidak
+# menulis knowledge_db.sqlite3 dan web_index.sqlite3 ke direktori kerja
+WORKDIR = tempfile.mkdtemp(prefix="bench-intent-")
+os.environ.setdefault("KNOWLEDGE_FILE", os.path.join(WORKDIR, "knowledge_db.json"))
+os.environ.setdefault("KNOWLEDGE_DB", os.path.join(WORKDIR, "knowledge_db.sqlite3"))
+os.environ.setdefault("WEB_INDEX_DB", os.path.join(WORKDIR, "web_index.sqlite3"))
+
+import app  # noqa: E402
+
+MESSAGES = [
+    "Selamat pagi, mau tanya",
+    "terima kasih banyak infonya",
+    "Bagaimana cara daftar SIAPkerja?",
+    "alamat kantor disnaker dimana ya",
+    "tolong sharelock kantornya",
+    "saya kena PHK tanpa pesangon, harus bagaimana?",
+    "apa syarat membuat kartu kuning untuk melamar kerja hingga diterima",
+    "berapa lama proses pembuatan ak1",
+    "apakah ada lowongan kerja di bartim bulan ini",
+    "kalau untuk yang itu syaratnya apa?",
+    "hingga kapan pendaftaran pelatihan dibuka",
+    "mohon informasi peraturan upah minimum kabupaten",
+]
+
+def cascade(message):
+    """Kaskade lama: setiap pemeriksaan melakukan lower() dan scan substring sendiri"""
+    lower = message.lower()
+    if any(k in lower for k in app.GREETING_KEYWORDS):
+        return 'greeting'
+    if any(k in lower for k in app.GRATITUDE_KEYWORDS):
+        return 'gratitude'
+    if "siapkerja" in lower:
+        return 'siapkerja'
+    if "lokasi" in lower or "alamat" in lower or "maps" in lower:
+        return 'location'
+    if "sharelock" in lower or "bagikan lokasi" in lower:
+        return 'sharelock'
+    if any(k in lower for k in app.INDUSTRIAL_KEYWORDS):
+        return 'industrial'
+    if any(k in message.lower() for k in app.WEB_SEARCH_TRIGGERS):
+        return 'web_search'
+    return None
+
+ALL_TRIGGER_LISTS = [
+    app.GREETING_KEYWORDS, app.GRATITUDE_KEYWORDS, ['siapkerja'], app.LOCATION_KEYWORDS,
+    app.SHARELOCK_KEYWORDS, app.INDUSTRIAL_KEYWORDS, app.WEB_SEARCH_TRIGGERS,
+    app.CONVERSATIONAL_KEYWORDS, app.DOMAIN_KEYWORDS,
+]
+
+def cascade_all_lists(message):
+    """Kaskade substring yang menilai semua daftar, setara dengan keluaran router"""
+    lower = message.lower()
+    return [any(k in lower for k in keywords) for keywords in ALL_TRIGGER_LISTS]
+
+ROUTE_ORDER = ('greeting', 'gratitude', 'siapkerja', 'location', 'sharelock', 'industrial', 'web_search')
+
+def routed(message):
+    intents = app.intent_router.match(message)
+    for name in ROUTE_ORDER:
+        if name in intents:
+            return name
+    return None
+
+def bench(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for message in MESSAGES:
+            fn(message)
+    return (time.perf_counter() - start) / (iterations * len(MESSAGES))
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    old = bench(cascade, iterations)
+    old_all = bench(cascade_all_lists, iterations)
+    new = bench(routed, iterations)
+    print(f"Kaskade lama (berhenti di cocok pertama) : {old * 1e6:.2f} us/pesan")
+    print(f"Kaskade semua daftar pemicu              : {old_all * 1e6:.2f} us/pesan")
+    print(f"Router intent (semua daftar, satu lintas): {new * 1e6:.2f} us/pesan")
+    print("\nPerbedaan keputusan (akibat pencocokan batas kata):")
+    for message in MESSAGES:
+        before, after = cascade(message), routed(message)
+        if before != after:
+            print(f"  {message!r}: {before} -> {after}")
+
+if __name__ == '__main__':
+    main()
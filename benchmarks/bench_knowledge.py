@@ -0,0 +1,88 @@
+"""Benchmark pencarian basis data pengetahuan: linear lama vs KnowledgeMatcher.
+
+Jalankan: python benchmarks/bench_knowledge.py [jumlah_entri] [pola_per_entri]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge import KnowledgeMatcher  # noqa: E402
+
+WORDS = [
+    'syarat', 'kartu', 'kuning', 'ak1', 'pelatihan', 'lowongan', 'kerja', 'pesangon',
+    'mediasi', 'transmigrasi', 'industri', 'dokumen', 'jadwal', 'biaya', 'pendaftaran',
+    'sertifikat', 'magang', 'bursa', 'upah', 'minimum', 'kontrak', 'cuti', 'lembur',
+]
+
+def linear_lookup(question, knowledge_db):
+    """Implementasi lama: regex baru untuk setiap pola di setiap pesan"""
+    question_lower = question.lower()
+    for key, data in knowledge_db.items():
+        for pattern in data['pertanyaan']:
+            if re.search(r'\b' + re.escape(pattern.lower()) + r'\b', question_lower):
+                return data['jawaban']
+    return None
+
+def build_db(entries, patterns_per_entry, rng):
+    knowledge_db = {}
+    for i in range(entries):
+        patterns = [
+            f"{rng.choice(WORDS)} {rng.choice(WORDS)} topik{i}x{j}"
+            for j in range(patterns_per_entry)
+        ]
+        knowledge_db[f"entri_{i}"] = {"pertanyaan": patterns, "jawaban": f"Jawaban {i}"}
+    return knowledge_db
+
+def build_questions(knowledge_db, count, rng):
+    keys = list(knowledge_db)
+    questions = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            pattern = rng.choice(knowledge_db[rng.choice(keys)]['pertanyaan'])
+            questions.append(f"mohon info {pattern} untuk saya")
+        else:
+            questions.append(" ".join(rng.choice(WORDS) for _ in range(8)))
+    return questions
+
+def timed(fn, questions):
+    start = time.perf_counter()
+    results = [fn(q) for q in questions]
+    return (time.perf_counter() - start) / len(questions), results
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    patterns_per_entry = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    rng = random.Random(42)
+    knowledge_db = build_db(entries, patterns_per_entry, rng)
+    questions = build_questions(knowledge_db, 200, rng)
+
+    start = time.perf_counter()
+    matcher = KnowledgeMatcher(knowledge_db)
+    build_time = time.perf_counter() - start
+
+    def indexed_lookup(question):
+        key = matcher.match(question)
+        return knowledge_db[key]['jawaban'] if key else None
+
+    linear_avg, linear_results = timed(lambda q: linear_lookup(q, knowledge_db), questions)
+    indexed_avg, indexed_results = timed(indexed_lookup, questions)
+    assert linear_results == indexed_results, "Hasil matcher berbeda dari pencarian linear"
+
+    pattern_count = len(matcher)
+    start = time.perf_counter()
+    matcher.update_entry("entri_0", ["pola baru hasil update"])
+    update_time = time.perf_counter() - start
+
+    print(f"Entri: {entries}, pola: {pattern_count}")
+    print(f"Bangun indeks     : {build_time * 1000:.1f} ms")
+    print(f"Update satu entri : {update_time * 1e6:.1f} us")
+    print(f"Linear per pesan  : {linear_avg * 1000:.3f} ms")
+    print(f"Matcher per pesan : {indexed_avg * 1000:.3f} ms")
+    print(f"Percepatan        : {linear_avg / indexed_avg:.0f}x")
+
+if __name__ == '__main__':
+    main()
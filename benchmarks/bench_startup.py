@@ -0,0 +1,128 @@
+"""Benchmark startup gunicorn: tanpa preload vs preload dengan indeks copy-on-write.
+
+Untuk setiap mode, gunicorn dijalankan dengan gunicorn.conf.py repo terhadap
+basis pengetahuan sintetis, lalu diukur waktu sampai semua worker siap, waktu
+siap per worker setelah fork, dan memori per worker dari /proc (RSS, PSS, dan
+USS = halaman privat). PSS membagi halaman bersama secara adil, jadi selisih
+PSS/USS antar mode menunjukkan memori yang benar-benar dihemat.
+
+Jalankan: python benchmarks/bench_startup.py [--workers 4] [--entries 3000]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+WORDS = [
+    'syarat', 'kartu', 'kuning', 'ak1', 'pelatihan', 'lowongan', 'kerja', 'pesangon',
+    'mediasi', 'transmigrasi', 'industri', 'dokumen', 'jadwal', 'biaya', 'pendaftaran',
+    'sertifikat', 'magang', 'bursa', 'upah', 'minimum', 'kontrak', 'cuti', 'lembur',
+]
+
+READY_RE = re.compile(r"Worker (\d+) siap dalam ([\d.]+) detik setelah fork")
+
+def build_knowledge(path, entries, rng):
+    knowledge_db = {}
+    for i in range(entries):
+        patterns = [f"{rng.choice(WORDS)} {rng.choice(WORDS)} topik{i}x{j}" for j in range(3)]
+        answer = " ".join(rng.choice(WORDS) for _ in range(40))
+        knowledge_db[f"entri_{i}"] = {"pertanyaan": patterns, "jawaban": f"Jawaban {i}: {answer}"}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(knowledge_db, f, ensure_ascii=False)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def memory_kb(pid):
+    """RSS, PSS, dan USS (Private_Clean + Private_Dirty) proses dalam kB"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    return fields['Rss'], fields['Pss'], fields['Private_Clean'] + fields['Private_Dirty']
+
+def run_mode(name, preload, args, env_base, workdir):
+    log_path = os.path.join(workdir, f"gunicorn-{name}.log")
+    env = dict(env_base, GUNICORN_PRELOAD='true' if preload else 'false')
+    command = [
+        sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+        '-w', str(args.workers), '-b', f"127.0.0.1:{free_port()}", '--log-level', 'info', 'app:app'
+    ]
+    start = time.perf_counter()
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        ready = {}
+        deadline = time.monotonic() + args.timeout
+        while len(ready) < args.workers:
+            if time.monotonic() > deadline or process.poll() is not None:
+                raise RuntimeError(f"mode '{name}' gagal siap, lihat {log_path}")
+            with open(log_path) as log:
+                ready = {int(pid): float(t) for pid, t in READY_RE.findall(log.read())}
+            time.sleep(0.02)
+        boot = time.perf_counter() - start
+        # Beri waktu worker menyelesaikan inisialisasi sebelum memori dibaca
+        time.sleep(args.settle)
+        memory = [memory_kb(pid) for pid in ready]
+        master = memory_kb(process.pid)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    avg = lambda values: sum(values) / len(values)
+    return {
+        'name': name,
+        'boot': boot,
+        'worker_ready': avg(list(ready.values())),
+        'rss': avg([m[0] for m in memory]) / 1024,
+        'pss': avg([m[1] for m in memory]) / 1024,
+        'uss': avg([m[2] for m in memory]) / 1024,
+        'total_pss': (sum(m[1] for m in memory) + master[1]) / 1024,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--entries', type=int, default=3000)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--settle', type=float, default=1.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-startup-')
+    env = dict(os.environ)
+    env.update({
+        'PYTHONPATH': ROOT + os.pathsep + env.get('PYTHONPATH', ''),
+        'KNOWLEDGE_FILE': os.path.join(workdir, 'knowledge_db.json'),
+        'KNOWLEDGE_DB': os.path.join(workdir, 'knowledge_db.sqlite3'),
+        'WEB_INDEX_DB': os.path.join(workdir, 'web_index.sqlite3'),
+    })
+    build_knowledge(env['KNOWLEDGE_FILE'], args.entries, random.Random(7))
+    # Isi SQLite sekali di luar pengukuran agar kedua mode memuat data yang sama
+    subprocess.run([sys.executable, '-c', 'import knowledge; knowledge.load_knowledge()'],
+                   cwd=workdir, env=env, check=True, capture_output=True)
+
+    results = [
+        run_mode('tanpa-preload', False, args, env, workdir),
+        run_mode('preload', True, args, env, workdir),
+    ]
+    print(f"{args.workers} worker, {args.entries} entri pengetahuan")
+    print(f"{'mode':<16}{'semua siap':>12}{'siap/worker':>13}{'RSS':>9}{'PSS':>9}{'USS':>9}{'total PSS':>11}")
+    for r in results:
+        print(f"{r['name']:<16}{r['boot']:>11.2f}s{r['worker_ready']:>12.3f}s"
+              f"{r['rss']:>8.1f}M{r['pss']:>8.1f}M{r['uss']:>8.1f}M{r['total_pss']:>10.1f}M")
+    print("(RSS/PSS/USS rata-rata per worker; total PSS termasuk master)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Evaluasi offline pencarian basis data pengetahuan pada set pertanyaan berlabel.
+
+Setiap baris file JSONL berisi {"question": ..., "expected": keyword atau null}.
+Pertanyaan lanjutan yang pendek dan ambigu (FOLLOW_UP_CASES) selalu ikut
+dievaluasi: semuanya harus diteruskan ke Groq, bukan dijawab lokal.
+Jalankan: python benchmarks/eval_retrieval.py [file_jsonl] [file_knowledge_json]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge import (  # noqa: E402
+    KNOWLEDGE_MIN_CONFIDENCE, KnowledgeMatcher, find_knowledge_entry,
+    get_retriever, initialize_default_knowledge,
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Hanya berbagi satu kata umum dengan beberapa entri yang hampir seri skornya
+FOLLOW_UP_CASES = [
+    {"question": "syaratnya apa ya", "expected": None},
+    {"question": "kalau untuk yang itu syaratnya apa?", "expected": None},
+    {"question": "terus syaratnya gimana kak", "expected": None},
+    {"question": "kalau daftarnya?", "expected": None},
+]
+
+def load_cases(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def evaluate(name, lookup, cases):
+    correct = answered = false_positive = unanswerable = 0
+    latencies = []
+    for case in cases:
+        start = time.perf_counter()
+        result = lookup(case['question'])
+        latencies.append(time.perf_counter() - start)
+        expected = case.get('expected')
+        if expected is None:
+            unanswerable += 1
+            false_positive += result is not None
+        else:
+            answered += 1
+            correct += result == expected
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1e6
+
+    print(f"{name}")
+    print(f"  hit rate            : {correct}/{answered} ({correct / max(answered, 1):.0%})")
+    print(f"  salah jawab (null)  : {false_positive}/{unanswerable}")
+    print(f"  latensi p50/p95/max : {pct(0.5):.0f} / {pct(0.95):.0f} / {latencies[-1] * 1e6:.0f} us")
+
+def main():
+    cases_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(HERE, 'knowledge_eval.jsonl')
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], encoding='utf-8') as f:
+            knowledge_db = json.load(f)
+    else:
+        knowledge_db = initialize_default_knowledge()
+    cases = load_cases(cases_path) + FOLLOW_UP_CASES
+    print(f"{len(cases)} pertanyaan, {len(knowledge_db)} entri\n")
+
+    matcher = KnowledgeMatcher(knowledge_db)
+    evaluate("Pola pertama yang cocok (lama)", matcher.match, cases)
+    get_retriever(knowledge_db)  # bangun indeks di luar pengukuran
+    for threshold in sorted({0.25, KNOWLEDGE_MIN_CONFIDENCE, 0.5}):
+        evaluate(
+            f"Pola + BM25 (keyakinan >= {threshold})",
+            lambda q: find_knowledge_entry(q, knowledge_db, min_confidence=threshold),
+            cases,
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Situs resmi tiruan lokal untuk menguji crawler web_index.
+
+Halaman HTML dibuat dari topik layanan ketenagakerjaan dan saling bertautan.
+Setiap halaman punya ETag dan Last-Modified sehingga GET bersyarat dijawab
+304; halaman bisa diubah atau dihapus saat berjalan untuk menguji crawl
+inkremental. Bisa dijalankan mandiri:
+
+    python benchmarks/fixture_site.py --pages 50
+"""
+import argparse
+import hashlib
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+TOPICS = [
+    ("Syarat Pembuatan Kartu Kuning (AK1)",
+     "Kartu kuning atau AK1 dibuat di Disnakertrans dengan membawa fotokopi KTP, pas foto 3x4, "
+     "dan ijazah terakhir. Pendaftaran dapat dilakukan secara daring melalui portal SIAPkerja."),
+    ("Prosedur Mediasi Hubungan Industrial",
+     "Perselisihan hubungan industrial diselesaikan melalui bipartit, kemudian mediasi oleh mediator "
+     "Disnakertrans. Pengaduan diajukan dengan bukti perundingan bipartit yang gagal."),
+    ("Pelatihan Kerja di Balai Latihan Kerja",
+     "Balai Latihan Kerja membuka pelatihan menjahit, las, otomotif, dan komputer tanpa biaya. "
+     "Peserta mendaftar melalui SIAPkerja dan mengikuti seleksi administrasi."),
+    ("Program Transmigrasi",
+     "Program transmigrasi menyediakan lahan usaha dan rumah bagi keluarga transmigran. "
+     "Calon peserta mendaftar ke dinas kabupaten dengan kartu keluarga dan surat keterangan sehat."),
+    ("Upah Minimum Kabupaten",
+     "Upah minimum kabupaten ditetapkan gubernur setiap tahun berdasarkan rekomendasi dewan pengupahan. "
+     "Pengusaha dilarang membayar upah lebih rendah dari upah minimum."),
+    ("Pesangon Pemutusan Hubungan Kerja",
+     "Pekerja yang terkena pemutusan hubungan kerja berhak atas uang pesangon, uang penghargaan masa kerja, "
+     "dan uang penggantian hak sesuai peraturan pemerintah."),
+]
+
+class FixtureSite(ThreadingHTTPServer):
+    """Situs dengan `pages` halaman; halaman diubah lewat update() dan dihapus lewat remove()"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, pages=30, host='127.0.0.1'):
+        super().__init__((host, 0), FixtureHandler)
+        self.lock = threading.Lock()
+        self.pages = {}
+        self.requests = {'200': 0, '304': 0, '404': 0}
+        for i in range(pages):
+            title, body = TOPICS[i % len(TOPICS)]
+            self.update(i, f"{title} (bagian {i})", body)
+        # Halaman yang bukan HTML tidak boleh masuk indeks
+        self.pages['/laporan.json'] = ('{"laporan": true}', 'application/json', '"laporan"', formatdate(usegmt=True))
+
+    def handle_error(self, request, client_address):
+        # Crawler menutup koneksi tanpa membaca body respons yang dilewati; bukan error
+        pass
+
+    def _render(self, i, title, body):
+        # Tautan ke halaman di luar jumlah halaman sengaja dibiarkan (dijawab 404)
+        links = ''.join(f'<li><a href="/halaman/{j}">Halaman {j}</a></li>' for j in (i + 1, i + 2, i * 2 + 1))
+        return (
+            f"<html><head><title>{title}</title><script>var x = 1;</script></head><body>"
+            f"<nav><a href='/'>Beranda</a><a href='/laporan.json'>Laporan</a></nav>"
+            f"<main><h1>{title}</h1><p>{body}</p><ul>{links}</ul></main>"
+            f"<footer>Hak cipta Kementerian</footer></body></html>"
+        )
+
+    def update(self, i, title, body):
+        """Tambah atau ubah halaman ke-i; ETag dan Last-Modified ikut berubah"""
+        html = self._render(i, title, body)
+        etag = '"' + hashlib.md5(html.encode('utf-8')).hexdigest() + '"'
+        with self.lock:
+            self.pages[f'/halaman/{i}'] = (html, 'text/html; charset=utf-8', etag, formatdate(usegmt=True))
+            if i == 0:
+                self.pages['/'] = self.pages['/halaman/0']
+
+    def remove(self, i):
+        with self.lock:
+            self.pages.pop(f'/halaman/{i}', None)
+
+    def counts(self):
+        with self.lock:
+            return dict(self.requests)
+
+    def url(self, path='/'):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}{path}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        site = self.server
+        path = urlparse(self.path).path
+        if path == '/robots.txt':
+            self._send(200, 'text/plain', "User-agent: *\nDisallow: /admin/\n")
+            return
+        with site.lock:
+            page = site.pages.get(path)
+        if page is None:
+            self._count('404')
+            self._send(404, 'text/html', '<html><body>Tidak ditemukan</body></html>')
+            return
+        html, content_type, etag, last_modified = page
+        if self.headers.get('If-None-Match') == etag:
+            self._count('304')
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self._count('200')
+        self._send(200, content_type, html, {'ETag': etag, 'Last-Modified': last_modified})
+
+    def _count(self, status):
+        with self.server.lock:
+            self.server.requests[status] += 1
+
+    def _send(self, status, content_type, text, headers=None):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=30)
+    args = parser.parse_args()
+    site = FixtureSite(args.pages).start()
+    print(f"export CRAWL_SEEDS='[\"{site.url()}\"]' OFFICIAL_DOMAINS='[\"{site.server_address[0]}\"]'")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        site.stop()
+
+if __name__ == '__main__':
+    main()
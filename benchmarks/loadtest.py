@@ -0,0 +1,244 @@
+"""Uji beban /webhook di bawah gunicorn dengan stub lokal WATI, Groq, dan SerpAPI.
+
+Mengukur request per detik, latensi ack webhook (p50/p95/p99), dan latensi
+ujung-ke-ujung sampai balasan diterima stub WATI. Untuk jawaban yang dikirim
+dalam beberapa pesan (GROQ_STREAMING=true), e2e dihitung sampai pesan pertama
+dan "akhir" sampai pesan terakhir. Beberapa konfigurasi bisa
+dibandingkan sekaligus, misalnya:
+
+    python benchmarks/loadtest.py --requests 300 --concurrency 30 --latency-groq 1 \\
+        --config sync:ASYNC_WEBHOOK=false --config async:ASYNC_WEBHOOK=true,RESPONSE_WORKERS=16
+
+Lalu lintas diambil dari --replay (JSONL berisi payload webhook lengkap, atau
+objek dengan field "text"/"title") atau dibuat dari daftar pertanyaan bawaan.
+"""
+import argparse
+import itertools
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+MONITORING_TOKEN = "loadtest"
+sys.path.insert(0, HERE)
+
+from stub_servers import StubCluster, add_stub_arguments, stub_configs  # noqa: E402
+
+GENERATED_QUESTIONS = [
+    "halo selamat pagi",
+    "apa syarat membuat ak1?",
+    "syarat kartu kuning apa saja",
+    "jam buka kantor disnaker",
+    "alamat kantor dimana ya",
+    "cara daftar siapkerja",
+    "saya kena phk tanpa pesangon",
+    "prosedur pengajuan pelatihan kerja",
+    "apakah ada lowongan kerja di bartim?",
+    "berapa upah minimum kabupaten tahun ini",
+    "program transmigrasi tahun ini ke mana saja",
+    "terima kasih infonya",
+]
+
+def load_texts(path):
+    """Ambil teks pesan atau payload webhook dari file JSONL"""
+    items = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if 'eventType' in record:
+                items.append(record)
+            else:
+                items.append(record.get('text') or record.get('title') or record.get('body', ''))
+    return [item for item in items if item]
+
+def build_event(item, number, event_id):
+    """Bentuk event webhook dengan nomor dan id unik agar balasan bisa dipasangkan"""
+    if isinstance(item, dict):
+        event = json.loads(json.dumps(item))
+        payload = event.setdefault('payload', {})
+    else:
+        event = {'eventType': 'message', 'payload': {'text': item}}
+        payload = event['payload']
+    payload['from'] = number
+    payload['id'] = event_id
+    return event
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def parse_config(spec):
+    name, _, assignments = spec.partition(':')
+    env = {}
+    for assignment in filter(None, assignments.split(',')):
+        key, _, value = assignment.partition('=')
+        env[key.strip()] = value.strip()
+    return name, env
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+def wait_ready(base_url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn berhenti sebelum siap")
+        try:
+            response = requests.get(
+                f"{base_url}/stats/queue", headers={'Authorization': f"Bearer {MONITORING_TOKEN}"}, timeout=1
+            )
+            if response.status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("gunicorn tidak siap dalam batas waktu")
+
+def run_config(name, env_overrides, args, cluster, items, run_index):
+    workdir = tempfile.mkdtemp(prefix=f"loadtest-{name}-")
+    port = free_port()
+    env = dict(os.environ)
+    env.update(cluster.app_env())
+    env.update({
+        'PYTHONPATH': ROOT + os.pathsep + env.get('PYTHONPATH', ''),
+        'KNOWLEDGE_FILE': os.path.join(workdir, 'knowledge_db.json'),
+        'KNOWLEDGE_DB': os.path.join(workdir, 'knowledge_db.sqlite3'),
+        'WEB_INDEX_DB': os.path.join(workdir, 'web_index.sqlite3'),
+        'MONITORING_TOKEN': MONITORING_TOKEN,
+    })
+    env.update(env_overrides)
+    command = [
+        sys.executable, '-m', 'gunicorn', '-b', f'127.0.0.1:{port}',
+        '--log-level', 'warning', *shlex.split(args.gunicorn_args), args.app
+    ]
+    log = open(os.path.join(workdir, 'gunicorn.log'), 'w')
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(base_url, process)
+        cluster.reset()
+        local = threading.local()
+        sent_at = {}
+        acks = []
+        statuses = {}
+        lock = threading.Lock()
+
+        def fire(i):
+            session = getattr(local, 'session', None)
+            if session is None:
+                session = local.session = requests.Session()
+            number = f"628{run_index:02d}{i:07d}"
+            event = build_event(items[i % len(items)], number, f"loadtest-{run_index}-{i}")
+            start = time.perf_counter()
+            try:
+                status = session.post(f"{base_url}/webhook", json=event, timeout=60).status_code
+            except requests.RequestException:
+                status = 'error'
+            elapsed = time.perf_counter() - start
+            with lock:
+                sent_at[number] = start
+                acks.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(fire, range(args.requests)))
+        wall = time.perf_counter() - wall_start
+
+        # Tunggu balasan tiba di stub WATI untuk menghitung latensi ujung-ke-ujung;
+        # jawaban streaming bisa terdiri dari beberapa pesan, jadi tunggu sampai
+        # jumlah pesan berhenti bertambah
+        deadline = time.monotonic() + args.reply_timeout
+        settled, last_count = None, -1
+        while time.monotonic() < deadline:
+            received = cluster.received()
+            count = sum(len(times) for times in received.values())
+            if count != last_count:
+                settled, last_count = time.monotonic(), count
+            elif len(received) >= len(sent_at) and time.monotonic() - settled >= args.settle:
+                break
+            time.sleep(0.1)
+        received = cluster.received()
+        e2e = [received[n][0] - t for n, t in sent_at.items() if n in received]
+        last = [received[n][-1] - t for n, t in sent_at.items() if n in received]
+        messages = sum(len(received[n]) for n in sent_at if n in received)
+
+        return {
+            'name': name,
+            'rps': args.requests / wall,
+            'ack': [percentile(acks, p) for p in (0.5, 0.95, 0.99)],
+            'e2e': [percentile(e2e, p) for p in (0.5, 0.95, 0.99)],
+            'last': [percentile(last, p) for p in (0.5, 0.95)],
+            'replies': len(e2e),
+            'messages': messages,
+            'statuses': statuses,
+        }
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+
+def print_report(results, total):
+    header = (f"{'konfigurasi':<16}{'req/s':>9}{'ack p50':>10}{'p95':>9}{'p99':>9}{'e2e p50':>10}{'p95':>9}{'p99':>9}"
+              f"{'akhir p50':>11}{'p95':>9}{'balasan':>10}{'pesan':>7}  status")
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        ack = ''.join(f"{v * 1000:>9.1f}" for v in r['ack'])
+        e2e = ''.join(f"{v * 1000:>9.1f}" for v in r['e2e'])
+        last = ''.join(f"{v * 1000:>9.1f}" for v in r['last'])
+        statuses = ' '.join(f"{k}:{v}" for k, v in sorted(r['statuses'].items(), key=str))
+        print(f"{r['name']:<16}{r['rps']:>9.1f} {ack} {e2e}  {last}{r['replies']:>7}/{total}"
+              f"{r['messages']:>7}  {statuses}")
+    print("(latensi dalam milidetik; e2e sampai pesan pertama, akhir sampai pesan terakhir)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--replay', help='file JSONL berisi lalu lintas yang direkam')
+    parser.add_argument('--config', action='append', default=[],
+                        help='nama:ENV=NILAI,ENV=NILAI (bisa diulang untuk dibandingkan)')
+    parser.add_argument('--gunicorn-args', default='-w 2 --threads 4')
+    parser.add_argument('--app', default='app:app',
+                        help='target gunicorn; mode ASGI: asgi:app dengan -k uvicorn.workers.UvicornWorker')
+    parser.add_argument('--reply-timeout', type=float, default=30.0)
+    parser.add_argument('--settle', type=float, default=2.0,
+                        help='detik tanpa pesan baru sebelum semua balasan dianggap tiba')
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    items = load_texts(args.replay) if args.replay else GENERATED_QUESTIONS
+    configs = [parse_config(spec) for spec in args.config] or [('default', {})]
+    cluster = StubCluster(**stub_configs(args)).start()
+    results = []
+    try:
+        for run_index, (name, env) in zip(itertools.count(1), configs):
+            print(f"Menjalankan '{name}' ({args.requests} request, konkurensi {args.concurrency})...", flush=True)
+            results.append(run_config(name, env, args, cluster, items, run_index))
+    finally:
+        cluster.stop()
+    print()
+    print_report(results, args.requests)
+
+if __name__ == '__main__':
+    main()
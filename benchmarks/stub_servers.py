@@ -0,0 +1,202 @@
+"""Server tiruan lokal untuk WATI, Groq, dan SerpAPI.
+
+Latensi dan tingkat error setiap stub bisa diatur sehingga throughput
+/webhook bisa diukur tanpa memanggil API berbayar. Bisa dijalankan mandiri:
+
+    python benchmarks/stub_servers.py --latency-groq 0.8 --error-groq 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+class StubConfig:
+    """Latensi (detik, rata-rata dengan jitter ±25%) dan peluang error satu stub"""
+
+    def __init__(self, latency=0.0, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+
+    def simulate(self, fraction=1.0):
+        """Tunggu `fraction` dari latensi lalu tentukan apakah panggilan ini gagal"""
+        if self.latency:
+            time.sleep(self.latency * fraction * random.uniform(0.75, 1.25))
+        return random.random() < self.error_rate
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, handler, config):
+        super().__init__(address, handler)
+        self.config = config
+
+class _BaseHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+        return json.loads(body) if body else {}
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class WatiHandler(_BaseHandler):
+    """Mencatat waktu setiap balasan yang diterima per nomor tujuan"""
+
+    def do_POST(self):
+        data = self._read_json()
+        if self.server.config.simulate():
+            self._send_json(500, {'result': False})
+            return
+        with self.server.lock:
+            self.server.received.setdefault(data.get('recipientPhoneNumber'), []).append(time.perf_counter())
+        self._send_json(200, {'result': True})
+
+STREAM_PARAGRAPH = (
+    "Paragraf {n} jawaban uji. Persyaratan umum meliputi KTP, pas foto terbaru, dan "
+    "ijazah terakhir yang dilegalisir. Berkas dapat diserahkan langsung ke kantor "
+    "Disnakertrans atau diunggah melalui portal resmi. Petugas akan memverifikasi "
+    "dokumen dalam beberapa hari kerja sebelum kartu diterbitkan."
+)
+
+class GroqHandler(_BaseHandler):
+    """Jawaban biasa, atau SSE bertahap (format OpenAI) jika request meminta stream"""
+
+    def do_POST(self):
+        data = self._read_json()
+        stream = bool(data.get('stream'))
+        # Mode stream: sekitar seperempat latensi sebelum token pertama, sisanya tersebar
+        if self.server.config.simulate(0.25 if stream else 1.0):
+            self._send_json(503, {'error': {'message': 'stub overloaded'}})
+            return
+        question = data.get('messages', [{}])[-1].get('content', '')
+        if stream:
+            self._send_stream(question)
+            return
+        self._send_json(200, {
+            'choices': [{'message': {'role': 'assistant', 'content': f"Jawaban uji untuk: {question[:80]}"}}]
+        })
+
+    def _send_stream(self, question):
+        text = f"Jawaban uji untuk: {question[:80]}\n\n" + "\n\n".join(
+            STREAM_PARAGRAPH.format(n=n) for n in range(1, 4)
+        )
+        pieces = [text[i:i + 24] for i in range(0, len(text), 24)]
+        delay = self.server.config.latency * 0.75 / len(pieces)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for piece in pieces:
+            if delay:
+                time.sleep(delay)
+            self._write_chunk({'choices': [{'delta': {'content': piece}}]})
+        self._write_chunk('[DONE]')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _write_chunk(self, event):
+        data = event if isinstance(event, str) else json.dumps(event)
+        body = f"data: {data}\n\n".encode('utf-8')
+        self.wfile.write(f"{len(body):x}\r\n".encode('ascii') + body + b'\r\n')
+        self.wfile.flush()
+
+class SerpApiHandler(_BaseHandler):
+    def do_GET(self):
+        if self.server.config.simulate():
+            self._send_json(500, {'error': 'stub error'})
+            return
+        path = urlparse(self.path).path
+        self._send_json(200, {'organic_results': [{
+            'title': 'Informasi resmi (stub)',
+            'snippet': f'Hasil uji untuk {path}',
+            'link': 'https://kemnaker.go.id/stub',
+        }]})
+
+class StubCluster:
+    """Menjalankan ketiga stub di thread latar pada port acak"""
+
+    def __init__(self, wati=None, groq=None, serpapi=None, host='127.0.0.1'):
+        self.host = host
+        self.servers = {
+            'wati': _StubServer((host, 0), WatiHandler, wati or StubConfig()),
+            'groq': _StubServer((host, 0), GroqHandler, groq or StubConfig()),
+            'serpapi': _StubServer((host, 0), SerpApiHandler, serpapi or StubConfig()),
+        }
+        wati_server = self.servers['wati']
+        wati_server.lock = threading.Lock()
+        wati_server.received = {}
+
+    def start(self):
+        for server in self.servers.values():
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def url(self, name):
+        return f"http://{self.host}:{self.servers[name].server_address[1]}"
+
+    def app_env(self):
+        """Variabel lingkungan agar app.py memakai stub ini"""
+        return {
+            'WATI_API_ENDPOINT': self.url('wati'),
+            'GROQ_API_URL': self.url('groq') + '/openai/v1/chat/completions',
+            'SERPAPI_URL': self.url('serpapi') + '/search',
+            'GROQ_API_KEY': 'stub',
+            'WATI_API_TOKEN': 'stub',
+            'WEB_SEARCH_API_KEY': 'stub',
+        }
+
+    def received(self):
+        """Salinan {nomor: [waktu perf_counter balasan diterima]}"""
+        server = self.servers['wati']
+        with server.lock:
+            return {number: list(times) for number, times in server.received.items()}
+
+    def reset(self):
+        server = self.servers['wati']
+        with server.lock:
+            server.received.clear()
+
+def add_stub_arguments(parser):
+    for name in ('wati', 'groq', 'serpapi'):
+        parser.add_argument(f'--latency-{name}', type=float, default=0.0, help=f'latensi stub {name} (detik)')
+        parser.add_argument(f'--error-{name}', type=float, default=0.0, help=f'peluang error stub {name} (0-1)')
+
+def stub_configs(args):
+    return {
+        name: StubConfig(getattr(args, f'latency_{name}'), getattr(args, f'error_{name}'))
+        for name in ('wati', 'groq', 'serpapi')
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    cluster = StubCluster(**stub_configs(args)).start()
+    for name, value in cluster.app_env().items():
+        print(f"export {name}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        cluster.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,463 @@
+import os
+import re
+import json
+import hashlib
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def normalize_text(text):
+    """Normalisasi teks untuk kunci cache: huruf kecil, tanpa tanda baca, spasi tunggal"""
+    text = _PUNCTUATION_RE.sub(' ', text.lower())
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+class TTLCache:
+    """Cache di memori dengan batas ukuran (LRU) dan masa berlaku (TTL)"""
+
+    def __init__(self, maxsize=500, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (kedaluwarsa, nilai)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Ambil nilai yang masih berlaku, atau None"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        """Simpan nilai dan buang entri paling lama tidak dipakai jika penuh"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            'backend': 'memory',
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+class SQLiteTTLCache:
+    """Cache TTL/LRU di file SQLite, bertahan saat restart dan dipakai bersama antar worker gunicorn"""
+
+    def __init__(self, path, table, maxsize=500, ttl=3600):
+        if not re.fullmatch(r'\w+', table):
+            raise ValueError(f"Nama tabel cache tidak valid: {table}")
+        self.path = path
+        self.table = table
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        conn = self._conn()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_access ON {table}(last_access)")
+
+    def _conn(self):
+        # Satu koneksi per thread per proses; koneksi tidak boleh melewati fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """Tutup koneksi thread ini (dibuka ulang otomatis saat cache dipakai lagi)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+    def get(self, key):
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return json.loads(row[0])
+        except sqlite3.Error as e:
+            logger.error(f"Cache SQLite error: {str(e)}")
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now + self.ttl, now)
+            )
+            overflow = len(self) - self.maxsize
+            if overflow > 0:
+                conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN "
+                    f"(SELECT key FROM {self.table} ORDER BY last_access LIMIT ?)", (overflow,)
+                )
+                self.evictions += overflow
+        except sqlite3.Error as e:
+            logger.error(f"Cache SQLite error: {str(e)}")
+
+    def clear(self):
+        try:
+            self._conn().execute(f"DELETE FROM {self.table}")
+        except sqlite3.Error as e:
+            logger.error(f"Cache SQLite error: {str(e)}")
+
+    def __len__(self):
+        return self._conn().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def stats(self):
+        return {
+            'backend': 'sqlite',
+            'size': len(self),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+def make_cache(table, maxsize, ttl, sqlite_path=None):
+    """Buat cache SQLite jika path diberikan, selain itu cache memori"""
+    if sqlite_path:
+        try:
+            return SQLiteTTLCache(sqlite_path, table, maxsize=maxsize, ttl=ttl)
+        except sqlite3.Error as e:
+            logger.error(f"Gagal membuka cache SQLite {sqlite_path}, memakai cache memori: {str(e)}")
+    return TTLCache(maxsize=maxsize, ttl=ttl)
+
+class _Flight:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Gabungkan panggilan identik yang sedang berjalan menjadi satu panggilan upstream.
+
+    Pemanggil pertama untuk sebuah kunci menjalankan fungsi; pemanggil lain dengan
+    kunci yang sama menunggu hasilnya. Jika menunggu lebih dari `timeout` detik,
+    pemanggil tersebut menjalankan panggilannya sendiri.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.leaders = 0
+        self.shared = 0
+        self.timeouts = 0
+
+    def do(self, key, fn, *args, timeout=None, **kwargs):
+        """Jalankan fn(*args, **kwargs) sekali untuk semua pemanggil bersamaan dengan kunci sama"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self.leaders += 1
+
+        if not leader:
+            wait = self.timeout if timeout is None else timeout
+            if flight.event.wait(wait):
+                with self._lock:
+                    self.shared += 1
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result
+            with self._lock:
+                self.timeouts += 1
+            return fn(*args, **kwargs)
+
+        try:
+            flight.result = fn(*args, **kwargs)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def stats(self):
+        return {
+            'in_flight': len(self._flights),
+            'leaders': self.leaders,
+            'saved_calls': self.shared,
+            'timeouts': self.timeouts,
+        }
+
+class AsyncSingleFlight:
+    """Padanan asyncio dari SingleFlight untuk pemanggil di satu event loop.
+
+    Pemanggil pertama menjalankan coroutine fn; pemanggil lain dengan kunci sama
+    menunggu future-nya. Jika menunggu lebih dari `timeout` detik, atau pemanggil
+    pertama dibatalkan, pemanggil tersebut menjalankan panggilannya sendiri.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._flights = {}
+        self.leaders = 0
+        self.shared = 0
+        self.timeouts = 0
+
+    async def do(self, key, fn, *args, timeout=None, **kwargs):
+        """Jalankan await fn(*args, **kwargs) sekali untuk semua pemanggil bersamaan dengan kunci sama"""
+        flight = self._flights.get(key)
+        if flight is not None:
+            wait = self.timeout if timeout is None else timeout
+            try:
+                result = await asyncio.wait_for(asyncio.shield(flight), wait)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                return await fn(*args, **kwargs)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+                return await fn(*args, **kwargs)
+            self.shared += 1
+            return result
+
+        self.leaders += 1
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        try:
+            result = await fn(*args, **kwargs)
+            flight.set_result(result)
+            return result
+        except Exception as e:
+            flight.set_exception(e)
+            flight.exception()  # tandai sudah dibaca meski tidak ada yang menunggu
+            raise
+        finally:
+            self._flights.pop(key, None)
+            if not flight.done():
+                flight.cancel()
+
+    def stats(self):
+        return {
+            'in_flight': len(self._flights),
+            'leaders': self.leaders,
+            'saved_calls': self.shared,
+            'timeouts': self.timeouts,
+        }
+
+class DedupWindow:
+    """Penyaring duplikat berbatas waktu dan memori.
+
+    Kunci disimpan sebagai hash 64-bit di dua generasi set. Generasi diputar
+    setiap `window` detik (atau lebih awal bila penuh), sehingga kunci diingat
+    paling sedikit `window` detik dan memori dibatasi sekitar `maxsize` entri.
+    """
+
+    def __init__(self, window=600, maxsize=100000):
+        self.window = window
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._current = set()
+        self._previous = set()
+        self._rotated_at = time.monotonic()
+        self.duplicates = 0
+
+    @staticmethod
+    def _digest(key):
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def _maybe_rotate(self):
+        now = time.monotonic()
+        if now - self._rotated_at >= 2 * self.window:
+            # Setelah lama tidak ada event, kedua generasi sudah lebih tua dari jendela
+            self._previous = set()
+            self._current = set()
+            self._rotated_at = now
+        elif now - self._rotated_at >= self.window or len(self._current) >= self.maxsize // 2:
+            self._previous = self._current
+            self._current = set()
+            self._rotated_at = now
+
+    def check_and_add(self, key):
+        """Tandai kunci sebagai sudah dilihat; False jika kunci duplikat"""
+        digest = self._digest(key)
+        with self._lock:
+            self._maybe_rotate()
+            if digest in self._current or digest in self._previous:
+                self.duplicates += 1
+                return False
+            self._current.add(digest)
+            return True
+
+    def discard(self, key):
+        """Lupakan kunci (misalnya jika pemrosesan gagal dan kiriman ulang harus diterima)"""
+        digest = self._digest(key)
+        with self._lock:
+            self._current.discard(digest)
+            self._previous.discard(digest)
+
+    def stats(self):
+        return {
+            'backend': 'memory',
+            'tracked': len(self._current) + len(self._previous),
+            'duplicates_dropped': self.duplicates,
+        }
+
+class SQLiteDedupWindow:
+    """Padanan DedupWindow di file SQLite, dipakai bersama antar worker gunicorn.
+
+    Kiriman ulang WATI bisa jatuh ke worker lain; dengan tabel bersama, event
+    yang sama tetap hanya diproses sekali. Satu pernyataan INSERT ... ON
+    CONFLICT menentukan apakah kunci baru (atau sudah lewat `window` detik)
+    secara atomik antar proses. Baris kedaluwarsa dan kelebihan `maxsize`
+    dipangkas setiap `prune_every` kunci baru.
+    """
+
+    def __init__(self, path, table='webhook_dedup', window=600, maxsize=100000, prune_every=500):
+        if not re.fullmatch(r'\w+', table):
+            raise ValueError(f"Nama tabel dedup tidak valid: {table}")
+        self.path = path
+        self.table = table
+        self.window = window
+        self.maxsize = maxsize
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._added = 0
+        self.duplicates = 0
+        self._conn().execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key INTEGER PRIMARY KEY, seen_at REAL NOT NULL)"
+        )
+        self._conn().execute(f"CREATE INDEX IF NOT EXISTS {table}_seen_at ON {table}(seen_at)")
+
+    def _conn(self):
+        # Satu koneksi per thread per proses; koneksi tidak boleh melewati fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """Tutup koneksi thread ini (dibuka ulang otomatis saat dipakai lagi)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+    @staticmethod
+    def _digest(key):
+        # Hash 64-bit bertanda agar muat di INTEGER SQLite
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+    def check_and_add(self, key):
+        """Tandai kunci sebagai sudah dilihat; False jika kunci duplikat"""
+        now = time.time()
+        try:
+            conn = self._conn()
+            cursor = conn.execute(
+                f"INSERT INTO {self.table} (key, seen_at) VALUES (?, ?) "
+                f"ON CONFLICT(key) DO UPDATE SET seen_at = excluded.seen_at WHERE {self.table}.seen_at <= ?",
+                (self._digest(key), now, now - self.window)
+            )
+            if cursor.rowcount == 0:
+                self.duplicates += 1
+                return False
+            self._added += 1
+            if self._added % self.prune_every == 0:
+                self._prune(conn, now)
+            return True
+        except sqlite3.Error as e:
+            # Lebih baik sesekali memproses duplikat daripada menolak pesan baru
+            logger.error(f"Dedup SQLite error: {str(e)}")
+            return True
+
+    def _prune(self, conn, now):
+        conn.execute(f"DELETE FROM {self.table} WHERE seen_at <= ?", (now - self.window,))
+        conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} "
+            f"ORDER BY seen_at DESC LIMIT -1 OFFSET ?)", (self.maxsize,)
+        )
+
+    def discard(self, key):
+        """Lupakan kunci (misalnya jika pemrosesan gagal dan kiriman ulang harus diterima)"""
+        try:
+            self._conn().execute(f"DELETE FROM {self.table} WHERE key = ?", (self._digest(key),))
+        except sqlite3.Error as e:
+            logger.error(f"Dedup SQLite error: {str(e)}")
+
+    def stats(self):
+        try:
+            tracked = self._conn().execute(
+                f"SELECT COUNT(*) FROM {self.table} WHERE seen_at > ?", (time.time() - self.window,)
+            ).fetchone()[0]
+        except sqlite3.Error:
+            tracked = None
+        return {
+            'backend': 'sqlite',
+            'tracked': tracked,
+            'duplicates_dropped': self.duplicates,
+        }
+
+def make_dedup(window, maxsize, sqlite_path=None):
+    """Buat penyaring duplikat SQLite bersama jika path diberikan, selain itu per proses"""
+    if sqlite_path:
+        try:
+            return SQLiteDedupWindow(sqlite_path, window=window, maxsize=maxsize)
+        except sqlite3.Error as e:
+            logger.error(f"Gagal membuka dedup SQLite {sqlite_path}, memakai memori per worker: {str(e)}")
+    return DedupWindow(window=window, maxsize=maxsize)
@@ -0,0 +1,186 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# ===================== KONFIGURASI =====================
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", "60"))              # detik data yang dihitung
+BREAKER_MIN_REQUESTS = int(os.getenv("BREAKER_MIN_REQUESTS", "10"))    # sampel minimum sebelum bisa terbuka
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))     # porsi gagal yang membuka breaker
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "15"))          # detik terbuka sebelum dicoba lagi
+BREAKER_MAX_COOLDOWN = float(os.getenv("BREAKER_MAX_COOLDOWN", "120"))
+# Timeout adaptif: persentil latensi sukses dikali pengali, dibatasi minimum
+# dan timeout statis upstream (HTTP_TIMEOUT_<NAMA>) sebagai batas atas
+BREAKER_TIMEOUT_PERCENTILE = float(os.getenv("BREAKER_TIMEOUT_PERCENTILE", "0.99"))
+BREAKER_TIMEOUT_MULTIPLIER = float(os.getenv("BREAKER_TIMEOUT_MULTIPLIER", "2"))
+BREAKER_MIN_TIMEOUT = float(os.getenv("BREAKER_MIN_TIMEOUT", "2"))
+BREAKER_TIMEOUT_SAMPLES = int(os.getenv("BREAKER_TIMEOUT_SAMPLES", "20"))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+breaker_transitions = registry.counter(
+    "chatbot_breaker_transitions_total", "Perubahan status circuit breaker per upstream", ("upstream", "state")
+)
+breaker_rejections = registry.counter(
+    "chatbot_breaker_rejections_total", "Panggilan yang langsung ditolak karena breaker terbuka", ("upstream",)
+)
+
+class CircuitOpenError(Exception):
+    """Upstream sedang dianggap mati; panggilan ditolak tanpa menunggu timeout"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit breaker '{name}' terbuka, coba lagi dalam {retry_after:.1f} detik")
+        self.name = name
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Circuit breaker per upstream dengan jendela bergulir dan timeout adaptif.
+
+    Setiap panggilan dicatat (waktu, gagal, latensi). Jika dalam `window` detik
+    ada minimal `min_requests` panggilan dan porsi gagalnya mencapai
+    `error_rate`, breaker terbuka dan panggilan berikutnya langsung ditolak
+    selama `cooldown` detik. Setelah itu satu panggilan percobaan diizinkan
+    (half-open): sukses menutup breaker, gagal membukanya lagi dengan cooldown
+    dua kali lipat (maksimal `max_cooldown`).
+    """
+
+    def __init__(self, name, window=BREAKER_WINDOW, min_requests=BREAKER_MIN_REQUESTS,
+                 error_rate=BREAKER_ERROR_RATE, cooldown=BREAKER_COOLDOWN, max_cooldown=BREAKER_MAX_COOLDOWN):
+        self.name = name
+        self.window = window
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._probing = False
+        self._calls = deque(maxlen=2000)  # (waktu, gagal, latensi)
+        self._failures = 0
+        self._timeout = None
+        self._timeout_at = 0.0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _set_state(self, state):
+        if state != self.state:
+            logger.warning(f"Circuit breaker '{self.name}': {self.state} -> {state}")
+            self.state = state
+            breaker_transitions.inc(self.name, state)
+
+    def _trim(self, now):
+        calls = self._calls
+        while calls and (now - calls[0][0] > self.window or len(calls) == calls.maxlen):
+            _, failed, _ = calls.popleft()
+            self._failures -= failed
+
+    def allow(self):
+        """Izinkan panggilan atau lempar CircuitOpenError jika breaker terbuka"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = time.monotonic()
+            remaining = self.opened_at + self.cooldown - now
+            if self.state == OPEN and remaining <= 0:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+        breaker_rejections.inc(self.name)
+        raise CircuitOpenError(self.name, max(remaining, 0.0))
+
+    def available(self):
+        """True jika panggilan saat ini mungkin diizinkan (tanpa memakai jatah percobaan)"""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() >= self.opened_at + self.cooldown
+            return self.state == CLOSED or not self._probing
+
+    def record(self, failed, latency):
+        """Catat hasil panggilan yang sudah diizinkan allow()"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if failed:
+                    self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                    self._open(now)
+                else:
+                    self.cooldown = self.base_cooldown
+                    self._calls.clear()
+                    self._failures = 0
+                    self._set_state(CLOSED)
+                return
+            self._trim(now)
+            self._calls.append((now, int(failed), latency))
+            self._failures += int(failed)
+            if (self.state == CLOSED and len(self._calls) >= self.min_requests
+                    and self._failures / len(self._calls) >= self.error_rate):
+                self._open(now)
+
+    def _open(self, now):
+        self.opened_at = now
+        self._set_state(OPEN)
+
+    def timeout(self, ceiling):
+        """Timeout baca adaptif dari persentil latensi panggilan sukses, maksimal `ceiling`"""
+        now = time.monotonic()
+        with self._lock:
+            if self._timeout is None or now - self._timeout_at > 1.0:
+                latencies = sorted(latency for _, failed, latency in self._calls if not failed)
+                if len(latencies) >= BREAKER_TIMEOUT_SAMPLES:
+                    index = min(len(latencies) - 1, int(BREAKER_TIMEOUT_PERCENTILE * len(latencies)))
+                    self._timeout = max(BREAKER_MIN_TIMEOUT, latencies[index] * BREAKER_TIMEOUT_MULTIPLIER)
+                else:
+                    self._timeout = float('inf')
+                self._timeout_at = now
+            return min(self._timeout, ceiling)
+
+    def stats(self):
+        with self._lock:
+            self._trim(time.monotonic())
+            calls = len(self._calls)
+            return {
+                'state': self.state,
+                'calls_in_window': calls,
+                'error_rate': round(self._failures / calls, 3) if calls else 0.0,
+                'cooldown': self.cooldown,
+                'adaptive_timeout': None if self._timeout in (None, float('inf')) else round(self._timeout, 3),
+                'rejected': self.rejected,
+            }
+
+# ===================== REGISTRY PER UPSTREAM =====================
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def _reset_after_fork():
+    """Setiap worker menilai upstream dari pengamatannya sendiri"""
+    global _breakers_lock
+    _breakers.clear()
+    _breakers_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def get_breaker(name):
+    """Ambil circuit breaker untuk upstream `name` (dibuat sekali per proses)"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+def is_available(name):
+    return get_breaker(name).available()
+
+def get_stats():
+    return {name: breaker.stats() for name, breaker in list(_breakers.items())}
@@ -0,0 +1,115 @@
+import os
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class _Burst:
+    __slots__ = ('fragments', 'chars', 'first_at', 'deadline')
+
+    def __init__(self, now):
+        self.fragments = []
+        self.chars = 0
+        self.first_at = now
+        self.deadline = now
+
+class BurstCoalescer:
+    """Gabungkan pesan beruntun dari nomor yang sama menjadi satu pertanyaan.
+
+    Setiap fragmen baru memperpanjang jendela tunggu `window` detik (debounce),
+    tetapi total tunggu dibatasi `max_wait`. Burst langsung dikirim jika jumlah
+    fragmen atau karakternya mencapai batas, dan jumlah percakapan aktif
+    dibatasi `max_active` (burst tertua dikirim lebih awal bila penuh).
+    Hasil gabungan diserahkan ke `on_flush(nomor, teks)` dari thread timer.
+    """
+
+    def __init__(self, on_flush, window=1.5, max_wait=5.0, max_fragments=8,
+                 max_chars=2000, max_active=1000):
+        self.on_flush = on_flush
+        self.window = window
+        self.max_wait = max_wait
+        self.max_fragments = max_fragments
+        self.max_chars = max_chars
+        self.max_active = max_active
+        self._cond = threading.Condition()
+        self._bursts = {}      # nomor -> _Burst
+        self._deadlines = []   # heap (deadline, seq, nomor), entri usang diabaikan
+        self._seq = itertools.count()
+        self._thread = None
+        self._thread_pid = None
+        self.fragments_merged = 0
+        self.bursts_flushed = 0
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="burst-coalescer", daemon=True)
+        self._thread_pid = os.getpid()
+        self._thread.start()
+
+    def add(self, number, text):
+        """Tambahkan fragmen; burst dikirim setelah nomor ini diam selama `window` detik"""
+        ready = []
+        with self._cond:
+            self._ensure_thread()
+            now = time.monotonic()
+            burst = self._bursts.get(number)
+            if burst is None:
+                if len(self._bursts) >= self.max_active:
+                    oldest = min(self._bursts, key=lambda n: self._bursts[n].first_at)
+                    ready.append((oldest, self._bursts.pop(oldest)))
+                burst = self._bursts[number] = _Burst(now)
+            else:
+                self.fragments_merged += 1
+            burst.fragments.append(text)
+            burst.chars += len(text)
+
+            if len(burst.fragments) >= self.max_fragments or burst.chars >= self.max_chars:
+                ready.append((number, self._bursts.pop(number)))
+            else:
+                burst.deadline = min(now + self.window, burst.first_at + self.max_wait)
+                heapq.heappush(self._deadlines, (burst.deadline, next(self._seq), number))
+                self._cond.notify()
+        self._flush(ready)
+
+    def flush(self, number):
+        """Kirim burst yang tertunda untuk nomor ini sekarang juga (jika ada)"""
+        with self._cond:
+            burst = self._bursts.pop(number, None)
+        if burst is not None:
+            self._flush([(number, burst)])
+
+    def _run(self):
+        while True:
+            ready = []
+            with self._cond:
+                while not ready:
+                    now = time.monotonic()
+                    while self._deadlines and self._deadlines[0][0] <= now:
+                        deadline, _, number = heapq.heappop(self._deadlines)
+                        burst = self._bursts.get(number)
+                        if burst is not None and burst.deadline == deadline:
+                            ready.append((number, self._bursts.pop(number)))
+                    if ready:
+                        break
+                    wait = self._deadlines[0][0] - now if self._deadlines else None
+                    self._cond.wait(wait)
+            self._flush(ready)
+
+    def _flush(self, ready):
+        for number, burst in ready:
+            self.bursts_flushed += 1
+            try:
+                self.on_flush(number, " ".join(burst.fragments))
+            except Exception as e:
+                logger.error(f"Gagal meneruskan pesan gabungan: {str(e)}", exc_info=True, extra={'phone': number})
+
+    def stats(self):
+        return {
+            'active': len(self._bursts),
+            'bursts_flushed': self.bursts_flushed,
+            'fragments_merged': self.fragments_merged,
+        }
@@ -0,0 +1,236 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+class Turn:
+    """Satu giliran percakapan ('user' atau 'assistant')"""
+
+    __slots__ = ('role', 'content', 'at')
+
+    def __init__(self, role, content, at):
+        self.role = role
+        self.content = content
+        self.at = at
+
+def estimate_tokens(text):
+    """Perkiraan kasar jumlah token (sekitar 4 karakter per token)"""
+    return len(text) // 4 + 1
+
+def trim_to_budget(turns, budget):
+    """Ambil giliran terbaru yang muat dalam `budget` token, urut dari yang terlama.
+
+    Pemangkasan berhenti di giliran pertama yang tidak muat agar riwayat tetap
+    bersambung; giliran 'assistant' di awal hasil dibuang karena tanpa
+    pertanyaannya jawaban itu tidak bermakna.
+    """
+    kept = []
+    used = 0
+    for turn in reversed(turns):
+        cost = estimate_tokens(turn.content)
+        if used + cost > budget:
+            break
+        kept.append(turn)
+        used += cost
+    kept.reverse()
+    while kept and kept[0].role != 'user':
+        kept.pop(0)
+    return kept
+
+class ConversationMemory:
+    """Riwayat percakapan per nomor di memori.
+
+    Setiap nomor punya ring buffer `max_turns` giliran terakhir; jumlah nomor
+    dibatasi `max_users` dengan membuang nomor yang paling lama tidak aktif
+    (LRU). Giliran yang lebih tua dari `ttl` detik diabaikan, dan isi setiap
+    giliran dipotong `max_chars` karakter.
+    """
+
+    def __init__(self, max_turns=6, max_users=10000, ttl=1800, max_chars=1000):
+        self.max_turns = max_turns
+        self.max_users = max_users
+        self.ttl = ttl
+        self.max_chars = max_chars
+        self._conversations = OrderedDict()  # nomor -> deque Turn
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def add_exchange(self, number, user_text, bot_text=None):
+        """Simpan pertanyaan pengguna dan (bila ada) jawaban bot"""
+        now = time.monotonic()
+        with self._lock:
+            turns = self._conversations.get(number)
+            if turns is None:
+                turns = self._conversations[number] = deque(maxlen=self.max_turns)
+            self._conversations.move_to_end(number)
+            turns.append(Turn('user', user_text[:self.max_chars], now))
+            if bot_text:
+                turns.append(Turn('assistant', bot_text[:self.max_chars], now))
+            while len(self._conversations) > self.max_users:
+                self._conversations.popitem(last=False)
+                self.evictions += 1
+
+    def history(self, number):
+        """Giliran yang masih berlaku untuk nomor ini, urut dari yang terlama"""
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            turns = self._conversations.get(number)
+            if not turns:
+                return []
+            return [turn for turn in turns if turn.at >= cutoff]
+
+    def clear(self, number=None):
+        with self._lock:
+            if number is None:
+                self._conversations.clear()
+            else:
+                self._conversations.pop(number, None)
+
+    def stats(self):
+        return {
+            'backend': 'memory',
+            'users': len(self._conversations),
+            'max_users': self.max_users,
+            'max_turns': self.max_turns,
+            'evictions': self.evictions,
+        }
+
+class SQLiteConversationMemory:
+    """Riwayat percakapan di SQLite, dipakai bersama antar worker gunicorn.
+
+    Aturannya sama dengan ConversationMemory: `max_turns` giliran per nomor,
+    `max_users` nomor dengan LRU berdasarkan waktu aktivitas terakhir, dan
+    giliran kedaluwarsa setelah `ttl` detik.
+    """
+
+    # Pembersihan nomor berlebih dan kedaluwarsa dilakukan setiap N penyimpanan
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, max_turns=6, max_users=10000, ttl=1800, max_chars=1000):
+        self.path = path
+        self.max_turns = max_turns
+        self.max_users = max_users
+        self.ttl = ttl
+        self.max_chars = max_chars
+        self._local = threading.local()
+        self._writes = 0
+        self.evictions = 0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_turns ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, number TEXT NOT NULL, "
+            "role TEXT NOT NULL, content TEXT NOT NULL, at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS conversation_turns_number ON conversation_turns(number, id)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations (number TEXT PRIMARY KEY, last_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS conversations_last_at ON conversations(last_at)")
+
+    def _conn(self):
+        # Satu koneksi per thread per proses; koneksi tidak boleh melewati fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """Tutup koneksi thread ini; koneksi baru dibuka saat riwayat diakses lagi"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+    def add_exchange(self, number, user_text, bot_text=None):
+        """Simpan pertanyaan pengguna dan (bila ada) jawaban bot dalam satu transaksi"""
+        now = time.time()
+        rows = [(number, 'user', user_text[:self.max_chars], now)]
+        if bot_text:
+            rows.append((number, 'assistant', bot_text[:self.max_chars], now))
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT INTO conversation_turns (number, role, content, at) VALUES (?, ?, ?, ?)", rows
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO conversations (number, last_at) VALUES (?, ?)", (number, now)
+                )
+                # Ring buffer: sisakan max_turns giliran terbaru nomor ini
+                conn.execute(
+                    "DELETE FROM conversation_turns WHERE number = ? AND id NOT IN "
+                    "(SELECT id FROM conversation_turns WHERE number = ? ORDER BY id DESC LIMIT ?)",
+                    (number, number, self.max_turns)
+                )
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    self._prune(conn, now)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.error(f"Riwayat percakapan SQLite error: {str(e)}")
+
+    def _prune(self, conn, now):
+        stale = [row[0] for row in conn.execute(
+            "SELECT number FROM conversations WHERE last_at < ? "
+            "UNION SELECT number FROM (SELECT number FROM conversations ORDER BY last_at DESC LIMIT -1 OFFSET ?)",
+            (now - self.ttl, self.max_users)
+        )]
+        if stale:
+            conn.executemany("DELETE FROM conversation_turns WHERE number = ?", [(n,) for n in stale])
+            conn.executemany("DELETE FROM conversations WHERE number = ?", [(n,) for n in stale])
+            self.evictions += len(stale)
+
+    def history(self, number):
+        """Giliran yang masih berlaku untuk nomor ini, urut dari yang terlama"""
+        try:
+            rows = self._conn().execute(
+                "SELECT role, content, at FROM conversation_turns WHERE number = ? AND at >= ? "
+                "ORDER BY id DESC LIMIT ?",
+                (number, time.time() - self.ttl, self.max_turns)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Riwayat percakapan SQLite error: {str(e)}")
+            return []
+        return [Turn(role, content, at) for role, content, at in reversed(rows)]
+
+    def clear(self, number=None):
+        try:
+            conn = self._conn()
+            if number is None:
+                conn.execute("DELETE FROM conversation_turns")
+                conn.execute("DELETE FROM conversations")
+            else:
+                conn.execute("DELETE FROM conversation_turns WHERE number = ?", (number,))
+                conn.execute("DELETE FROM conversations WHERE number = ?", (number,))
+        except sqlite3.Error as e:
+            logger.error(f"Riwayat percakapan SQLite error: {str(e)}")
+
+    def stats(self):
+        return {
+            'backend': 'sqlite',
+            'users': self._conn().execute("SELECT COUNT(*) FROM conversations").fetchone()[0],
+            'max_users': self.max_users,
+            'max_turns': self.max_turns,
+            'evictions': self.evictions,
+        }
+
+def make_conversation_memory(sqlite_path=None, **kwargs):
+    """Buat penyimpanan riwayat SQLite jika path diberikan, selain itu di memori"""
+    if sqlite_path:
+        try:
+            return SQLiteConversationMemory(sqlite_path, **kwargs)
+        except sqlite3.Error as e:
+            logger.error(f"Gagal membuka riwayat percakapan SQLite {sqlite_path}, memakai memori: {str(e)}")
+    return ConversationMemory(**kwargs)
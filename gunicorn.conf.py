@@ -0,0 +1,51 @@
+"""Konfigurasi gunicorn: preload aplikasi di master lalu mulai runtime per worker.
+
+Dengan preload, modul app diimpor sekali di master: basis pengetahuan,
+matcher, dan indeks BM25 dibangun satu kali lalu dibagi copy-on-write ke
+semua worker. Thread pengirim, worker respons, dan session HTTP baru
+dimulai setelah fork. Nonaktifkan dengan GUNICORN_PRELOAD=false.
+Jumlah worker dan port tetap mengikuti WEB_CONCURRENCY dan PORT.
+
+Agar /metrics menjumlahkan semua worker, METRICS_DIR diisi direktori
+sementara milik master ini jika belum diatur, dan dihapus saat master keluar.
+"""
+import gc
+import os
+import shutil
+import tempfile
+import time
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+_own_metrics_dir = None
+if not os.getenv("METRICS_DIR"):
+    _own_metrics_dir = os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="chatbot-metrics-")
+
+def on_exit(server):
+    if _own_metrics_dir:
+        shutil.rmtree(_own_metrics_dir, ignore_errors=True)
+
+def when_ready(server):
+    if not preload_app:
+        return
+    import app as chatbot
+    start = time.perf_counter()
+    chatbot.warm_up()
+    # Koneksi SQLite tidak boleh terbawa ke worker
+    chatbot.release_connections()
+    # Objek yang sudah ada dipindah ke generasi permanen agar GC di worker
+    # tidak menulis ke halaman memori yang dibagi dengan master
+    gc.freeze()
+    server.log.info(f"Indeks pengetahuan siap di master dalam {time.perf_counter() - start:.2f} detik")
+
+def post_fork(server, worker):
+    worker.forked_at = time.perf_counter()
+
+def post_worker_init(worker):
+    import app as chatbot
+    # Tanpa preload, setiap worker membangun indeksnya sendiri
+    chatbot.warm_up()
+    # Mode ASGI (asgi:app) memulai runtime-nya sendiri lewat lifespan
+    if worker.wsgi is chatbot.app:
+        chatbot.start_runtime()
+    worker.log.info(f"Worker {worker.pid} siap dalam {time.perf_counter() - worker.forked_at:.3f} detik setelah fork")
@@ -0,0 +1,175 @@
+import os
+import time
+import logging
+from threading import Lock
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import upstream_latency
+from circuit_breaker import get_breaker
+
+logger = logging.getLogger(__name__)
+
+# ===================== KONFIGURASI KONEKSI =====================
+# Timeout (detik) dan ukuran pool per upstream, bisa ditimpa lewat env
+# HTTP_TIMEOUT_<NAMA> dan HTTP_POOL_SIZE_<NAMA>, misalnya HTTP_TIMEOUT_GROQ=20
+DEFAULT_TIMEOUTS = {'wati': 5, 'groq': 15, 'serpapi': 15}
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+
+def timeout_for(name):
+    return float(os.getenv(f"HTTP_TIMEOUT_{name.upper()}", DEFAULT_TIMEOUTS.get(name, 10)))
+
+def _pool_size_for(name):
+    return int(os.getenv(f"HTTP_POOL_SIZE_{name.upper()}", HTTP_POOL_SIZE))
+
+# ===================== POOL SESSION =====================
+_sessions = {}
+_sessions_pid = os.getpid()
+_lock = Lock()
+_latency = {}  # host -> {'requests', 'errors', 'total', 'max'}
+_async_connections = {}  # host -> {'new_connections', 'pooled_requests'} dari klien async
+
+def _reset_after_fork():
+    """Buang session warisan proses induk; soket tidak boleh dipakai bersama"""
+    global _sessions, _sessions_pid, _lock
+    _sessions = {}
+    _sessions_pid = os.getpid()
+    _lock = Lock()
+    _latency.clear()
+    _async_connections.clear()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def get_session(name):
+    """Ambil session keep-alive untuk upstream `name` (dibuat sekali per proses)"""
+    if _sessions_pid != os.getpid():
+        _reset_after_fork()
+    session = _sessions.get(name)
+    if session is not None:
+        return session
+    with _lock:
+        session = _sessions.get(name)
+        if session is None:
+            pool_size = _pool_size_for(name)
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=False)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[name] = session
+            logger.info(f"Session HTTP '{name}' dibuat (pool {pool_size})")
+        return session
+
+def is_failure(status_code):
+    """Status yang dihitung gagal oleh circuit breaker (None berarti exception)"""
+    return status_code is None or status_code >= 500 or status_code == 429
+
+class StreamOutcome:
+    """Hasil breaker untuk respons stream yang ditunda sampai body selesai dibaca.
+
+    Kegagalan di tengah stream baru diketahui oleh pembaca body, jadi hasilnya
+    dicatat sekali lewat finish_stream; latensi yang dicatat tetap waktu header.
+    """
+
+    __slots__ = ('breaker', 'elapsed', 'recorded')
+
+    def __init__(self, breaker, elapsed):
+        self.breaker = breaker
+        self.elapsed = elapsed
+        self.recorded = False
+
+    def record(self, failed):
+        if self.recorded:
+            return
+        self.recorded = True
+        self.breaker.record(failed, self.elapsed)
+
+def finish_stream(response, failed):
+    """Catat hasil respons stream ke breaker (sekali); aman dipanggil untuk respons biasa"""
+    outcome = getattr(response, 'breaker_outcome', None)
+    if outcome is not None:
+        outcome.record(failed)
+
+def request(name, method, url, defer_breaker=False, **kwargs):
+    """Kirim request lewat session upstream `name` dengan timeout bawaan dan pencatatan latensi.
+
+    Melempar CircuitOpenError tanpa menghubungi upstream jika breaker-nya terbuka.
+    Dengan defer_breaker=True (untuk stream yang bisa gagal di tengah jalan) hasil
+    breaker respons sukses baru dicatat saat pemanggil memanggil finish_stream;
+    pemanggil wajib memanggilnya di setiap jalur keluar.
+    """
+    breaker = get_breaker(name)
+    breaker.allow()
+    kwargs.setdefault('timeout', (HTTP_CONNECT_TIMEOUT, breaker.timeout(timeout_for(name))))
+    session = get_session(name)
+    host = urlparse(url).hostname or url
+    start = time.perf_counter()
+    status_code = None
+    try:
+        response = session.request(method, url, **kwargs)
+        status_code = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        if defer_breaker and not is_failure(status_code):
+            response.breaker_outcome = StreamOutcome(breaker, elapsed)
+        else:
+            breaker.record(is_failure(status_code), elapsed)
+        record_latency(host, elapsed, status_code is None)
+        upstream_latency.observe(elapsed, name, f"{status_code // 100}xx" if status_code else 'error')
+
+def record_latency(host, elapsed, error):
+    """Catat latensi satu panggilan ke statistik per host (dipakai juga klien async)"""
+    with _lock:
+        stats = _latency.setdefault(host, {'requests': 0, 'errors': 0, 'total': 0.0, 'max': 0.0})
+        stats['requests'] += 1
+        stats['errors'] += int(error)
+        stats['total'] += elapsed
+        stats['max'] = max(stats['max'], elapsed)
+
+def record_connection(host, new_connection):
+    """Catat satu request klien async dan apakah ia membuka koneksi baru.
+
+    Pool urllib3 klien sinkron sudah menghitung sendiri; pool httpx tidak
+    menyimpan hitungan untuk koneksi yang sudah ditutup, jadi klien async
+    melaporkannya ke sini.
+    """
+    with _lock:
+        entry = _async_connections.setdefault(host, {'new_connections': 0, 'pooled_requests': 0})
+        entry['new_connections'] += int(new_connection)
+        entry['pooled_requests'] += 1
+
+def get_stats():
+    """Statistik per host (klien sinkron dan async): jumlah request, koneksi baru vs dipakai ulang, dan latensi"""
+    connections = {}
+    for session in list(_sessions.values()):
+        adapter = session.get_adapter('https://')
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            entry = connections.setdefault(pool.host, {'new_connections': 0, 'pooled_requests': 0})
+            entry['new_connections'] += pool.num_connections
+            entry['pooled_requests'] += pool.num_requests
+
+    with _lock:
+        for host, counts in _async_connections.items():
+            entry = connections.setdefault(host, {'new_connections': 0, 'pooled_requests': 0})
+            entry['new_connections'] += counts['new_connections']
+            entry['pooled_requests'] += counts['pooled_requests']
+        result = {}
+        for host, stats in _latency.items():
+            conn = connections.get(host, {'new_connections': 0, 'pooled_requests': 0})
+            result[host] = {
+                'requests': stats['requests'],
+                'errors': stats['errors'],
+                'avg_latency': round(stats['total'] / stats['requests'], 4) if stats['requests'] else 0.0,
+                'max_latency': round(stats['max'], 4),
+                'new_connections': conn['new_connections'],
+                'reused_connections': max(0, conn['pooled_requests'] - conn['new_connections']),
+            }
+        return result
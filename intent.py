@@ -0,0 +1,67 @@
+import re
+
+_TOKEN_RE = re.compile(r'\w+')
+# Klitik bahasa Indonesia yang sering menempel pada kata kunci ("alamatnya", "syaratnya")
+CLITIC_SUFFIXES = ('nya', 'kah', 'lah', 'ku', 'mu')
+
+def tokenize(text):
+    """Pecah teks menjadi token kata huruf kecil"""
+    return _TOKEN_RE.findall(text.lower())
+
+class IntentRouter:
+    """Pencocokan semua daftar kata pemicu dalam satu kali lintasan token.
+
+    Setiap frasa pemicu ditokenisasi sekali saat inisialisasi dan diindeks
+    berdasarkan token pertamanya. Pesan cukup ditokenisasi sekali, lalu setiap
+    token hanya memeriksa frasa yang diawali token tersebut. Pencocokan
+    berbasis batas kata, sehingga 'hi' tidak lagi cocok dengan 'hingga',
+    tetapi klitik umum tetap dikenali ('alamatnya' cocok dengan 'alamat').
+    """
+
+    def __init__(self, triggers):
+        """`triggers` berisi pasangan (nama_intent, daftar_frasa)"""
+        self.intents = tuple(name for name, _ in triggers)
+        self._index = {}  # token pertama -> list (tuple token frasa, intent)
+        self._vocabulary = set()
+        self._memo = {}
+        for name, phrases in triggers:
+            for phrase in phrases:
+                tokens = tuple(tokenize(phrase))
+                if tokens:
+                    self._index.setdefault(tokens[0], []).append((tokens, name))
+                    self._vocabulary.update(tokens)
+
+    def _strip_clitic(self, token):
+        if token in self._vocabulary:
+            return token
+        for suffix in CLITIC_SUFFIXES:
+            if token.endswith(suffix) and token[:-len(suffix)] in self._vocabulary:
+                return token[:-len(suffix)]
+        return token
+
+    def _normalize_tokens(self, tokens):
+        # Hasil normalisasi disimpan karena kosakata pesan warga sangat berulang
+        memo = self._memo
+        if len(memo) > 50000:
+            memo.clear()
+        normalized = []
+        for token in tokens:
+            norm = memo.get(token)
+            if norm is None:
+                norm = memo[token] = self._strip_clitic(token)
+            normalized.append(norm)
+        return normalized
+
+    def match(self, text):
+        """Kembalikan himpunan intent yang pemicunya muncul di teks"""
+        tokens = self._normalize_tokens(_TOKEN_RE.findall(text.lower()))
+        found = set()
+        index = self._index
+        for i, token in enumerate(tokens):
+            candidates = index.get(token)
+            if candidates is None:
+                continue
+            for phrase, name in candidates:
+                if len(phrase) == 1 or tuple(tokens[i:i + len(phrase)]) == phrase:
+                    found.add(name)
+        return found
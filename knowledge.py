@@ -1,17 +1,47 @@
 import json
 import os
 import re
+import time
+import sqlite3
 import logging
+import threading
+from retrieval import BM25Index
+from log_pipeline import setup_logging
+from contextlib import contextmanager
 from datetime import datetime
+from threading import Lock
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # File untuk menyimpan basis data pengetahuan
 KNOWLEDGE_FILE = os.getenv("KNOWLEDGE_FILE", "knowledge_db.json")
+# Backend penyimpanan: "sqlite" (dipakai bersama antar worker) atau "json" (file tunggal lama)
+KNOWLEDGE_BACKEND = os.getenv("KNOWLEDGE_BACKEND", "sqlite").lower()
+KNOWLEDGE_DB = os.getenv("KNOWLEDGE_DB", "knowledge_db.sqlite3")
+# Jeda minimum (detik) antar pemeriksaan versi basis data bersama
+KNOWLEDGE_REFRESH_INTERVAL = float(os.getenv("KNOWLEDGE_REFRESH_INTERVAL", "1"))
+# Perubahan dengan lebih dari sekian entri membangun ulang matcher sekaligus, bukan per entri
+KNOWLEDGE_BULK_REBUILD = int(os.getenv("KNOWLEDGE_BULK_REBUILD", "50"))
+# Keyakinan minimum BM25 (0-1) untuk menjawab dari basis data saat tidak ada pola yang cocok
+KNOWLEDGE_MIN_CONFIDENCE = float(os.getenv("KNOWLEDGE_MIN_CONFIDENCE", "0.35"))
+# Jawaban BM25 murni juga butuh sekian token kueri berbeda yang cocok dengan entri, dan
+# selisih relatif skor entri teratas dengan entri kedua; pertanyaan lanjutan yang pendek
+# dan umum ("syaratnya apa?") diteruskan ke Groq bersama riwayat percakapan
+KNOWLEDGE_MIN_TERMS = int(os.getenv("KNOWLEDGE_MIN_TERMS", "2"))
+KNOWLEDGE_MIN_MARGIN = float(os.getenv("KNOWLEDGE_MIN_MARGIN", "0.2"))
 
 def load_knowledge():
+    """Memuat basis data pengetahuan dari backend yang dikonfigurasi"""
+    if KNOWLEDGE_BACKEND == "sqlite":
+        try:
+            return KnowledgeStore(KNOWLEDGE_DB)
+        except sqlite3.Error as e:
+            logger.error(f"Gagal membuka basis data SQLite {KNOWLEDGE_DB}, memakai file JSON: {str(e)}")
+    return load_knowledge_file()
+
+def load_knowledge_file():
     """Memuat basis data pengetahuan dari file JSON"""
     knowledge_db = {}
     if os.path.exists(KNOWLEDGE_FILE):
@@ -84,14 +114,405 @@ def save_knowledge(knowledge_db):
         logger.error(f"Gagal menyimpan basis data: {str(e)}")
         return False
 
-def get_knowledge_context(question, knowledge_db):
+# ===================== PENCOCOKAN POLA PERTANYAAN =====================
+_TOKEN_RE = re.compile(r'\w+')
+
+class KnowledgeMatcher:
+    """Indeks pola 'pertanyaan' yang sudah dikompilasi untuk pencarian cepat.
+
+    Setiap pola dikompilasi sekali menjadi regex ``\\b...\\b`` dan didaftarkan
+    pada indeks token berdasarkan token terpanjangnya (umumnya paling jarang). Saat pencarian, pertanyaan
+    ditokenisasi sekali, kandidat diambil dari indeks, lalu diverifikasi dengan
+    regex yang sama seperti sebelumnya. Urutan entri dipertahankan sehingga
+    hasilnya identik dengan pencarian linear (entri pertama yang cocok menang).
+    """
+
+    def __init__(self, knowledge_db=None):
+        self._lock = Lock()
+        self.generation = 0     # naik setiap ada perubahan, dipakai indeks BM25
+        self._next_id = 0
+        self._next_order = 0    # urutan untuk entri baru; hanya naik, tidak dipakai ulang
+        self._order = {}        # keyword -> urutan entri
+        self._entry_ids = {}    # keyword -> tuple id pola
+        self._patterns = {}     # id pola -> (urutan, keyword, regex, token jangkar)
+        self._index = {}        # token -> tuple id pola
+        self._untokenized = ()  # pola tanpa karakter kata, selalu diperiksa
+        if knowledge_db:
+            self.rebuild(knowledge_db)
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def _compile(self, pattern, order, key):
+        pattern_lower = pattern.lower()
+        pattern_id = self._next_id
+        self._next_id += 1
+        regex = re.compile(r'\b' + re.escape(pattern_lower) + r'\b')
+        tokens = _TOKEN_RE.findall(pattern_lower)
+        anchor = max(tokens, key=len) if tokens else None
+        return pattern_id, (order, key, regex, anchor)
+
+    def update_entry(self, key, patterns):
+        """Tambah atau ganti pola untuk satu entri tanpa membangun ulang indeks"""
+        with self._lock:
+            self._remove_ids(self._entry_ids.get(key, ()))
+            # Entri lama mempertahankan urutannya; entri baru selalu di belakang semua entri
+            # (len(self._order) bisa bertabrakan dengan urutan entri lain setelah remove_entry)
+            order = self._order.get(key)
+            if order is None:
+                order = self._order[key] = self._next_order
+                self._next_order += 1
+            new_ids = []
+            for pattern in patterns:
+                pattern_id, compiled = self._compile(pattern, order, key)
+                anchor = compiled[3]
+                self._patterns[pattern_id] = compiled
+                if anchor is not None:
+                    self._index[anchor] = self._index.get(anchor, ()) + (pattern_id,)
+                else:
+                    self._untokenized = self._untokenized + (pattern_id,)
+                new_ids.append(pattern_id)
+            self._entry_ids[key] = tuple(new_ids)
+            self.generation += 1
+
+    def rebuild(self, knowledge_db):
+        """Bangun ulang seluruh indeks dari knowledge_db sekaligus (untuk perubahan massal).
+
+        Bucket token dikumpulkan dalam list lalu dijadikan tuple sekali, jadi
+        biayanya linear, bukan kuadratik seperti memanggil update_entry per
+        entri. Id pola melanjutkan penomoran lama sehingga pembaca yang masih
+        memegang indeks lama tidak tertukar pola.
+        """
+        with self._lock:
+            order, entry_ids, patterns, index, untokenized = {}, {}, {}, {}, []
+            for key, data in knowledge_db.items():
+                order[key] = len(order)
+                ids = []
+                for pattern in data.get('pertanyaan', []):
+                    pattern_id, compiled = self._compile(pattern, order[key], key)
+                    patterns[pattern_id] = compiled
+                    if compiled[3] is not None:
+                        index.setdefault(compiled[3], []).append(pattern_id)
+                    else:
+                        untokenized.append(pattern_id)
+                    ids.append(pattern_id)
+                entry_ids[key] = tuple(ids)
+            # Pola diganti sebelum indeks: id dari indeks lama tetap tidak ditemukan, bukan salah pola
+            self._patterns = patterns
+            self._index = {token: tuple(ids) for token, ids in index.items()}
+            self._untokenized = tuple(untokenized)
+            self._order = order
+            self._next_order = len(order)
+            self._entry_ids = entry_ids
+            self.generation += 1
+
+    def remove_entry(self, key):
+        """Hapus seluruh pola milik satu entri"""
+        with self._lock:
+            self._remove_ids(self._entry_ids.pop(key, ()))
+            self._order.pop(key, None)
+            self.generation += 1
+
+    def _remove_ids(self, pattern_ids):
+        # Tuple baru menggantikan yang lama agar pembaca tidak perlu mengunci
+        stale = set(pattern_ids)
+        if not stale:
+            return
+        for pattern_id in stale:
+            anchor = self._patterns.pop(pattern_id)[3]
+            bucket = self._index.get(anchor) if anchor is not None else None
+            if bucket is not None:
+                remaining = tuple(i for i in bucket if i != pattern_id)
+                if remaining:
+                    self._index[anchor] = remaining
+                else:
+                    del self._index[anchor]
+        self._untokenized = tuple(i for i in self._untokenized if i not in stale)
+
+    def match(self, question):
+        """Kembalikan keyword entri pertama yang cocok, atau None"""
+        for key in self._matching(question):
+            return key
+        return None
+
+    def match_all(self, question):
+        """Kembalikan semua keyword yang cocok, urut sesuai urutan entri"""
+        keys = []
+        for key in self._matching(question):
+            if key not in keys:
+                keys.append(key)
+        return keys
+
+    def _matching(self, question):
+        question_lower = question.lower()
+        candidate_ids = set(self._untokenized)
+        index = self._index
+        for token in set(_TOKEN_RE.findall(question_lower)):
+            bucket = index.get(token)
+            if bucket:
+                candidate_ids.update(bucket)
+        if not candidate_ids:
+            return
+
+        candidates = []
+        for pattern_id in candidate_ids:
+            entry = self._patterns.get(pattern_id)
+            if entry is not None:
+                candidates.append(entry)
+        candidates.sort(key=lambda c: c[0])
+        for _, key, regex, _ in candidates:
+            if regex.search(question_lower):
+                yield key
+
+# Matcher dibangun malas untuk basis data yang sedang dipakai
+_matcher = None
+_matcher_db_id = None
+_matcher_lock = Lock()
+
+def get_matcher(knowledge_db):
+    """Ambil matcher untuk knowledge_db, bangun ulang jika basis datanya berganti"""
+    global _matcher, _matcher_db_id
+    # KnowledgeStore memelihara matcher-nya sendiri
+    own_matcher = getattr(knowledge_db, 'matcher', None)
+    if own_matcher is not None:
+        return own_matcher
+    matcher = _matcher
+    if matcher is not None and _matcher_db_id == id(knowledge_db) and \
+            len(matcher._entry_ids) == len(knowledge_db):
+        return matcher
+    with _matcher_lock:
+        if _matcher is None or _matcher_db_id != id(knowledge_db) or \
+                len(_matcher._entry_ids) != len(knowledge_db):
+            _matcher = KnowledgeMatcher(knowledge_snapshot(knowledge_db))
+            _matcher_db_id = id(knowledge_db)
+        return _matcher
+
+# ===================== PENYIMPANAN BERSAMA (SQLITE) =====================
+class KnowledgeStore(dict):
+    """Basis data pengetahuan berbasis SQLite (mode WAL) dengan penghitung versi.
+
+    Objek ini tetap berupa dict sehingga bisa langsung dipakai
+    get_knowledge_context, dan memelihara KnowledgeMatcher-nya sendiri. Setiap perubahan menaikkan versi global dan
+    menandai baris dengan versi tersebut; worker lain cukup membaca baris
+    dengan versi lebih baru dari miliknya lalu memperbarui matcher per entri.
+    """
+
+    def __init__(self, path, refresh_interval=KNOWLEDGE_REFRESH_INTERVAL):
+        super().__init__()
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.version = 0
+        self.matcher = KnowledgeMatcher()
+        self._local = threading.local()
+        self._refresh_lock = Lock()
+        self._data_lock = Lock()     # dipegang _apply saat mengubah isi dict
+        self._next_check = 0.0
+        self._init_schema()
+        self.refresh(force=True)
+
+    def _conn(self):
+        # Satu koneksi per thread per proses; koneksi tidak boleh melewati fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """Tutup koneksi SQLite milik thread ini; dibuka lagi saat dibutuhkan"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "keyword TEXT PRIMARY KEY, data TEXT, position INTEGER NOT NULL, "
+            "version INTEGER NOT NULL, deleted INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_version ON entries(version)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0)")
+
+        # Isi awal dari file JSON lama (atau data default) jika tabel masih kosong
+        if conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 0:
+            seed = load_knowledge_file() if os.path.exists(KNOWLEDGE_FILE) else initialize_default_knowledge()
+            with self._transaction() as conn:
+                if conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 0:
+                    self._write_entries(conn, seed.items())
+                    logger.info(f"Basis data pengetahuan SQLite diisi {len(seed)} entri awal")
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _write_entries(self, conn, items, deleted=False):
+        """Tulis entri dalam transaksi yang sedang berjalan dengan satu versi baru"""
+        version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0] + 1
+        start = conn.execute("SELECT COALESCE(MAX(position), -1) FROM entries").fetchone()[0] + 1
+        count = 0
+
+        def rows():
+            # Generator: `items` boleh berupa aliran panjang tanpa dimuat seluruhnya ke memori
+            nonlocal count
+            for position, (keyword, entry) in enumerate(items, start):
+                count += 1
+                yield (keyword, None if deleted else json.dumps(entry, ensure_ascii=False), position, version, int(deleted))
+
+        # Posisi lama dipertahankan agar urutan prioritas pencocokan tidak berubah; entri yang
+        # dihapus lalu ditambahkan lagi diperlakukan sebagai entri baru (posisi terbesar)
+        conn.executemany(
+            "INSERT INTO entries (keyword, data, position, version, deleted) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(keyword) DO UPDATE SET data = excluded.data, version = excluded.version, "
+            "position = CASE WHEN entries.deleted THEN excluded.position ELSE entries.position END, "
+            "deleted = excluded.deleted",
+            rows()
+        )
+        conn.execute("UPDATE meta SET value = ? WHERE key = 'version'", (version,))
+        return count
+
+    def put_entry(self, keyword, entry):
+        """Simpan satu entri lalu terapkan perubahan ke salinan lokal"""
+        self.put_entries([(keyword, entry)])
+
+    def put_entries(self, items):
+        """Simpan banyak entri dalam satu transaksi"""
+        with self._transaction() as conn:
+            count = self._write_entries(conn, items)
+        self.refresh(force=True)
+        return count
+
+    def delete_entry(self, keyword):
+        """Tandai entri terhapus (tombstone) agar worker lain ikut menghapusnya"""
+        with self._transaction() as conn:
+            self._write_entries(conn, [(keyword, None)], deleted=True)
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """Terapkan perubahan dari worker lain; murah jika versi belum berubah"""
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        if not self._refresh_lock.acquire(blocking=force):
+            return False
+        try:
+            self._next_check = now + self.refresh_interval
+            conn = self._conn()
+            version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+            if version == self.version:
+                return False
+            rows = conn.execute(
+                "SELECT keyword, data, deleted FROM entries WHERE version > ? ORDER BY position",
+                (self.version,)
+            ).fetchall()
+            self._apply(rows)
+            logger.info(f"Basis data pengetahuan diperbarui ke versi {version} ({len(rows)} entri berubah)")
+            self.version = version
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Gagal memperbarui basis data pengetahuan: {str(e)}")
+            return False
+        finally:
+            self._refresh_lock.release()
+
+    def snapshot(self):
+        """Salinan dict biasa yang aman diiterasi selagi refresh menerapkan perubahan"""
+        with self._data_lock:
+            return dict(self)
+
+    def _apply(self, rows):
+        # Keyword baru (termasuk yang dihapus lalu ditambahkan lagi) mendapat posisi terbesar
+        # di _write_entries dan ditambahkan di akhir dict, sehingga urutan dict dan urutan
+        # matcher sama dengan urutan posisi di SQLite
+        matcher = self.matcher
+        bulk = len(rows) > KNOWLEDGE_BULK_REBUILD
+        with self._data_lock:
+            for keyword, data, deleted in rows:
+                if deleted:
+                    if keyword in self:
+                        del self[keyword]
+                        if not bulk:
+                            matcher.remove_entry(keyword)
+                    continue
+                entry = json.loads(data)
+                self[keyword] = entry
+                if not bulk:
+                    matcher.update_entry(keyword, entry.get('pertanyaan', []))
+        if bulk:
+            # Hanya _apply (di bawah _refresh_lock) yang mengubah dict ini, jadi iterasinya aman
+            matcher.rebuild(self)
+
+def knowledge_snapshot(knowledge_db):
+    """Salinan knowledge_db untuk diiterasi tanpa bentrok dengan perubahan dari thread lain"""
+    snapshot = getattr(knowledge_db, 'snapshot', None)
+    return snapshot() if snapshot is not None else dict(knowledge_db)
+
+def refresh_knowledge(knowledge_db):
+    """Ambil perubahan terbaru jika basis data dipakai bersama antar worker"""
+    refresh = getattr(knowledge_db, 'refresh', None)
+    if refresh is not None:
+        refresh()
+
+# Indeks BM25 dibangun ulang malas setiap kali matcher berubah
+_retriever = None
+_retriever_key = None
+_retriever_lock = Lock()
+
+def get_retriever(knowledge_db):
+    """Ambil indeks BM25 untuk knowledge_db, bangun ulang jika isinya berubah"""
+    global _retriever, _retriever_key
+    key = (id(knowledge_db), get_matcher(knowledge_db).generation)
+    retriever = _retriever
+    if retriever is not None and _retriever_key == key:
+        return retriever
+    with _retriever_lock:
+        if _retriever is None or _retriever_key != key:
+            _retriever = BM25Index(knowledge_snapshot(knowledge_db))
+            _retriever_key = key
+        return _retriever
+
+def find_knowledge_entry(question, knowledge_db, min_confidence=None):
+    """Cari keyword entri terbaik: pola yang cocok diperingkat BM25, lalu BM25 murni"""
+    if min_confidence is None:
+        min_confidence = KNOWLEDGE_MIN_CONFIDENCE
+    keys = get_matcher(knowledge_db).match_all(question)
+    if len(keys) == 1:
+        return keys[0]
+    retriever = get_retriever(knowledge_db)
+    if keys:
+        # Beberapa pola cocok: pilih skor BM25 tertinggi, seri dimenangkan urutan entri
+        scores = retriever.score(question, keys)
+        return max(keys, key=lambda k: scores[k])
+
+    hits = retriever.search(question, top_k=2)
+    if not hits:
+        return None
+    key, score, confidence, matched = hits[0]
+    if confidence < min_confidence or matched < KNOWLEDGE_MIN_TERMS:
+        return None
+    if len(hits) > 1 and (score - hits[1][1]) / score < KNOWLEDGE_MIN_MARGIN:
+        return None  # dua entri hampir seri: pertanyaannya ambigu
+    return key
+
+def get_knowledge_context(question, knowledge_db, min_confidence=None):
     """Mencari jawaban dari basis data pengetahuan yang sesuai dengan pertanyaan"""
-    question_lower = question.lower()
-    for key, data in knowledge_db.items():
-        for pattern in data['pertanyaan']:
-            if re.search(r'\b' + re.escape(pattern.lower()) + r'\b', question_lower):
-                return data['jawaban']
-    return None
+    key = find_knowledge_entry(question, knowledge_db, min_confidence)
+    if key is None:
+        return None
+    data = knowledge_db.get(key)
+    return data['jawaban'] if data else None
 
 def add_update(new_info, knowledge_db):
     """Menambahkan atau memperbarui basis data pengetahuan dari input admin"""
@@ -113,14 +534,21 @@ def add_update(new_info, knowledge_db):
         pertanyaan_list = [p.strip() for p in pertanyaans.split(',')]
         
         # Perbarui atau tambahkan entri baru
-        knowledge_db[keyword] = {
+        entry = {
             "pertanyaan": pertanyaan_list,
             "jawaban": jawaban,
             "sumber": "Admin DISNAKERTRANSPERIN",
             "terakhir_update": datetime.now().strftime("%Y-%m-%d")
         }
         
-        save_knowledge(knowledge_db)
+        if isinstance(knowledge_db, KnowledgeStore):
+            # Cukup tulis satu baris; worker lain mengambilnya lewat nomor versi
+            knowledge_db.put_entry(keyword, entry)
+        else:
+            matcher = get_matcher(knowledge_db)
+            knowledge_db[keyword] = entry
+            matcher.update_entry(keyword, pertanyaan_list)
+            save_knowledge(knowledge_db)
         return f"Pengetahuan '{keyword}' berhasil diperbarui"
     except Exception as e:
         return f"Error: {str(e)}"
@@ -0,0 +1,203 @@
+"""Impor dan ekspor massal basis data pengetahuan (JSONL dan CSV).
+
+File dibaca per baris sehingga ukuran file tidak dibatasi memori. Setiap
+entri divalidasi; entri yang tidak valid dilewati dan dilaporkan (atau
+membatalkan seluruh impor dengan --strict). Semua entri valid ditulis dalam
+satu transaksi SQLite dan matcher serta indeks BM25 dibangun ulang sekali.
+
+Format JSONL, satu entri per baris:
+
+    {"keyword": "syarat_ak1", "pertanyaan": ["syarat ak1", "dokumen ak1"], "jawaban": "...",
+     "sumber": "...", "terakhir_update": "2025-06-10"}
+
+Format CSV dengan header keyword,pertanyaan,jawaban,sumber,terakhir_update;
+beberapa pola pertanyaan dipisah "|".
+
+    python knowledge_io.py import faq.jsonl
+    python knowledge_io.py import faq.csv --strict
+    python knowledge_io.py export cadangan.jsonl
+"""
+import csv
+import sys
+import json
+import time
+import argparse
+import logging
+from datetime import datetime
+
+from knowledge import (
+    KnowledgeStore, get_matcher, get_retriever, knowledge_snapshot, load_knowledge, save_knowledge,
+)
+from log_pipeline import setup_logging
+
+logger = logging.getLogger(__name__)
+
+CSV_FIELDS = ('keyword', 'pertanyaan', 'jawaban', 'sumber', 'terakhir_update')
+CSV_PATTERN_SEPARATOR = '|'
+IMPORT_SOURCE = "Impor massal DISNAKERTRANSPERIN"
+MAX_KEYWORD_CHARS = 100
+MAX_ANSWER_CHARS = 4096  # batas satu pesan WhatsApp
+MAX_REPORTED_ERRORS = 20
+
+class ImportAborted(Exception):
+    """Impor --strict dibatalkan karena ada entri tidak valid"""
+
+def detect_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+def iter_jsonl(f):
+    """(nomor baris, objek) untuk setiap baris JSONL yang tidak kosong"""
+    for line_no, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, ValueError(f"JSON tidak valid: {e.msg}")
+
+def iter_csv(f):
+    """(nomor baris, objek) untuk setiap baris CSV; pola pertanyaan dipisah '|'"""
+    reader = csv.DictReader(f)
+    missing = {'keyword', 'pertanyaan', 'jawaban'} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"Kolom CSV wajib tidak ada: {', '.join(sorted(missing))}")
+    for row in reader:
+        row['pertanyaan'] = (row.get('pertanyaan') or '').split(CSV_PATTERN_SEPARATOR)
+        yield reader.line_num, row
+
+def validate_entry(raw):
+    """Ubah objek mentah menjadi (keyword, entri) atau lempar ValueError"""
+    if isinstance(raw, Exception):
+        raise raw
+    if not isinstance(raw, dict):
+        raise ValueError("entri harus berupa objek")
+    keyword = str(raw.get('keyword') or '').strip()
+    if not keyword:
+        raise ValueError("keyword kosong")
+    if len(keyword) > MAX_KEYWORD_CHARS:
+        raise ValueError(f"keyword lebih dari {MAX_KEYWORD_CHARS} karakter")
+    patterns = raw.get('pertanyaan')
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    if not isinstance(patterns, list):
+        raise ValueError("pertanyaan harus berupa daftar")
+    patterns = [str(p).strip() for p in patterns if str(p).strip()]
+    if not patterns:
+        raise ValueError("pertanyaan kosong")
+    answer = str(raw.get('jawaban') or '').strip()
+    if not answer:
+        raise ValueError("jawaban kosong")
+    if len(answer) > MAX_ANSWER_CHARS:
+        raise ValueError(f"jawaban lebih dari {MAX_ANSWER_CHARS} karakter")
+    updated = str(raw.get('terakhir_update') or '').strip() or datetime.now().strftime("%Y-%m-%d")
+    try:
+        datetime.strptime(updated, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"terakhir_update bukan tanggal YYYY-MM-DD: {updated}")
+    return keyword, {
+        "pertanyaan": patterns,
+        "jawaban": answer,
+        "sumber": str(raw.get('sumber') or '').strip() or IMPORT_SOURCE,
+        "terakhir_update": updated,
+    }
+
+def import_entries(path, knowledge_db, fmt=None, strict=False):
+    """Impor file JSONL/CSV ke knowledge_db; kembalikan laporan jumlah dan waktu"""
+    fmt = fmt or detect_format(path)
+    report = {'read': 0, 'imported': 0, 'invalid': 0, 'duplicates': 0, 'errors': []}
+    seen = set()
+    start = time.perf_counter()
+
+    def valid_entries(records):
+        for line_no, raw in records:
+            report['read'] += 1
+            try:
+                keyword, entry = validate_entry(raw)
+            except ValueError as e:
+                report['invalid'] += 1
+                if len(report['errors']) < MAX_REPORTED_ERRORS:
+                    report['errors'].append(f"baris {line_no}: {e}")
+                if strict:
+                    raise ImportAborted(f"baris {line_no}: {e}")
+                continue
+            # Keyword yang muncul lagi menimpa entri sebelumnya (yang terakhir menang)
+            if keyword in seen:
+                report['duplicates'] += 1
+            seen.add(keyword)
+            yield keyword, entry
+
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        records = iter_csv(f) if fmt == 'csv' else iter_jsonl(f)
+        if isinstance(knowledge_db, KnowledgeStore):
+            # Satu transaksi; worker lain menerima seluruh perubahan lewat satu nomor versi
+            knowledge_db.put_entries(valid_entries(records))
+        else:
+            # Backend file JSON: tulis file dan bangun matcher sekali setelah semua entri masuk
+            matcher = get_matcher(knowledge_db)
+            staged = dict(valid_entries(records))
+            knowledge_db.update(staged)
+            matcher.rebuild(knowledge_db)
+            save_knowledge(knowledge_db)
+    report['imported'] = len(seen)
+    report['write_seconds'] = round(time.perf_counter() - start, 3)
+
+    # Matcher sudah dibangun ulang saat perubahan diterapkan; indeks BM25 dibangun di sini sekali
+    index_start = time.perf_counter()
+    get_retriever(knowledge_db)
+    report['index_seconds'] = round(time.perf_counter() - index_start, 3)
+    report['total_seconds'] = round(time.perf_counter() - start, 3)
+    report['entries'] = len(knowledge_db)
+    return report
+
+def export_entries(path, knowledge_db, fmt=None):
+    """Tulis seluruh entri ke file JSONL/CSV; kembalikan laporan jumlah dan waktu"""
+    fmt = fmt or detect_format(path)
+    start = time.perf_counter()
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS) if fmt == 'csv' else None
+        if writer is not None:
+            writer.writeheader()
+        for keyword, entry in knowledge_snapshot(knowledge_db).items():
+            record = {
+                'keyword': keyword,
+                'pertanyaan': entry.get('pertanyaan', []),
+                'jawaban': entry.get('jawaban', ''),
+                'sumber': entry.get('sumber', ''),
+                'terakhir_update': entry.get('terakhir_update', ''),
+            }
+            if writer is not None:
+                record['pertanyaan'] = CSV_PATTERN_SEPARATOR.join(record['pertanyaan'])
+                writer.writerow(record)
+            else:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            count += 1
+    return {'exported': count, 'total_seconds': round(time.perf_counter() - start, 3)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Impor/ekspor massal basis data pengetahuan")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('import', 'impor entri dari file'), ('export', 'ekspor semua entri ke file')):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('path')
+        command.add_argument('--format', choices=('jsonl', 'csv'), help='bawaan: dari ekstensi file')
+    commands.choices['import'].add_argument(
+        '--strict', action='store_true', help='batalkan seluruh impor jika ada entri tidak valid'
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+    knowledge_db = load_knowledge()
+    try:
+        if args.command == 'import':
+            report = import_entries(args.path, knowledge_db, args.format, args.strict)
+        else:
+            report = export_entries(args.path, knowledge_db, args.format)
+    except (ImportAborted, ValueError, OSError) as e:
+        print(f"Gagal: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
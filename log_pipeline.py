@@ -0,0 +1,233 @@
+"""Logging asinkron: QueueHandler di thread pemanggil, format dan tulis di thread latar.
+
+Thread request hanya menaruh record ke antrian berukuran tetap; formatting,
+penyamaran data pribadi (nomor telepon dan isi pesan warga), dan penulisan ke
+stderr dilakukan QueueListener. Record INFO ke bawah yang sangat sering
+muncul dari baris kode yang sama di-sampling, dan record yang tidak muat di
+antrian dibuang dengan penghitung alih-alih memblokir request.
+
+Data pribadi sebaiknya dikirim lewat `extra` agar tidak masuk teks pesan:
+
+    logger.info("Pesan masuk", extra={'phone': from_number, 'text': incoming_msg})
+
+Field 'phone' disamarkan, 'text' diganti panjangnya saja, dan 'body' (isi
+respons upstream) dipotong serta nomor teleponnya disamarkan. Nomor telepon
+yang tetap tertulis di teks pesan juga disamarkan. Query string URL (misalnya
+dari pesan exception requests/httpx, yang memuat pertanyaan warga dan api_key
+SerpAPI) selalu dihapus dari pesan, field extra, dan traceback.
+"""
+import os
+import re
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from datetime import datetime, timezone
+
+from metrics import registry
+
+# ===================== KONFIGURASI =====================
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()             # "json" atau "text"
+LOG_MASK_PII = os.getenv("LOG_MASK_PII", "true").lower() in ("1", "true", "yes")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# WARNING ke atas boleh menunggu sebentar saat antrian penuh; INFO langsung dibuang
+LOG_QUEUE_BLOCK = float(os.getenv("LOG_QUEUE_BLOCK", "0.05"))
+# Per baris kode: LOG_SAMPLE_BURST record INFO pertama per LOG_SAMPLE_WINDOW detik
+# selalu ditulis, sesudahnya hanya 1 dari setiap LOG_SAMPLE_EVERY (1 = tanpa sampling)
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", "10"))
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "50"))
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "10"))
+LOG_BODY_MAX_CHARS = int(os.getenv("LOG_BODY_MAX_CHARS", "300"))
+
+# Nomor Indonesia (62/+62/0 diikuti 8) dan deretan digit panjang lain yang mirip nomor
+_PHONE_RE = re.compile(r'(?<![\w])(?:\+?62|0)8\d{7,12}(?!\d)|(?<![\w])\+?\d{10,15}(?!\d)')
+
+# Query string URL, termasuk URL tanpa skema di pesan urllib3 ("url: /search?q=...&api_key=...")
+_QUERY_RE = re.compile(r'\?[^\s"\'<>()#?]*=[^\s"\'<>()#]*')
+_QUERY_REPLACEMENT = '?<query disembunyikan>'
+
+# Atribut bawaan LogRecord; atribut lain berasal dari `extra`
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+log_dropped = registry.counter(
+    "chatbot_log_dropped_total", "Record log yang tidak ditulis per alasan dan level", ("reason", "level")
+)
+
+def mask_phone(value):
+    """Samarkan nomor telepon: 4 digit awal dan 2 digit akhir tetap terlihat"""
+    digits = str(value)
+    if len(digits) <= 6:
+        return '*' * len(digits)
+    return digits[:4] + '*' * (len(digits) - 6) + digits[-2:]
+
+def mask_text(text):
+    """Samarkan nomor telepon di dalam teks bebas"""
+    return _PHONE_RE.sub(lambda match: mask_phone(match.group(0)), text)
+
+def strip_query(text):
+    """Hapus query string URL (bisa berisi isi pesan warga dan API key)"""
+    return _QUERY_RE.sub(_QUERY_REPLACEMENT, text)
+
+def _scrub(text):
+    text = strip_query(text)
+    return mask_text(text) if LOG_MASK_PII else text
+
+def _masked_extra(name, value):
+    if not LOG_MASK_PII:
+        return strip_query(value) if isinstance(value, str) else value
+    if name == 'phone':
+        return mask_phone(value) if value else value
+    if name == 'text':
+        return f"<{len(value or '')} karakter>"
+    if name == 'body':
+        return _scrub(str(value)[:LOG_BODY_MAX_CHARS])
+    return _scrub(value) if isinstance(value, str) else value
+
+def _record_message(record):
+    return _scrub(record.getMessage())
+
+def _record_extras(record):
+    return {
+        name: _masked_extra(name, value)
+        for name, value in record.__dict__.items()
+        if name not in _RECORD_FIELDS and not name.startswith('_')
+    }
+
+class JsonFormatter(logging.Formatter):
+    """Satu objek JSON per baris dengan data pribadi disamarkan"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': _record_message(record),
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        entry.update(_record_extras(record))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+    def formatException(self, exc_info):
+        return _scrub(super().formatException(exc_info))
+
+class TextFormatter(logging.Formatter):
+    """Format teks lama (waktu, level, pesan) ditambah field extra yang disamarkan"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+    def formatMessage(self, record):
+        record.message = _record_message(record)
+        extras = _record_extras(record)
+        line = super().formatMessage(record)
+        if extras:
+            line += ' ' + ' '.join(f"{name}={value}" for name, value in extras.items())
+        return line
+
+    def formatException(self, exc_info):
+        return _scrub(super().formatException(exc_info))
+
+class SamplingFilter(logging.Filter):
+    """Batasi record INFO ke bawah per baris kode; WARNING ke atas selalu lolos"""
+
+    def __init__(self, window=LOG_SAMPLE_WINDOW, burst=LOG_SAMPLE_BURST, every=LOG_SAMPLE_EVERY):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.every = max(1, every)
+        self._sites = {}  # (logger, baris) -> [awal jendela, jumlah]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.every == 1:
+            return True
+        key = (record.name, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                site = self._sites[key] = [now, 0]
+            site[1] += 1
+            count = site[1]
+        if count <= self.burst or (count - self.burst) % self.every == 0:
+            return True
+        log_dropped.inc('sampled', record.levelname)
+        return False
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler yang tidak pernah memblokir lama dan memulai ulang listener setelah fork"""
+
+    def __init__(self, queue_size, target):
+        super().__init__(queue.Queue(queue_size))
+        self.queue_size = queue_size
+        self.target = target
+        self.listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.start()
+
+    def start(self):
+        """Mulai listener milik proses ini (thread listener tidak ikut ter-fork)"""
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self.queue = queue.Queue(self.queue_size)
+            self.listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=True)
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self._pid = None
+
+    def prepare(self, record):
+        # Cukup gabungkan argumen pesan; format, penyamaran, dan traceback dikerjakan listener
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self.start()
+        try:
+            if record.levelno >= logging.WARNING and LOG_QUEUE_BLOCK > 0:
+                self.queue.put(record, timeout=LOG_QUEUE_BLOCK)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            log_dropped.inc('queue_full', record.levelname)
+
+_handler = None
+_setup_lock = threading.Lock()
+
+def setup_logging():
+    """Pasang pipeline logging di root logger (sekali per proses; aman dipanggil berulang).
+
+    Seperti logging.basicConfig, root logger yang sudah punya handler dari
+    pihak lain dibiarkan apa adanya.
+    """
+    global _handler
+    with _setup_lock:
+        root = logging.getLogger()
+        if _handler is not None or root.handlers:
+            return _handler
+        target = logging.StreamHandler(sys.stderr)
+        target.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else TextFormatter())
+        _handler = DroppingQueueHandler(LOG_QUEUE_SIZE, target)
+        _handler.addFilter(SamplingFilter())
+        root.addHandler(_handler)
+        root.setLevel(LOG_LEVEL)
+        registry.gauge("chatbot_log_queue_depth", "Record log yang menunggu ditulis", lambda: _handler.queue.qsize())
+        # Tulis sisa antrian sebelum proses keluar
+        atexit.register(_handler.stop)
+        return _handler
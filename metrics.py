@@ -0,0 +1,279 @@
+"""Metrik Prometheus tanpa dependensi tambahan.
+
+Nilai counter dan histogram disimpan per proses. Dengan METRICS_DIR setiap
+proses menulis snapshot nilainya ke METRICS_DIR/metrics_<pid>.json (setiap
+METRICS_FLUSH_INTERVAL detik dan saat /metrics diminta), dan /metrics
+menjumlahkan snapshot semua proses, sehingga worker gunicorn mana pun yang
+menjawab memberi total yang sama dan counter tidak mundur antar scrape.
+Snapshot worker yang sudah berhenti tetap dihitung. Gauge selalu dibaca dari
+proses yang menjawab. Tanpa METRICS_DIR setiap scrape hanya berisi metrik satu
+worker; gunicorn.conf.py mengisi METRICS_DIR otomatis.
+"""
+import os
+import json
+import glob
+import bisect
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+
+# Batas bucket (detik) bawaan, mencakup jalur cepat lokal hingga timeout upstream 15 detik
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Penghitung monoton dengan label"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    def reset(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def collect(self, snapshots=None):
+        """Baris metrik dari nilai proses ini, atau jumlah `snapshots` semua proses"""
+        if snapshots is None:
+            with self._lock:
+                items = list(self._values.items())
+        else:
+            totals = {}
+            for snapshot in snapshots:
+                for labels, value in snapshot:
+                    labels = tuple(labels)
+                    totals[labels] = totals.get(labels, 0) + value
+            items = totals.items()
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+class Histogram:
+    """Histogram kumulatif bergaya Prometheus dengan label"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label -> [hitungan per bucket (+Inf terakhir), jumlah, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labels):
+        """Context manager untuk mengukur durasi blok kode"""
+        return _Timer(self, labels)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(labels), list(s[0]), s[1], s[2]] for labels, s in self._series.items()]
+
+    def reset(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def collect(self, snapshots=None):
+        """Baris metrik dari nilai proses ini, atau jumlah `snapshots` semua proses"""
+        if snapshots is None:
+            with self._lock:
+                items = [(labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items()]
+        else:
+            merged = {}
+            for snapshot in snapshots:
+                for labels, counts, total, count in snapshot:
+                    if len(counts) != len(self.buckets) + 1:
+                        continue  # snapshot dari versi dengan bucket lain
+                    labels = tuple(labels)
+                    series = merged.setdefault(labels, ([0] * len(counts), [0.0, 0]))
+                    for i, bucket_count in enumerate(counts):
+                        series[0][i] += bucket_count
+                    series[1][0] += total
+                    series[1][1] += count
+            items = [(labels, (counts, sums[0], sums[1])) for labels, (counts, sums) in merged.items()]
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                label_str = _format_labels(self.labelnames, labels, ('le', _format_value(bound)))
+                yield f"{self.name}_bucket{label_str} {cumulative}"
+            label_str = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_str} {_format_value(total)}"
+            yield f"{self.name}_count{label_str} {count}"
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+class Gauge:
+    """Nilai sesaat yang dibaca dari fungsi saat /metrics diminta"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def collect(self, snapshots=None):
+        yield f"{self.name} {_format_value(self.callback())}"
+
+class Registry:
+    """Kumpulan metrik yang dirender dalam format teks Prometheus.
+
+    Dengan `directory`, nilai dijumlahkan dari snapshot semua proses di direktori itu.
+    """
+
+    def __init__(self, directory=None, flush_interval=METRICS_FLUSH_INTERVAL):
+        self._metrics = []
+        self.directory = directory or None
+        self.flush_interval = flush_interval
+        self._flusher_pid = None
+        self._flusher_lock = threading.Lock()
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, callback):
+        return self.register(Gauge(name, documentation, callback))
+
+    # ---------- Snapshot antar proses ----------
+    def _snapshot_path(self, pid=None):
+        return os.path.join(self.directory, f"metrics_{pid or os.getpid()}.json")
+
+    def write_snapshot(self):
+        """Tulis nilai proses ini ke direktori bersama (atomik lewat rename)"""
+        snapshot = {m.name: m.snapshot() for m in self._metrics if hasattr(m, 'snapshot')}
+        path = self._snapshot_path()
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, path)
+
+    def _read_snapshots(self):
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "metrics_*.json")):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def ensure_flusher(self):
+        """Jalankan thread penulis snapshot sekali per proses (tanpa direktori: tidak ada)"""
+        if self.directory is None or self._flusher_pid == os.getpid():
+            return
+        with self._flusher_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            threading.Thread(target=self._flush_forever, name="metrics-flusher", daemon=True).start()
+            self._flusher_pid = os.getpid()
+
+    def _flush_forever(self):
+        while True:
+            try:
+                self.write_snapshot()
+            except OSError as e:
+                logger.error(f"Gagal menulis snapshot metrik: {str(e)}")
+            time.sleep(self.flush_interval)
+
+    def _reset_after_fork(self):
+        # Nilai milik proses induk tetap dilaporkan induk; worker mulai dari nol
+        for metric in self._metrics:
+            if hasattr(metric, 'reset'):
+                metric.reset()
+        self._flusher_lock = threading.Lock()
+
+    def render(self):
+        snapshots = None
+        if self.directory is not None:
+            self.ensure_flusher()
+            try:
+                self.write_snapshot()
+                snapshots = self._read_snapshots()
+            except OSError as e:
+                logger.error(f"Gagal membaca snapshot metrik, memakai nilai proses ini: {str(e)}")
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            try:
+                parts = None if snapshots is None else [snapshot.get(metric.name, []) for snapshot in snapshots]
+                lines.extend(metric.collect(parts))
+            except Exception as e:
+                lines.append(f"# gagal mengumpulkan {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+# Registry bawaan proses ini beserta metrik inti yang dipakai beberapa modul
+registry = Registry(METRICS_DIR)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry._reset_after_fork)
+
+upstream_latency = registry.histogram(
+    "chatbot_upstream_request_seconds",
+    "Latensi panggilan HTTP ke upstream (WATI, Groq, SerpAPI)",
+    ("upstream", "outcome")
+)
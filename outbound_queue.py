@@ -0,0 +1,462 @@
+import os
+import json
+import heapq
+import socket
+import sqlite3
+import logging
+import itertools
+import threading
+import time
+from collections import deque
+from threading import Condition
+
+logger = logging.getLogger(__name__)
+
+def _latency_summary(latencies):
+    """Ringkasan persentil dari daftar latensi yang sudah diurutkan"""
+    def percentile(p):
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+    return {
+        'samples': len(latencies),
+        'p50': round(percentile(0.50), 4),
+        'p95': round(percentile(0.95), 4),
+        'max': round(latencies[-1], 4) if latencies else 0.0,
+    }
+
+class OutboundQueue:
+    """Antrian pesan keluar dengan penjadwalan tunda (delay queue).
+
+    Pesan dikelompokkan per nomor tujuan (lane) sehingga balasan ke nomor
+    yang sama selalu terkirim berurutan, sementara nomor yang berbeda bisa
+    dikirim paralel oleh beberapa worker. Pesan yang gagal diparkir sampai
+    waktu retry-nya tiba tanpa menahan pesan lain.
+
+    Antarmuka ``put((prioritas, data))`` dan ``get()`` sama dengan PriorityQueue;
+    setelah ``get()`` worker wajib memanggil ``ack(data)`` atau ``retry(data, delay)``.
+    """
+
+    def __init__(self, latency_window=1000):
+        self._cond = Condition()
+        self._seq = itertools.count()
+        self._lanes = {}       # nomor -> deque[(prioritas, data)]
+        self._ready = []       # heap (prioritas, seq, nomor) untuk lane yang siap kirim
+        self._delayed = []     # heap (waktu_siap, seq, nomor) untuk lane yang menunggu retry
+        self._busy = set()     # lane yang kepalanya sedang dikirim worker
+        self._size = 0
+        self._latencies = deque(maxlen=latency_window)
+        self._counters = {'enqueued': 0, 'sent': 0, 'send_errors': 0, 'retries': 0, 'dropped': 0}
+
+    # ---------- Operasi antrian ----------
+    def put(self, item):
+        """Tambahkan (prioritas, data) ke lane nomor tujuannya"""
+        priority, message_data = item
+        to = message_data['to']
+        with self._cond:
+            lane = self._lanes.setdefault(to, deque())
+            lane.append((priority, message_data))
+            self._size += 1
+            self._counters['enqueued'] += 1
+            if len(lane) == 1 and to not in self._busy:
+                heapq.heappush(self._ready, (priority, next(self._seq), to))
+                self._cond.notify()
+
+    def get(self, timeout=None):
+        """Ambil pesan siap kirim berikutnya; memblokir sampai ada"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._release_due(now)
+                if self._ready:
+                    _, _, to = heapq.heappop(self._ready)
+                    self._busy.add(to)
+                    return self._lanes[to][0]
+
+                wait = None
+                if self._delayed:
+                    wait = max(0.0, self._delayed[0][0] - now)
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        return None
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._cond.wait(wait)
+
+    def ack(self, message_data, dropped=False):
+        """Tandai kepala lane selesai (terkirim atau dibuang) dan lanjutkan lane"""
+        to = message_data['to']
+        with self._cond:
+            lane = self._lanes.get(to)
+            if not lane:
+                return
+            if dropped:
+                self._counters['dropped'] += 1
+            lane.popleft()
+            self._size -= 1
+            self._busy.discard(to)
+            if lane:
+                heapq.heappush(self._ready, (lane[0][0], next(self._seq), to))
+                self._cond.notify()
+            else:
+                del self._lanes[to]
+
+    def retry(self, message_data, delay):
+        """Parkir kepala lane selama `delay` detik tanpa memblokir lane lain"""
+        to = message_data['to']
+        with self._cond:
+            if to not in self._lanes:
+                return
+            self._busy.discard(to)
+            self._counters['retries'] += 1
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._seq), to))
+            self._cond.notify()
+
+    def _release_due(self, now):
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, to = heapq.heappop(self._delayed)
+            lane = self._lanes.get(to)
+            if lane:
+                heapq.heappush(self._ready, (lane[0][0], next(self._seq), to))
+
+    # ---------- Monitoring ----------
+    def record_send(self, latency, success):
+        """Catat latensi dan hasil satu percobaan kirim"""
+        with self._cond:
+            self._latencies.append(latency)
+            self._counters['sent' if success else 'send_errors'] += 1
+
+    def qsize(self):
+        return self._size
+
+    def empty(self):
+        return self._size == 0
+
+    def stats(self):
+        """Ringkasan kedalaman antrian, retry, dan latensi kirim"""
+        with self._cond:
+            latencies = sorted(self._latencies)
+            stats = dict(self._counters)
+            stats.update({
+                'depth': self._size,
+                'ready_lanes': len(self._ready),
+                'delayed_lanes': len(self._delayed),
+                'in_flight': len(self._busy),
+            })
+
+        stats['send_latency'] = _latency_summary(latencies)
+        return stats
+
+class DurableOutboundQueue:
+    """Antrian pesan keluar persisten di SQLite (mode WAL), dipakai bersama antar worker.
+
+    Antarmukanya sama dengan OutboundQueue. Penulisan (put/ack/retry) dikumpulkan
+    oleh satu thread penulis dan di-commit per batch; ``put`` menunggu sampai
+    batch-nya tersimpan sehingga pesan tidak hilang saat restart. Pesan yang
+    diambil worker diberi lease (visibility timeout); jika worker mati sebelum
+    ack, pesan muncul kembali setelah lease habis (at-least-once). Urutan per
+    nomor tujuan tetap dijaga: hanya pesan tertua tiap nomor yang bisa diambil.
+    """
+
+    def __init__(self, path, visibility_timeout=60, flush_interval=0.005,
+                 poll_interval=0.5, latency_window=1000, write_attempts=3, write_retry_delay=0.2):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+        self.write_attempts = max(1, write_attempts)
+        self.write_retry_delay = write_retry_delay
+        self._local = threading.local()
+        self._cond = Condition()
+        self._ops = []                      # (operasi, ditunggu) tertunda untuk batch berikutnya
+        self._batch = _Batch()
+        self._writer = None
+        self._writer_pid = None
+        self._latencies = deque(maxlen=latency_window)
+        self._counters = {
+            'enqueued': 0, 'sent': 0, 'send_errors': 0, 'retries': 0, 'dropped': 0,
+            'batches': 0, 'write_errors': 0,
+        }
+        self._init_schema()
+        self._recover()
+
+    # ---------- Koneksi & skema ----------
+    def _conn(self):
+        # Satu koneksi per thread per proses; koneksi tidak boleh melewati fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """Lepas koneksi SQLite thread ini sebelum proses di-fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbound ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, recipient TEXT NOT NULL, priority INTEGER NOT NULL, "
+            "data TEXT NOT NULL, available_at REAL NOT NULL, lease_until REAL, lease_owner TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS outbound_recipient ON outbound(recipient, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS outbound_ready ON outbound(priority, id)")
+
+    @staticmethod
+    def _owner():
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def _recover(self):
+        """Lepas lease milik proses di host ini yang sudah tidak hidup (crash/restart)"""
+        conn = self._conn()
+        host = socket.gethostname()
+        released = 0
+        for row_id, owner in conn.execute(
+            "SELECT id, lease_owner FROM outbound WHERE lease_owner IS NOT NULL"
+        ).fetchall():
+            owner_host, _, owner_pid = owner.rpartition(':')
+            if owner_host != host or not owner_pid.isdigit() or _pid_alive(int(owner_pid)):
+                continue
+            conn.execute(
+                "UPDATE outbound SET lease_until = NULL, lease_owner = NULL WHERE id = ? AND lease_owner = ?",
+                (row_id, owner)
+            )
+            released += 1
+        pending = conn.execute("SELECT COUNT(*) FROM outbound").fetchone()[0]
+        if pending:
+            logger.info(f"Antrian persisten: {pending} pesan tertunda dipulihkan ({released} lease dilepas)")
+
+    # ---------- Penulis batch ----------
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer_pid == os.getpid() and self._writer.is_alive():
+            return
+        with self._cond:
+            if self._writer is None or self._writer_pid != os.getpid() or not self._writer.is_alive():
+                self._ops = []
+                self._batch = _Batch()
+                self._writer = threading.Thread(target=self._writer_loop, name="outbound-writer", daemon=True)
+                self._writer_pid = os.getpid()
+                self._writer.start()
+
+    def _submit(self, op, wait):
+        """Masukkan operasi ke batch berikutnya; dengan `wait` lempar error jika batch gagal disimpan"""
+        self._ensure_writer()
+        with self._cond:
+            self._ops.append((op, wait))
+            batch = self._batch
+            self._cond.notify_all()
+        if wait:
+            batch.done.wait()
+            if batch.error is not None:
+                raise batch.error
+
+    def _writer_loop(self):
+        while True:
+            with self._cond:
+                while not self._ops:
+                    self._cond.wait()
+            # Beri kesempatan operasi lain bergabung ke batch yang sama
+            time.sleep(self.flush_interval)
+            with self._cond:
+                ops, self._ops = self._ops, []
+                batch, self._batch = self._batch, _Batch()
+            error = self._write_with_retry([op for op, _ in ops])
+            if error is not None:
+                # Pemanggil yang menunggu (put) menerima error-nya; operasi tanpa penunggu
+                # (ack, retry) dikembalikan ke depan antrian agar tidak hilang diam-diam
+                batch.error = error
+                kept = [(op, wait) for op, wait in ops if not wait]
+                with self._cond:
+                    self._counters['write_errors'] += 1
+                    self._ops[:0] = kept
+                logger.error(
+                    f"Antrian persisten gagal menulis batch ({len(ops)} operasi, "
+                    f"{len(ops) - len(kept)} put ditolak, {len(kept)} dicoba lagi): {str(error)}"
+                )
+            batch.done.set()
+            with self._cond:
+                self._cond.notify_all()
+            if error is not None:
+                time.sleep(self.write_retry_delay)
+
+    def _write_with_retry(self, ops):
+        """Tulis batch, ulangi saat gagal sementara (misalnya database terkunci); kembalikan error terakhir"""
+        error = None
+        for attempt in range(self.write_attempts):
+            try:
+                self._write_batch(ops)
+                return None
+            except sqlite3.Error as e:
+                error = e
+                if attempt + 1 < self.write_attempts:
+                    time.sleep(self.write_retry_delay * (attempt + 1))
+        return error
+
+    def _write_batch(self, ops):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for op in ops:
+                kind = op[0]
+                if kind == 'put':
+                    _, recipient, priority, data = op
+                    conn.execute(
+                        "INSERT INTO outbound (recipient, priority, data, available_at) VALUES (?, ?, ?, ?)",
+                        (recipient, priority, data, time.time())
+                    )
+                elif kind == 'ack':
+                    conn.execute("DELETE FROM outbound WHERE id = ?", (op[1],))
+                elif kind == 'retry':
+                    _, row_id, data, available_at = op
+                    conn.execute(
+                        "UPDATE outbound SET data = ?, available_at = ?, lease_until = NULL, lease_owner = NULL "
+                        "WHERE id = ?", (data, available_at, row_id)
+                    )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        self._counters['batches'] += 1
+
+    # ---------- Operasi antrian ----------
+    def put(self, item, wait=True):
+        """Simpan (prioritas, data); secara bawaan menunggu sampai tersimpan di disk.
+
+        Jika batch gagal disimpan, sqlite3.Error dilempar ke pemanggil: pesan
+        yang tidak tersimpan tidak boleh terlihat seolah-olah sudah aman.
+        """
+        priority, message_data = item
+        data = {k: v for k, v in message_data.items() if k != '_qid'}
+        self._submit(('put', message_data['to'], priority, json.dumps(data, ensure_ascii=False)), wait)
+        self._counters['enqueued'] += 1
+
+    def get(self, timeout=None):
+        """Ambil dan sewa pesan siap kirim berikutnya; memblokir sampai ada"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            item = self._claim()
+            if item is not None:
+                return item
+            wait = self.poll_interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                wait = min(wait, remaining)
+            # Put lokal membangunkan lebih awal; perubahan dari worker lain terlihat lewat polling
+            with self._cond:
+                self._cond.wait(wait)
+
+    def _claim(self):
+        """Sewa pesan siap kirim berikutnya; kunci tulis hanya diambil jika ada baris yang bisa disewa.
+
+        Pencarian memakai baca biasa (WAL: tidak menghalangi penulis); sewa dilakukan
+        dengan UPDATE bersyarat sehingga worker yang kalah cepat cukup mencari lagi.
+        """
+        conn = self._conn()
+        try:
+            while True:
+                now = time.time()
+                row = conn.execute(
+                    "SELECT id, priority, data FROM outbound AS m "
+                    "WHERE available_at <= ? AND (lease_until IS NULL OR lease_until <= ?) "
+                    "AND NOT EXISTS (SELECT 1 FROM outbound AS p WHERE p.recipient = m.recipient AND p.id < m.id) "
+                    "ORDER BY priority, id LIMIT 1", (now, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                # id tidak pernah dipakai ulang (AUTOINCREMENT), jadi baris yang masih ada dan
+                # belum disewa tetap menjadi pesan tertua nomornya
+                claimed = conn.execute(
+                    "UPDATE outbound SET lease_until = ?, lease_owner = ? "
+                    "WHERE id = ? AND available_at <= ? AND (lease_until IS NULL OR lease_until <= ?)",
+                    (now + self.visibility_timeout, self._owner(), row[0], now, now)
+                ).rowcount
+                if claimed:
+                    break
+        except sqlite3.Error as e:
+            logger.error(f"Antrian persisten gagal mengambil pesan: {str(e)}")
+            return None
+        message_data = json.loads(row[2])
+        message_data['_qid'] = row[0]
+        return row[1], message_data
+
+    def ack(self, message_data, dropped=False):
+        """Hapus pesan dari antrian (terkirim atau dibuang)"""
+        if dropped:
+            self._counters['dropped'] += 1
+        self._submit(('ack', message_data['_qid']), wait=False)
+
+    def retry(self, message_data, delay):
+        """Kembalikan pesan ke antrian dengan waktu siap `delay` detik lagi"""
+        self._counters['retries'] += 1
+        data = {k: v for k, v in message_data.items() if k != '_qid'}
+        self._submit(
+            ('retry', message_data['_qid'], json.dumps(data, ensure_ascii=False), time.time() + delay),
+            wait=False
+        )
+
+    # ---------- Monitoring ----------
+    def record_send(self, latency, success):
+        """Catat latensi dan hasil satu percobaan kirim"""
+        with self._cond:
+            self._latencies.append(latency)
+            self._counters['sent' if success else 'send_errors'] += 1
+
+    def qsize(self):
+        try:
+            return self._conn().execute("SELECT COUNT(*) FROM outbound").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def stats(self):
+        """Ringkasan kedalaman antrian bersama, retry, dan latensi kirim proses ini"""
+        now = time.time()
+        depth, delayed, in_flight = self._conn().execute(
+            "SELECT COUNT(*), "
+            "COALESCE(SUM(available_at > ?), 0), "
+            "COALESCE(SUM(lease_until IS NOT NULL AND lease_until > ?), 0) FROM outbound",
+            (now, now)
+        ).fetchone()
+        with self._cond:
+            latencies = sorted(self._latencies)
+            stats = dict(self._counters)
+        stats.update({
+            'backend': 'sqlite',
+            'depth': depth,
+            'delayed': delayed,
+            'in_flight': in_flight,
+            'pending_writes': len(self._ops),
+        })
+        stats['send_latency'] = _latency_summary(latencies)
+        return stats
+
+class _Batch:
+    """Penanda selesainya satu batch tulis beserta error-nya bila gagal"""
+
+    __slots__ = ('done', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
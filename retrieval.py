@@ -0,0 +1,139 @@
+import math
+import re
+
+try:
+    import numpy as np
+except ImportError:  # NumPy opsional; tanpa NumPy skor dihitung dengan Python murni
+    np = None
+
+_TOKEN_RE = re.compile(r'\w+')
+_SUFFIXES = ('nya', 'lah', 'kah', 'pun')
+
+# Kata umum bahasa Indonesia yang tidak membantu membedakan entri
+STOPWORDS = frozenset("""
+ada adalah agar akan aku anda apa apakah atau bagaimana bagi bahwa beberapa begitu
+belum berapa bisa boleh buat bukan cara dalam dan dapat dari dengan di dia dimana
+ia ingin ini itu jadi jika juga kalau kami kamu kapan ke kenapa kita ko mana mau
+maupun mengapa mohon nah oleh pada para perlu saja sama saya sebagai sedang seperti
+siapa sih sudah supaya tanya tentang tersebut tolong untuk yang ya yg gimana gmn bgmn
+dong kak pak bu min admin halo info informasi
+""".split())
+
+def tokenize(text):
+    """Tokenisasi bahasa Indonesia: huruf kecil, buang stopword dan klitik umum"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        for suffix in _SUFFIXES:
+            if len(token) > len(suffix) + 3 and token.endswith(suffix):
+                token = token[:-len(suffix)]
+                break
+        if token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+class BM25Index:
+    """Indeks terbalik BM25 atas 'pertanyaan' dan 'jawaban' basis data pengetahuan.
+
+    Bobot BM25 setiap posting (tanpa idf) dihitung saat indeks dibangun,
+    sehingga penilaian kueri cukup menjumlahkan array posting per token
+    kueri ke vektor skor dokumen.
+    """
+
+    def __init__(self, knowledge_db, k1=1.5, b=0.75, question_weight=3):
+        self.k1 = k1
+        self.b = b
+        self.keys = list(knowledge_db)
+        self._positions = {key: i for i, key in enumerate(self.keys)}
+        doc_terms = []
+        for key in self.keys:
+            data = knowledge_db.get(key) or {}
+            # Pola pertanyaan lebih representatif daripada isi jawaban
+            terms = tokenize(key.replace('_', ' '))
+            for pattern in data.get('pertanyaan', []):
+                terms.extend(tokenize(pattern) * question_weight)
+            terms.extend(tokenize(data.get('jawaban', '')))
+            doc_terms.append(terms)
+
+        n_docs = len(doc_terms)
+        lengths = [len(terms) for terms in doc_terms]
+        avgdl = (sum(lengths) / n_docs) if n_docs else 0.0
+        postings = {}
+        for doc_id, terms in enumerate(doc_terms):
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            norm = k1 * (1 - b + b * lengths[doc_id] / avgdl) if avgdl else k1
+            for term, tf in counts.items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(doc_id)
+                postings[term][1].append(tf * (k1 + 1) / (tf + norm))
+
+        self.n_docs = n_docs
+        self.idf = {}
+        self.postings = {}
+        for term, (doc_ids, weights) in postings.items():
+            df = len(doc_ids)
+            self.idf[term] = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            if np is not None:
+                self.postings[term] = (np.asarray(doc_ids, dtype=np.int32), np.asarray(weights, dtype=np.float32))
+            else:
+                self.postings[term] = (doc_ids, weights)
+
+    def _score(self, terms):
+        """Vektor skor BM25 dan jumlah token kueri yang cocok untuk seluruh dokumen"""
+        if np is not None:
+            scores = np.zeros(self.n_docs, dtype=np.float32)
+            matched = np.zeros(self.n_docs, dtype=np.int32)
+            for term in terms:
+                doc_ids, weights = self.postings[term]
+                scores[doc_ids] += weights * self.idf[term]
+                matched[doc_ids] += 1
+            return scores, matched
+        scores = [0.0] * self.n_docs
+        matched = [0] * self.n_docs
+        for term in terms:
+            doc_ids, weights = self.postings[term]
+            idf = self.idf[term]
+            for doc_id, weight in zip(doc_ids, weights):
+                scores[doc_id] += weight * idf
+                matched[doc_id] += 1
+        return scores, matched
+
+    def _terms(self, question):
+        return [t for t in set(tokenize(question)) if t in self.postings]
+
+    def search(self, question, top_k=3):
+        """Kembalikan daftar (keyword, skor, keyakinan, token cocok) urut skor tertinggi.
+
+        Keyakinan adalah skor dibagi skor maksimum teoretis untuk token kueri
+        yang dikenal (idf * (k1 + 1)), dikali porsi token kueri yang dikenal
+        indeks, sehingga nilainya di antara 0 dan 1 dan pertanyaan yang hanya
+        berbagi satu kata umum dengan sebuah entri tidak dianggap yakin.
+        Token cocok adalah jumlah token kueri berbeda yang muncul di entri.
+        """
+        query_terms = set(tokenize(question))
+        terms = [t for t in query_terms if t in self.postings]
+        if not terms or not self.n_docs:
+            return []
+        max_score = sum(self.idf[t] for t in terms) * (self.k1 + 1)
+        max_score *= len(query_terms) / len(terms)
+        scores, matched = self._score(terms)
+
+        top_k = min(top_k, self.n_docs)
+        if np is not None:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            best = best[np.argsort(-scores[best], kind='stable')]
+        else:
+            best = sorted(range(self.n_docs), key=lambda i: -scores[i])[:top_k]
+        return [
+            (self.keys[i], float(scores[i]), float(scores[i]) / max_score, int(matched[i]))
+            for i in best if scores[i] > 0
+        ]
+
+    def score(self, question, keys):
+        """Skor BM25 untuk sekumpulan keyword tertentu (dipakai untuk memeringkat kandidat)"""
+        terms = self._terms(question)
+        if not terms:
+            return {key: 0.0 for key in keys}
+        scores, _ = self._score(terms)
+        return {key: float(scores[self._positions[key]]) if key in self._positions else 0.0 for key in keys}
@@ -0,0 +1,79 @@
+import re
+import json
+
+# Batas panjang teks satu pesan WhatsApp
+WHATSAPP_MAX_CHARS = 4096
+
+# Akhir paragraf, akhir baris, atau akhir kalimat. Akhir kalimat harus didahului
+# kata minimal 4 huruf (atau tanda kutip/kurung) agar singkatan seperti "No." dan
+# penomoran "1." tidak dianggap batas.
+_BOUNDARY_RE = re.compile(r'\n\s*\n|\n|(?<=\w{4}[.!?])\s+|(?<=[)"\'][.!?])\s+')
+_SPACE_RE = re.compile(r'\s')
+
+STREAM_DONE = object()
+
+def parse_stream_line(line):
+    """Ambil potongan teks dari satu baris SSE Groq (format OpenAI).
+
+    Mengembalikan teks, None jika baris tidak berisi teks, atau STREAM_DONE
+    untuk penanda akhir stream.
+    """
+    if not line or not line.startswith('data:'):
+        return None
+    data = line[5:].strip()
+    if data == '[DONE]':
+        return STREAM_DONE
+    choices = json.loads(data).get('choices') or [{}]
+    return (choices[0].get('delta') or {}).get('content') or None
+
+class ReplyChunker:
+    """Potong teks yang datang bertahap menjadi pesan WhatsApp utuh.
+
+    Potongan dikirim di batas paragraf, baris, atau kalimat pertama setelah
+    teks mencapai `min_chars`, sehingga pesan pertama keluar secepat mungkin
+    tanpa memecah kalimat. Jika tidak ada batas sampai `max_chars`, teks
+    dipotong di spasi terakhir sebelum batas tersebut.
+    """
+
+    def __init__(self, min_chars=280, max_chars=WHATSAPP_MAX_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ''
+
+    def feed(self, text):
+        """Tambahkan teks baru; kembalikan daftar potongan yang sudah lengkap"""
+        self._buffer += text
+        chunks = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                return chunks
+            chunk = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:].lstrip()
+            if chunk:
+                chunks.append(chunk)
+
+    def flush(self):
+        """Kembalikan sisa teks di akhir stream"""
+        chunks = []
+        while len(self._buffer) > self.max_chars:
+            chunks.extend(self.feed(''))
+        rest = self._buffer.strip()
+        self._buffer = ''
+        if rest:
+            chunks.append(rest)
+        return chunks
+
+    def _find_cut(self):
+        buffer = self._buffer
+        if len(buffer) < self.min_chars:
+            return None
+        match = _BOUNDARY_RE.search(buffer, self.min_chars)
+        if match is not None and match.end() <= self.max_chars:
+            return match.end()
+        if len(buffer) < self.max_chars:
+            return None
+        # Tidak ada batas wajar: potong di spasi terakhir sebelum batas WhatsApp
+        window = buffer[:self.max_chars]
+        spaces = [m.end() for m in _SPACE_RE.finditer(window)]
+        return spaces[-1] if spaces else self.max_chars
@@ -0,0 +1,41 @@
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import circuit_breaker
+
+@pytest.fixture
+def serve():
+    """Jalankan handler HTTP di port lokal acak; kembalikan URL dasarnya"""
+    servers = []
+
+    def start(handler):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def breaker():
+    """Ganti breaker upstream `name` dengan breaker baru yang bisa diatur parameternya"""
+    replaced = []
+
+    def make(name, **kwargs):
+        replaced.append(name)
+        circuit_breaker._breakers[name] = circuit_breaker.CircuitBreaker(name, **kwargs)
+        return circuit_breaker._breakers[name]
+
+    yield make
+    for name in replaced:
+        circuit_breaker._breakers.pop(name, None)
@@ -0,0 +1,49 @@
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+import http_client
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN
+
+class StreamHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = b'data: ok\n\n' * 10
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def test_stream_without_defer_is_recorded_at_headers(serve, breaker):
+    url = serve(StreamHandler)
+    upstream = breaker('test_stream')
+    for _ in range(3):
+        with http_client.request('test_stream', 'GET', url, stream=True) as response:
+            response.content
+    assert upstream.stats()['calls_in_window'] == 3
+
+def test_deferred_stream_is_recorded_once_by_finish_stream(serve, breaker):
+    url = serve(StreamHandler)
+    upstream = breaker('test_stream')
+    with http_client.request('test_stream', 'GET', url, stream=True, defer_breaker=True) as response:
+        assert upstream.stats()['calls_in_window'] == 0
+        http_client.finish_stream(response, failed=True)
+        http_client.finish_stream(response, failed=False)
+    stats = upstream.stats()
+    assert stats['calls_in_window'] == 1
+    assert stats['error_rate'] == 1.0
+
+@pytest.mark.parametrize('failed, state', [(False, CLOSED), (True, OPEN)])
+def test_deferred_half_open_probe_settles_breaker(serve, breaker, failed, state):
+    url = serve(StreamHandler)
+    upstream = breaker('test_stream', min_requests=1, cooldown=0)
+    upstream.record(True, 0.1)
+    assert upstream.state == OPEN
+    # Cooldown 0: request berikutnya menjadi panggilan percobaan half-open
+    with http_client.request('test_stream', 'GET', url, stream=True, defer_breaker=True) as response:
+        assert upstream.state == HALF_OPEN
+        http_client.finish_stream(response, failed=failed)
+    assert upstream.state == state
+    assert not upstream._probing
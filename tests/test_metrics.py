@@ -0,0 +1,37 @@
+from metrics import Registry
+
+def worker_registry(directory, pid, monkeypatch):
+    registry = Registry(str(directory))
+    events = registry.counter("test_events_total", "Event uji", ("status",))
+    latency = registry.histogram("test_seconds", "Latensi uji", buckets=(0.1, 1.0))
+    monkeypatch.setattr("metrics.os.getpid", lambda: pid)
+    registry.write_snapshot()
+    return registry, events, latency
+
+def test_render_sums_snapshots_of_all_workers(tmp_path, monkeypatch):
+    first, first_events, first_latency = worker_registry(tmp_path, 101, monkeypatch)
+    second, second_events, second_latency = worker_registry(tmp_path, 102, monkeypatch)
+    first_events.inc('processed', amount=3)
+    first_latency.observe(0.05)
+    second_events.inc('processed', amount=2)
+    second_events.inc('ignored')
+    second_latency.observe(0.5)
+
+    monkeypatch.setattr("metrics.os.getpid", lambda: 101)
+    first.write_snapshot()
+    # Worker 102 yang menjawab scrape: snapshot-nya ditulis ulang saat render
+    monkeypatch.setattr("metrics.os.getpid", lambda: 102)
+    monkeypatch.setattr(second, "ensure_flusher", lambda: None)
+    text = second.render()
+
+    assert 'test_events_total{status="processed"} 5' in text
+    assert 'test_events_total{status="ignored"} 1' in text
+    assert 'test_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_seconds_bucket{le="1.0"} 2' in text
+    assert 'test_seconds_count 2' in text
+
+def test_render_without_directory_uses_process_values():
+    registry = Registry()
+    events = registry.counter("test_events_total", "Event uji", ("status",))
+    events.inc('processed')
+    assert 'test_events_total{status="processed"} 1' in registry.render()
@@ -0,0 +1,101 @@
+import sqlite3
+import time
+
+import pytest
+
+from outbound_queue import DurableOutboundQueue
+
+def message(to, text):
+    return {'to': to, 'message': text}
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "kondisi tidak tercapai"
+        time.sleep(0.01)
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'outbound.sqlite3')
+
+@pytest.fixture
+def failing_writes(monkeypatch):
+    """Buat _write_batch antrian gagal selama `fail` True; catat operasi setiap percobaan"""
+    def install(queue):
+        state = {'fail': True, 'calls': []}
+        write_batch = queue._write_batch
+
+        def flaky(ops):
+            state['calls'].append(list(ops))
+            if state['fail']:
+                raise sqlite3.OperationalError("database is locked")
+            write_batch(ops)
+
+        monkeypatch.setattr(queue, '_write_batch', flaky)
+        return state
+    return install
+
+def test_lease_expires_and_message_is_redelivered(path):
+    queue = DurableOutboundQueue(path, visibility_timeout=0.2)
+    other_worker = DurableOutboundQueue(path, visibility_timeout=0.2)
+    queue.put((1, message('628111', 'halo')))
+
+    _, first = queue.get(timeout=1)
+    assert other_worker.get(timeout=0.05) is None
+
+    time.sleep(0.25)
+    _, again = other_worker.get(timeout=1)
+    assert again['_qid'] == first['_qid']
+    assert again['message'] == 'halo'
+
+def test_only_oldest_message_per_recipient_is_leased(path):
+    queue = DurableOutboundQueue(path)
+    queue.put((1, message('628111', 'pertama')))
+    queue.put((0, message('628111', 'kedua')))
+
+    _, head = queue.get(timeout=1)
+    assert head['message'] == 'pertama'
+    assert queue.get(timeout=0.05) is None
+    queue.ack(head)
+    _, following = queue.get(timeout=1)
+    assert following['message'] == 'kedua'
+
+def test_empty_poll_does_not_take_write_lock(path):
+    queue = DurableOutboundQueue(path)
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        start = time.monotonic()
+        assert queue.get(timeout=0.1) is None
+        assert time.monotonic() - start < 1
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+
+def test_put_raises_when_batch_cannot_be_written(path, failing_writes):
+    queue = DurableOutboundQueue(path, write_attempts=2, write_retry_delay=0.01)
+    failing_writes(queue)
+    with pytest.raises(sqlite3.Error):
+        queue.put((1, message('628111', 'halo')))
+    assert queue.stats()['write_errors'] == 1
+    assert queue.qsize() == 0
+
+def test_ack_after_write_failure_returns_to_front_of_pending_ops(path, failing_writes):
+    queue = DurableOutboundQueue(path, write_attempts=1, write_retry_delay=0.05)
+    queue.put((1, message('628111', 'halo')))
+    _, leased = queue.get(timeout=1)
+
+    state = failing_writes(queue)
+    queue.ack(leased)
+    wait_until(lambda: queue.stats()['write_errors'] >= 1)
+    queue.put((1, message('628222', 'berikutnya')), wait=False)
+    wait_until(lambda: any(len(ops) == 2 for ops in state['calls']))
+
+    retried = next(ops for ops in state['calls'] if len(ops) == 2)
+    assert retried[0] == ('ack', leased['_qid'])
+    assert retried[1][0] == 'put'
+
+    state['fail'] = False
+    wait_until(lambda: queue.qsize() == 1)
+    _, remaining = queue.get(timeout=1)
+    assert remaining['to'] == '628222'
@@ -0,0 +1,49 @@
+import os
+import socket
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from fixture_site import FixtureSite  # noqa: E402
+from circuit_breaker import CLOSED  # noqa: E402
+from web_index import Crawler, WebIndex  # noqa: E402
+
+@pytest.fixture
+def site():
+    site = FixtureSite(20).start()
+    yield site
+    site.stop()
+
+@pytest.fixture
+def index(tmp_path):
+    return WebIndex(str(tmp_path / 'web_index.sqlite3'))
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_crawl_round_records_every_fetch_in_breaker(site, index, breaker):
+    upstream = breaker('crawler')
+    crawler = Crawler(index, [site.server_address[0]], seeds=[site.url()], max_pages=200, delay=0)
+    counts = crawler.crawl_once()
+    fetched = sum(counts[outcome] for outcome in ('changed', 'unchanged', 'not_modified', 'skipped', 'error'))
+    assert counts['changed'] > 0
+    # Setiap halaman plus satu robots.txt per origin
+    assert upstream.stats()['calls_in_window'] == fetched + 1
+    assert upstream.stats()['error_rate'] == 0.0
+
+def test_unreachable_host_does_not_stop_crawl(site, index, breaker):
+    upstream = breaker('crawler', min_requests=5)
+    dead = f"http://localhost:{closed_port()}"
+    crawler = Crawler(index, [site.server_address[0], 'localhost'], seeds=[site.url()], max_pages=200, delay=0)
+    first = crawler.crawl_once()
+    # Putaran berikutnya hanya berisi tautan ke host yang menolak koneksi
+    index.add_urls([f"{dead}/halaman/{i}" for i in range(4)], 0)
+    second = crawler.crawl_once()
+    assert first['changed'] > 0
+    assert second['error'] == 4
+    assert upstream.state == CLOSED
+    assert index.stats()['indexed'] == first['changed']
@@ -0,0 +1,410 @@
+"""Crawler dan indeks teks lokal (SQLite FTS5) untuk halaman situs resmi.
+
+Crawler mengambil halaman OFFICIAL_DOMAINS secara bertahap: halaman baru
+ditemukan dari tautan, halaman lama diperiksa ulang dengan GET bersyarat
+(If-None-Match / If-Modified-Since) sehingga halaman yang tidak berubah cukup
+dijawab 304. Teks hasil ekstraksi BeautifulSoup disimpan di tabel FTS5 dan
+pencarian pertanyaan dijawab dari indeks ini dalam hitungan milidetik;
+SerpAPI hanya dipakai jika indeks tidak punya halaman yang cocok.
+
+Di produksi crawler berjalan sebagai thread di dalam web worker (WEB_CRAWLER=true)
+sehingga indeksnya ditulis ke disk yang sama dengan yang dibaca worker; lease
+claim_crawl memastikan hanya satu worker yang crawl per CRAWL_INTERVAL. Proses
+crawler terpisah hanya berguna jika WEB_INDEX_DB berada di penyimpanan yang
+dipakai bersama dengan web worker (di host bergaya Procfile setiap proses punya
+disk sementara sendiri). Perintah manual:
+
+    python web_index.py crawl            # berulang setiap CRAWL_INTERVAL detik
+    python web_index.py crawl --once     # satu putaran lalu keluar
+    python web_index.py search "syarat kartu kuning"
+"""
+import os
+import re
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+from urllib import robotparser
+from urllib.parse import urljoin, urldefrag, urlparse
+
+from bs4 import BeautifulSoup
+
+import http_client
+from circuit_breaker import CircuitOpenError
+from metrics import registry
+from log_pipeline import setup_logging
+from retrieval import tokenize
+
+logger = logging.getLogger(__name__)
+
+# ===================== KONFIGURASI =====================
+OFFICIAL_DOMAINS = json.loads(os.getenv("OFFICIAL_DOMAINS", "[\"kemnaker.go.id\", \"transmigrasi.go.id\", \"kemenperin.go.id\", \"disnakertransperin.bartimkab.go.id\"]"))
+# Kosongkan WEB_INDEX_DB untuk mematikan indeks lokal (selalu SerpAPI)
+WEB_INDEX_DB = os.getenv("WEB_INDEX_DB", "web_index.sqlite3")
+# URL awal crawler; kosong berarti halaman depan setiap domain resmi
+CRAWL_SEEDS = json.loads(os.getenv("CRAWL_SEEDS", "[]"))
+CRAWL_INTERVAL = float(os.getenv("CRAWL_INTERVAL", "3600"))     # detik antar putaran
+CRAWL_REFRESH = float(os.getenv("CRAWL_REFRESH", "86400"))      # umur halaman sebelum diperiksa ulang
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "200"))      # halaman per putaran
+CRAWL_MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", "3"))        # jarak tautan dari URL awal
+CRAWL_DELAY = float(os.getenv("CRAWL_DELAY", "0.5"))            # jeda antar request
+CRAWL_MAX_BYTES = int(os.getenv("CRAWL_MAX_BYTES", "2000000"))
+CRAWL_USER_AGENT = os.getenv("CRAWL_USER_AGENT", "DisnakertransperinBartimBot/1.0")
+# Porsi kata kunci pertanyaan yang harus ada di halaman agar dianggap cocok
+WEB_INDEX_MIN_COVERAGE = float(os.getenv("WEB_INDEX_MIN_COVERAGE", "0.6"))
+
+# Elemen yang bukan isi halaman
+_SKIP_TAGS = ('script', 'style', 'noscript', 'nav', 'header', 'footer', 'form', 'iframe', 'svg')
+_SKIP_EXTENSIONS = re.compile(r'\.(pdf|docx?|xlsx?|pptx?|zip|rar|jpe?g|png|gif|webp|svg|mp4|mp3|css|js)$', re.I)
+_SPACE_RE = re.compile(r'\s+')
+
+crawl_pages = registry.counter(
+    "chatbot_crawler_pages_total", "Halaman yang diproses crawler per hasil", ("outcome",)
+)
+index_lookups = registry.counter(
+    "chatbot_web_index_lookups_total", "Pencarian di indeks lokal situs resmi", ("outcome",)
+)
+
+def is_allowed_host(url, domains):
+    """True jika host URL adalah salah satu domain resmi atau subdomainnya"""
+    host = (urlparse(url).hostname or '').lower()
+    return any(host == domain or host.endswith('.' + domain) for domain in domains)
+
+def extract_page(html, base_url):
+    """Judul, teks isi, dan daftar tautan (absolut, tanpa fragmen) dari HTML"""
+    soup = BeautifulSoup(html, 'html.parser')
+    title = soup.title.get_text(' ', strip=True) if soup.title else ''
+    links = []
+    for anchor in soup.find_all('a', href=True):
+        link = urldefrag(urljoin(base_url, anchor['href'].strip()))[0]
+        if link.startswith(('http://', 'https://')) and not _SKIP_EXTENSIONS.search(urlparse(link).path):
+            links.append(link)
+    for tag in soup(_SKIP_TAGS):
+        tag.decompose()
+    root = soup.find('main') or soup.body or soup
+    text = _SPACE_RE.sub(' ', root.get_text(' ', strip=True))
+    return title, text, links
+
+class WebIndex:
+    """Daftar halaman dan indeks FTS5 isinya, dipakai bersama crawler dan worker.
+
+    Tabel `pages` sekaligus menjadi antrian crawler: tautan baru masuk dengan
+    fetched_at 0, dan halaman yang fetched_at-nya lebih tua dari CRAWL_REFRESH
+    diambil ulang dengan validator (ETag/Last-Modified) yang tersimpan.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self):
+        # Satu koneksi per thread per proses; koneksi tidak boleh melewati fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """Tutup koneksi thread ini; koneksi baru dibuka saat indeks diakses lagi"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, depth INTEGER NOT NULL, status INTEGER, title TEXT, "
+            "etag TEXT, last_modified TEXT, content_hash TEXT, fetched_at REAL NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS pages_fetched_at ON pages(fetched_at)")
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5("
+            "url UNINDEXED, title, body, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS crawl_meta (key TEXT PRIMARY KEY, value REAL NOT NULL)")
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # ----- sisi crawler -----
+    def add_urls(self, urls, depth):
+        """Daftarkan URL baru untuk diambil; kembalikan jumlah yang benar-benar baru"""
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO pages (url, depth) VALUES (?, ?)", [(url, depth) for url in urls]
+            )
+            return conn.total_changes - before
+
+    def due_pages(self, limit, fetched_before):
+        """Halaman yang belum diambil sejak `fetched_before`: (url, depth, etag, last_modified)"""
+        return self._conn().execute(
+            "SELECT url, depth, etag, last_modified FROM pages WHERE fetched_at < ? "
+            "ORDER BY fetched_at, depth LIMIT ?",
+            (fetched_before, limit)
+        ).fetchall()
+
+    def mark_fetched(self, url, status):
+        """Catat pemeriksaan tanpa isi baru (304, error, atau bukan HTML)"""
+        with self._transaction() as conn:
+            conn.execute("UPDATE pages SET status = ?, fetched_at = ? WHERE url = ?", (status, time.time(), url))
+            if status in (404, 410):
+                # Halaman sudah dihapus dari situs resmi; hash dan validator dikosongkan agar
+                # halaman yang muncul lagi dengan isi yang sama diambil penuh dan diindeks ulang
+                conn.execute("DELETE FROM pages_fts WHERE rowid = (SELECT rowid FROM pages WHERE url = ?)", (url,))
+                conn.execute(
+                    "UPDATE pages SET content_hash = NULL, etag = NULL, last_modified = NULL WHERE url = ?", (url,)
+                )
+
+    def store_page(self, url, status, title, body, etag=None, last_modified=None):
+        """Simpan hasil ambil; isi FTS hanya ditulis ulang jika teksnya berubah"""
+        content_hash = hashlib.sha1(f"{title}\n{body}".encode('utf-8')).hexdigest()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT rowid, content_hash FROM pages WHERE url = ?", (url,)).fetchone()
+            changed = row[1] != content_hash
+            conn.execute(
+                "UPDATE pages SET status = ?, title = ?, etag = ?, last_modified = ?, "
+                "content_hash = ?, fetched_at = ? WHERE url = ?",
+                (status, title, etag, last_modified, content_hash, time.time(), url)
+            )
+            if changed:
+                # Baris FTS memakai rowid yang sama dengan baris pages-nya
+                conn.execute("DELETE FROM pages_fts WHERE rowid = ?", (row[0],))
+                if body:
+                    conn.execute(
+                        "INSERT INTO pages_fts (rowid, url, title, body) VALUES (?, ?, ?, ?)", (row[0], url, title, body)
+                    )
+        return changed
+
+    def claim_crawl(self, interval):
+        """Ambil giliran crawl; hanya satu proses per `interval` detik yang mendapatkannya"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT value FROM crawl_meta WHERE key = 'next_crawl_at'").fetchone()
+            if row is not None and row[0] > now:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO crawl_meta (key, value) VALUES ('next_crawl_at', ?)", (now + interval,)
+            )
+        return True
+
+    # ----- sisi pencarian -----
+    def lookup(self, query, min_coverage=WEB_INDEX_MIN_COVERAGE, candidates=20):
+        """Halaman terbaik untuk pertanyaan dalam bentuk hasil SerpAPI, atau None.
+
+        FTS5 mengurutkan kandidat dengan BM25 (judul berbobot lebih), lalu
+        kandidat pertama yang memuat cukup banyak kata kunci pertanyaan dipilih.
+        """
+        terms = ['"{}"*'.format(term.replace('"', '')) for term in dict.fromkeys(tokenize(query))]
+        if not terms:
+            return None
+        try:
+            conn = self._conn()
+            rows = conn.execute(
+                "SELECT rowid, url, title, snippet(pages_fts, 2, '', '', '…', 40) FROM pages_fts "
+                "WHERE pages_fts MATCH ? ORDER BY bm25(pages_fts, 0, 5.0, 1.0) LIMIT ?",
+                (" OR ".join(terms), candidates)
+            ).fetchall()
+            # Hitung kata kunci yang ada di setiap kandidat lewat indeks, tanpa membaca isinya
+            matched = dict.fromkeys((row[0] for row in rows), 0)
+            placeholders = ",".join("?" * len(matched))
+            for term in terms:
+                for (rowid,) in conn.execute(
+                    f"SELECT rowid FROM pages_fts WHERE pages_fts MATCH ? AND rowid IN ({placeholders})",
+                    (term, *matched)
+                ):
+                    matched[rowid] += 1
+        except sqlite3.Error as e:
+            logger.error(f"Indeks web SQLite error: {str(e)}")
+            return None
+        for rowid, url, title, snippet in rows:
+            if matched[rowid] / len(terms) >= min_coverage:
+                index_lookups.inc('hit')
+                return {'title': title or url, 'snippet': snippet, 'link': url}
+        index_lookups.inc('miss')
+        return None
+
+    def stats(self):
+        conn = self._conn()
+        pages, fetched = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(fetched_at > 0), 0) FROM pages"
+        ).fetchone()
+        return {
+            'pages': pages,
+            'fetched': fetched,
+            'indexed': conn.execute("SELECT COUNT(*) FROM pages_fts").fetchone()[0],
+        }
+
+def open_index(path=WEB_INDEX_DB):
+    """Buka indeks lokal, atau None jika dimatikan / SQLite tanpa FTS5"""
+    if not path:
+        return None
+    try:
+        return WebIndex(path)
+    except sqlite3.Error as e:
+        logger.error(f"Gagal membuka indeks web {path}, pencarian memakai SerpAPI: {str(e)}")
+        return None
+
+class Crawler:
+    """Crawler sopan untuk domain resmi: patuh robots.txt, berjeda, dan inkremental"""
+
+    def __init__(self, index, domains=OFFICIAL_DOMAINS, seeds=None, max_pages=CRAWL_MAX_PAGES,
+                 max_depth=CRAWL_MAX_DEPTH, delay=CRAWL_DELAY, refresh=CRAWL_REFRESH):
+        self.index = index
+        self.domains = [domain.lower() for domain in domains]
+        self.seeds = seeds or CRAWL_SEEDS or [f"https://{domain}/" for domain in self.domains]
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.delay = delay
+        self.refresh = refresh
+        self._robots = {}
+
+    def _robots_for(self, url):
+        parts = urlparse(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        parser = self._robots.get(origin)
+        if parser is None:
+            parser = robotparser.RobotFileParser()
+            try:
+                response = http_client.request(
+                    'crawler', 'GET', origin + '/robots.txt', headers={'User-Agent': CRAWL_USER_AGENT}
+                )
+                parser.parse(response.text.splitlines() if response.status_code == 200 else [])
+            except CircuitOpenError:
+                raise
+            except Exception:
+                parser.parse([])
+            self._robots[origin] = parser
+        return parser
+
+    def allowed(self, url):
+        return is_allowed_host(url, self.domains) and self._robots_for(url).can_fetch(CRAWL_USER_AGENT, url)
+
+    def crawl_once(self):
+        """Satu putaran crawl (maksimal max_pages halaman); kembalikan jumlah halaman per hasil.
+
+        Tautan yang ditemukan di tengah putaran ikut diambil selama jatah masih ada.
+        """
+        self._robots = {}
+        counts = {'changed': 0, 'unchanged': 0, 'not_modified': 0, 'skipped': 0, 'error': 0, 'discovered': 0}
+        self.index.add_urls([url for url in self.seeds if is_allowed_host(url, self.domains)], 0)
+        # Halaman yang diambil dalam putaran ini tidak lagi memenuhi batas waktu ini
+        fetched_before = time.time() - self.refresh
+        budget = self.max_pages
+        while budget > 0:
+            batch = self.index.due_pages(min(budget, 50), fetched_before)
+            if not batch:
+                break
+            for url, depth, etag, last_modified in batch:
+                try:
+                    outcome, discovered = self._fetch(url, depth, etag, last_modified)
+                except CircuitOpenError as e:
+                    logger.warning(f"Crawl dihentikan: {str(e)}")
+                    return counts
+                except Exception as e:
+                    logger.error(f"Crawl {url} error: {str(e)}")
+                    self.index.mark_fetched(url, None)
+                    outcome, discovered = 'error', 0
+                counts[outcome] += 1
+                counts['discovered'] += discovered
+                crawl_pages.inc(outcome)
+                budget -= 1
+                if self.delay:
+                    time.sleep(self.delay)
+        return counts
+
+    def _fetch(self, url, depth, etag, last_modified):
+        if not self.allowed(url):
+            self.index.mark_fetched(url, None)
+            return 'skipped', 0
+        headers = {'User-Agent': CRAWL_USER_AGENT}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        with http_client.request('crawler', 'GET', url, headers=headers, stream=True) as response:
+            if response.status_code == 304:
+                self.index.mark_fetched(url, 304)
+                return 'not_modified', 0
+            content_type = response.headers.get('Content-Type', '')
+            if (response.status_code != 200 or 'html' not in content_type
+                    or not is_allowed_host(response.url, self.domains)):
+                self.index.mark_fetched(url, response.status_code)
+                return 'skipped', 0
+            html = b''
+            for block in response.iter_content(65536):
+                html += block
+                if len(html) > CRAWL_MAX_BYTES:
+                    break
+            title, text, links = extract_page(html, response.url)
+            changed = self.index.store_page(
+                url, 200, title, text,
+                etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified')
+            )
+        discovered = 0
+        if depth < self.max_depth:
+            discovered = self.index.add_urls([link for link in links if is_allowed_host(link, self.domains)], depth + 1)
+        return ('changed' if changed else 'unchanged'), discovered
+
+def crawl_forever(index, crawler, interval=CRAWL_INTERVAL):
+    """Putaran crawl berkala; bila beberapa proses menjalankannya hanya satu yang crawl per interval"""
+    while True:
+        try:
+            if index.claim_crawl(interval):
+                start = time.perf_counter()
+                counts = crawler.crawl_once()
+                logger.info(f"Crawl selesai dalam {time.perf_counter() - start:.1f} detik: {counts}")
+        except Exception as e:
+            logger.error(f"Crawler error: {str(e)}")
+        # Jitter agar proses-proses tidak berebut giliran bersamaan
+        time.sleep(min(interval, 60) * random.uniform(0.8, 1.2))
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawler dan indeks lokal situs resmi")
+    parser.add_argument('--db', default=WEB_INDEX_DB)
+    commands = parser.add_subparsers(dest='command', required=True)
+    crawl = commands.add_parser('crawl', help='ambil halaman domain resmi ke indeks')
+    crawl.add_argument('--once', action='store_true', help='satu putaran lalu keluar')
+    search = commands.add_parser('search', help='cari pertanyaan di indeks')
+    search.add_argument('query')
+    commands.add_parser('stats', help='jumlah halaman di indeks')
+    args = parser.parse_args()
+
+    setup_logging()
+    index = WebIndex(args.db)
+    if args.command == 'crawl':
+        crawler = Crawler(index)
+        if args.once:
+            print(json.dumps(crawler.crawl_once()))
+        else:
+            crawl_forever(index, crawler)
+    elif args.command == 'search':
+        start = time.perf_counter()
+        result = index.lookup(args.query)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        print(f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+    else:
+        print(json.dumps(index.stats()))
+
+if __name__ == '__main__':
+    main()